@@ -14,6 +14,10 @@
     python example_usage.py
 """
 
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from yolov5_object_detection import YOLOv5Detector
 
 
@@ -30,7 +34,7 @@ def example_1_basic_image_detection():
     print("═"*80)
     
     # ساخت تشخیص‌دهنده
-    detector = YOLOv5Detector()
+    detector = YOLOv5Detector(verbose=True)
     
     # راه‌اندازی محیط (فقط بار اول لازم است)
     detector.setup_environment()
@@ -55,7 +59,7 @@ def example_2_detect_only_persons():
     print("Example 2: Detect Only Persons")
     print("═"*80)
     
-    detector = YOLOv5Detector(conf_threshold=0.5)
+    detector = YOLOv5Detector(conf_threshold=0.5, verbose=True)
     detector.setup_environment()
     
     # تشخیص فقط کلاس 0 (person)
@@ -76,7 +80,7 @@ def example_3_detect_vehicles():
     print("Example 3: Detect Vehicles")
     print("═"*80)
     
-    detector = YOLOv5Detector()
+    detector = YOLOv5Detector(verbose=True)
     detector.setup_environment()
     
     # کلاس‌های وسایل نقلیه:
@@ -102,7 +106,8 @@ def example_4_video_detection():
     
     detector = YOLOv5Detector(
         weights='yolov5m.pt',
-        conf_threshold=0.6
+        conf_threshold=0.6,
+        verbose=True
     )
     detector.setup_environment()
     
@@ -124,7 +129,7 @@ def example_5_webcam_detection():
     print("Example 5: Live Webcam Detection")
     print("═"*80)
     
-    detector = YOLOv5Detector(conf_threshold=0.6)
+    detector = YOLOv5Detector(conf_threshold=0.6, verbose=True)
     detector.setup_environment()
     
     print("\nبرای شروع، uncomment کنید:")
@@ -150,7 +155,8 @@ def example_6_high_accuracy():
     # استفاده از مدل بزرگ‌تر و آستانه بالاتر
     detector = YOLOv5Detector(
         weights='yolov5l.pt',  # مدل بزرگ‌تر
-        conf_threshold=0.8      # آستانه بالاتر
+        conf_threshold=0.8,     # آستانه بالاتر
+        verbose=True
     )
     detector.setup_environment()
     
@@ -174,7 +180,8 @@ def example_7_fast_detection():
     # استفاده از مدل کوچک‌تر برای سرعت بیشتر
     detector = YOLOv5Detector(
         weights='yolov5s.pt',  # مدل کوچک و سریع
-        conf_threshold=0.5
+        conf_threshold=0.5,
+        verbose=True
     )
     detector.setup_environment()
     
@@ -195,7 +202,7 @@ def example_8_animals_detection():
     print("Example 8: Detect Animals")
     print("═"*80)
     
-    detector = YOLOv5Detector()
+    detector = YOLOv5Detector(verbose=True)
     detector.setup_environment()
     
     # کلاس‌های حیوانات:
@@ -208,6 +215,157 @@ def example_8_animals_detection():
     print("\n✓ مثال ۸ تمام شد")
 
 
+def example_9_parallel_detection(images=("test1.jpg", "test2.jpg", "test3.jpg", "test4.jpg")):
+    """
+    مثال ۹: تشخیص موازی با چند نخ و چند نمونه تشخیص‌دهنده
+    Example 9: Parallel detection from several threads and detector instances
+    
+    تشخیص‌دهنده دایرکتوری کاری پروسه را تغییر نمی‌دهد، بنابراین چند نخ
+    می‌توانند همزمان تشخیص انجام دهند. این مثال زمان اجرای موازی و ترتیبی
+    را مقایسه می‌کند (بررسی یکسان بودن نتایج در tests/test_concurrency.py است).
+    
+    نویسنده: رضا صفری فروشانی - https://github.com/reza123reza
+    """
+    print("\n" + "═"*80)
+    print("مثال ۹: تشخیص موازی")
+    print("Example 9: Parallel Detection")
+    print("═"*80)
+    
+    images = [image for image in images if os.path.exists(image)]
+    if not images:
+        print("ℹ️  هیچ‌کدام از تصاویر نمونه پیدا نشد")
+        return
+    
+    # دو نمونه مستقل که از یک پوشه YOLOv5 استفاده می‌کنند
+    detectors = [YOLOv5Detector(weights='yolov5s.pt', conf_threshold=0.5, verbose=True) for _ in range(2)]
+    for detector in detectors:
+        detector.setup_environment()
+    
+    def run(index, image):
+        detector = detectors[index % len(detectors)]
+        return detector.detect_image(image, show_result=False, return_detections=True)
+    
+    start = time.perf_counter()
+    for i, image in enumerate(images):
+        run(i, image)
+    sequential = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(images)) as executor:
+        results = list(executor.map(run, range(len(images)), images))
+    parallel = time.perf_counter() - start
+    
+    for image, detections in zip(images, results):
+        print(f"   {image}: {0 if detections is None else len(detections)} شیء")
+    print(f"\n✓ {len(images)} تصویر به صورت موازی پردازش شد "
+          f"(ترتیبی: {sequential:.1f} ثانیه، موازی: {parallel:.1f} ثانیه)")
+    print("\n✓ مثال ۹ تمام شد")
+
+
+def example_10_cascade_detection(images=("test1.jpg", "test2.jpg", "test3.jpg", "test4.jpg")):
+    """
+    مثال ۱۰: تشخیص آبشاری (مدل کوچک، ارجاع تصاویر نامطمئن به مدل بزرگ)
+    Example 10: Cascade detection (small model first, escalate uncertain images)
+    
+    به جای انتخاب ثابت بین yolov5s (مثال ۷) و yolov5l (مثال ۶)، همه تصاویر
+    ابتدا با yolov5s پردازش می‌شوند و فقط تصاویری که تشخیصی با اطمینان
+    بین 0.25 و 0.5 (یا هیچ تشخیصی) دارند دوباره با yolov5l اجرا می‌شوند.
+    
+    نویسنده: رضا صفری فروشانی - https://github.com/reza123reza
+    """
+    print("\n" + "═"*80)
+    print("مثال ۱۰: تشخیص آبشاری")
+    print("Example 10: Cascade Detection")
+    print("═"*80)
+    
+    detector = YOLOv5Detector(
+        weights='yolov5s.pt',          # مدل سریع برای همه تصاویر
+        conf_threshold=0.5,
+        engine='inprocess',
+        cascade_weights='yolov5l.pt',  # مدل دقیق فقط برای تصاویر نامطمئن
+        cascade_band=(0.25, 0.5),
+        verbose=True
+    )
+    detector.setup_environment()
+    
+    images = [image for image in images if os.path.exists(image)]
+    if images:
+        detector.detect_images(images, save=False, return_detections=True)
+        info = detector.cascade_info()
+        print(f"\n📊 نرخ ارجاع به yolov5l: {info['escalation_rate']:.0%} "
+              f"({info['escalated']} از {info['images']} تصویر)")
+    else:
+        print("ℹ️  هیچ‌کدام از تصاویر نمونه پیدا نشد")
+    
+    print("\n✓ مثال ۱۰ تمام شد")
+
+
+def example_11_tiled_detection(image="aerial.jpg"):
+    """
+    مثال ۱۱: تشخیص در تصاویر خیلی بزرگ با کاشی‌بندی
+    Example 11: Tiled detection for very large images
+    
+    تصاویر هوایی یا پانوراما به کاشی‌های همپوشان به اندازه ورودی مدل تقسیم
+    می‌شوند تا اشیاء کوچک در کوچک‌سازی کل تصویر از بین نروند. کادرهای اشیائی
+    که در مرز دو کاشی بریده شده‌اند یکی می‌شوند و یک گذر روی کل تصویر
+    اشیاء بزرگ‌تر از کاشی را پیدا می‌کند.
+    
+    نویسنده: رضا صفری فروشانی - https://github.com/reza123reza
+    """
+    print("\n" + "═"*80)
+    print("مثال ۱۱: تشخیص با کاشی‌بندی")
+    print("Example 11: Tiled Detection")
+    print("═"*80)
+    
+    if not os.path.exists(image):
+        print(f"ℹ️  تصویر نمونه {image} پیدا نشد")
+        return
+    
+    detector = YOLOv5Detector(weights='yolov5s.pt', conf_threshold=0.4, engine='inprocess', verbose=True)
+    detector.setup_environment()
+    
+    result = detector.detect_tiled(image, tile_size=640, overlap=0.2, global_pass=True,
+                                   merge='fusion', return_detections=True)
+    if result is not None:
+        print(f"\n📊 {len(result)} شیء در {image} تشخیص داده شد")
+        print(f"   کلاس‌ها: {sorted(set(result.class_names))}")
+    
+    print("\n✓ مثال ۱۱ تمام شد")
+
+
+def example_12_onnx_backend(images=("test1.jpg", "test2.jpg", "test3.jpg", "test4.jpg")):
+    """
+    مثال ۱۲: اجرای مدل با ONNX Runtime و بررسی برابری عددی با PyTorch
+    Example 12: ONNX Runtime backend with a numerical parity check
+    
+    مدل یک بار به ONNX صادر می‌شود (کنار فایل وزن‌ها کش می‌شود) و خروجی
+    آن روی همان ورودی با اجرای eager مدل PyTorch مقایسه می‌شود.
+    
+    نویسنده: رضا صفری فروشانی - https://github.com/reza123reza
+    """
+    print("\n" + "═"*80)
+    print("مثال ۱۲: backend سریع ONNX Runtime")
+    print("Example 12: ONNX Runtime Backend")
+    print("═"*80)
+    
+    detector = YOLOv5Detector(weights='yolov5s.pt', conf_threshold=0.4, engine='inprocess',
+                              backend='onnx', verbose=True)
+    detector.setup_environment()
+    
+    # بدون تصویر نمونه، مقایسه روی تصاویر مصنوعی انجام می‌شود
+    images = [image for image in images if os.path.exists(image)] or None
+    parity = detector.check_parity(images)
+    print(f"\n📊 بیشینه اختلاف مطلق: {parity['max_abs_diff']:.2e} | "
+          f"تشخیص‌های منطبق: {parity['matched']} از {parity['detections_eager']}")
+    print("✓ خروجی ONNX Runtime با PyTorch یکسان است" if parity['passed']
+          else "⚠ خروجی ONNX Runtime با PyTorch اختلاف دارد")
+    
+    if images:
+        detector.detect_images(images, save=False, return_detections=True)
+    
+    print("\n✓ مثال ۱۲ تمام شد")
+
+
 def show_all_classes():
     """
     نمایش تمام کلاس‌های قابل تشخیص
@@ -220,7 +378,7 @@ def show_all_classes():
     print("Show All Detectable Classes")
     print("═"*80)
     
-    detector = YOLOv5Detector()
+    detector = YOLOv5Detector(verbose=True)
     detector.print_classes()
 
 
@@ -261,8 +419,12 @@ def main():
         print("6.  تشخیص با دقت بالا / High Accuracy Detection")
         print("7.  تشخیص سریع / Fast Detection")
         print("8.  تشخیص حیوانات / Detect Animals")
-        print("9.  نمایش لیست کلاس‌ها / Show All Classes")
-        print("10. اجرای همه مثال‌ها / Run All Examples")
+        print("9.  تشخیص موازی / Parallel Detection")
+        print("10. تشخیص آبشاری / Cascade Detection")
+        print("11. تشخیص با کاشی‌بندی / Tiled Detection")
+        print("12. backend سریع ONNX / ONNX Runtime Backend")
+        print("13. نمایش لیست کلاس‌ها / Show All Classes")
+        print("14. اجرای همه مثال‌ها / Run All Examples")
         print("0.  خروج / Exit")
         print("═" * 80)
         
@@ -285,8 +447,16 @@ def main():
         elif choice == '8':
             example_8_animals_detection()
         elif choice == '9':
-            show_all_classes()
+            example_9_parallel_detection()
         elif choice == '10':
+            example_10_cascade_detection()
+        elif choice == '11':
+            example_11_tiled_detection()
+        elif choice == '12':
+            example_12_onnx_backend()
+        elif choice == '13':
+            show_all_classes()
+        elif choice == '14':
             print("\n" + "═" * 80)
             print("اجرای همه مثال‌ها...")
             print("Running all examples...")
@@ -299,6 +469,10 @@ def main():
             example_6_high_accuracy()
             example_7_fast_detection()
             example_8_animals_detection()
+            example_9_parallel_detection()
+            example_10_cascade_detection()
+            example_11_tiled_detection()
+            example_12_onnx_backend()
             show_all_classes()
             print("\n✓ همه مثال‌ها اجرا شدند")
         elif choice == '0':
@@ -0,0 +1,54 @@
+"""
+تنظیمات مشترک تست‌ها
+
+تست‌هایی که به مدل واقعی نیاز دارند از پوشه YOLOv5 (متغیر محیطی YOLOV5_PATH
+یا پوشه yolov5 کنار ماژول که setup_environment می‌سازد) و فایل وزن‌های موجود
+در آن (متغیر محیطی YOLOV5_WEIGHTS، پیش‌فرض yolov5s.pt) استفاده می‌کنند و در
+نبود آن‌ها رد (skip) می‌شوند؛ هیچ دانلودی در تست‌ها انجام نمی‌شود.
+
+نوشته شده توسط: رضا صفری فروشانی
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture(scope='session')
+def yolov5_path() -> Path:
+    path = Path(os.environ.get('YOLOV5_PATH', ROOT / 'yolov5')).resolve()
+    if not (path / 'detect.py').exists():
+        pytest.skip(f"پوشه YOLOv5 پیدا نشد: {path} (YOLOV5_PATH را تنظیم کنید)")
+    return path
+
+
+@pytest.fixture(scope='session')
+def weights(yolov5_path) -> str:
+    name = os.environ.get('YOLOV5_WEIGHTS', 'yolov5s.pt')
+    # مسیر مطلق تا detect.py نام فایل را شناسه مخزن Hugging Face فرض نکند
+    for path in (yolov5_path / name, Path(name).resolve()):
+        if path.exists():
+            return str(path)
+    pytest.skip(f"فایل وزن‌ها پیدا نشد: {name} (YOLOV5_WEIGHTS را تنظیم کنید)")
+
+
+@pytest.fixture
+def make_detector(yolov5_path, weights):
+    """
+    ساخت تشخیص‌دهنده درون‌پردازه‌ای روی پوشه YOLOv5 تست (بدون setup_environment)
+    """
+    from yolov5_object_detection import YOLOv5Detector
+    
+    def make(**kwargs):
+        options = {'weights': weights, 'engine': 'inprocess', 'img_size': 320, 'raise_errors': True}
+        options.update(kwargs)
+        detector = YOLOv5Detector(**options)
+        detector.yolov5_path = yolov5_path
+        return detector
+    
+    return make
@@ -0,0 +1,42 @@
+"""
+تست اجرای همزمان تشخیص از چند نخ و چند نمونه تشخیص‌دهنده
+
+تشخیص‌دهنده دایرکتوری کاری پروسه را تغییر نمی‌دهد، پس نتایج موازی باید
+با اجرای ترتیبی یکسان باشند.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def images(tmp_path):
+    cv2 = pytest.importorskip('cv2')
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(4):
+        path = tmp_path / f"image{i}.jpg"
+        cv2.imwrite(str(path), rng.integers(0, 256, (240, 320, 3), dtype=np.uint8))
+        paths.append(str(path))
+    return paths
+
+
+@pytest.mark.parametrize('engine', ['subprocess', 'inprocess'])
+def test_parallel_detection_matches_sequential(make_detector, images, engine):
+    detectors = [make_detector(engine=engine, conf_threshold=0.01) for _ in range(2)]
+    
+    def run(index, image):
+        detector = detectors[index % len(detectors)]
+        detections = detector.detect_image(image, show_result=False, return_detections=True)
+        return detections.to_array().tolist()
+    
+    cwd = os.getcwd()
+    sequential = [run(i, image) for i, image in enumerate(images)]
+    with ThreadPoolExecutor(max_workers=len(images)) as executor:
+        parallel = list(executor.map(run, range(len(images)), images))
+    
+    assert os.getcwd() == cwd
+    assert parallel == sequential
@@ -0,0 +1,36 @@
+"""
+تست backend‌های ONNX Runtime: برابری عددی با PyTorch و ساخت یک‌باره جلسه
+"""
+
+import pytest
+
+onnxruntime = pytest.importorskip('onnxruntime')
+pytest.importorskip('onnx')
+
+
+def test_onnx_matches_pytorch(make_detector):
+    detector = make_detector(backend='onnx')
+    
+    parity = detector.check_parity(num_images=2)
+    
+    assert parity['passed'], parity
+    assert parity['matched'] == parity['detections_eager'] == parity['detections_backend']
+
+
+def test_onnx_session_is_built_once_with_thread_budget(make_detector, monkeypatch):
+    import torch
+    
+    sessions = []
+    original = onnxruntime.InferenceSession
+    
+    def spy(*args, **kwargs):
+        sessions.append(kwargs.get('sess_options'))
+        return original(*args, **kwargs)
+    
+    detector = make_detector(backend='onnx')
+    detector.export('onnx')  # صدور خارج از شمارش (ممکن است خودش جلسه بسازد)
+    monkeypatch.setattr(onnxruntime, 'InferenceSession', spy)
+    detector._load_model()
+    
+    assert len(sessions) == 1
+    assert sessions[0].intra_op_num_threads == torch.get_num_threads()
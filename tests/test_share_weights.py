@@ -0,0 +1,21 @@
+"""
+تست share_weights: بارگذاری با mmap بدون تغییر تنظیمات سراسری torch
+"""
+
+import numpy as np
+import pytest
+
+
+def test_mmap_model_matches_regular_load(make_detector):
+    serialization = pytest.importorskip('torch.utils.serialization')
+    before = serialization.config.load.mmap
+    
+    images = [np.full((240, 320, 3), value, dtype=np.uint8) for value in (64, 192)]
+    regular = make_detector(conf_threshold=0.01)._run_model(images)
+    shared_detector = make_detector(conf_threshold=0.01, share_weights=True)
+    shared = shared_detector._run_model(images)
+    
+    assert serialization.config.load.mmap == before
+    assert type(shared_detector._load_model()).__name__ == '_MmapTorchModel'
+    for expected, actual in zip(regular, shared):
+        np.testing.assert_allclose(actual, expected, atol=1e-3)
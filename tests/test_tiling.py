@@ -0,0 +1,75 @@
+"""
+تست ادغام تشخیص‌های کاشی‌ها (_merge_tiled_detections) روی کادرهای ساختگی
+"""
+
+import numpy as np
+import pytest
+
+pytest.importorskip('torch')
+
+from yolov5_object_detection import _merge_tiled_detections, _tile_windows
+
+# چهار کاشی 640 پیکسلی روی تصویر 1000×1000 و یک گذر سراسری (شماره 4)
+WINDOWS = _tile_windows(1000, 1000, tile_size=640, overlap=0.2) + [(0, 0, 1000, 1000)]
+GLOBAL = 4
+
+
+def merge(*boxes, windows=WINDOWS, global_index=GLOBAL, merge='fusion'):
+    # هر کادر: x1, y1, x2, y2, conf, cls, شماره کاشی
+    det = np.array(boxes, dtype=np.float32)
+    merged = _merge_tiled_detections(det, 0.45, merge, windows, global_index)
+    return np.round(merged[:, :5].astype(float), 3).tolist()
+
+
+def test_tile_windows_cover_image_with_overlap():
+    assert _tile_windows(1000, 1000, 640, 0.2) == [
+        (0, 0, 640, 640), (360, 0, 1000, 640), (0, 360, 640, 1000), (360, 360, 1000, 1000)
+    ]
+    assert _tile_windows(300, 200, 640, 0.2) == [(0, 0, 300, 200)]
+
+
+def test_global_box_does_not_swallow_small_boxes_inside_it():
+    merged = merge([0, 0, 1000, 1000, 0.5, 0, GLOBAL],
+                   [100, 100, 150, 150, 0.9, 0, 0],
+                   [300, 300, 380, 380, 0.8, 0, 0])
+    
+    assert merged == [[100, 100, 150, 150, 0.9], [300, 300, 380, 380, 0.8], [0, 0, 1000, 1000, 0.5]]
+
+
+def test_global_duplicate_of_tile_box_is_suppressed():
+    merged = merge([100, 100, 200, 200, 0.6, 0, GLOBAL], [101, 101, 200, 200, 0.9, 0, 0])
+    
+    assert merged == [[101, 101, 200, 200, 0.9]]
+
+
+def test_distinct_objects_in_neighbouring_tiles_stay_separate():
+    merged = merge([400, 100, 500, 200, 0.9, 0, 0], [450, 100, 560, 200, 0.8, 0, 1])
+    
+    assert len(merged) == 2
+
+
+def test_object_cut_at_tile_border_is_fused():
+    merged = merge([600, 100, 640, 200, 0.9, 0, 0], [600, 100, 700, 200, 0.8, 0, 1])
+    
+    assert merged == [[600, 100, 700, 200, 0.9]]
+
+
+def test_object_cut_at_border_of_tiles_without_overlap_is_fused():
+    windows = _tile_windows(1280, 640, 640, 0.0)
+    merged = merge([600, 100, 640, 200, 0.9, 0, 0], [640, 102, 700, 198, 0.8, 0, 1],
+                   windows=windows, global_index=None)
+    
+    assert merged == [[600, 100, 700, 200, 0.9]]
+
+
+def test_different_classes_are_never_merged():
+    merged = merge([600, 100, 640, 200, 0.9, 0, 0], [600, 100, 700, 200, 0.8, 1, 1])
+    
+    assert len(merged) == 2
+
+
+def test_nms_merge_keeps_only_duplicates_out():
+    merged = merge([400, 100, 500, 200, 0.9, 0, 0], [401, 101, 500, 200, 0.8, 0, 1],
+                   [600, 100, 640, 200, 0.7, 0, 0], merge='nms')
+    
+    assert merged == [[400, 100, 500, 200, 0.9], [600, 100, 640, 200, 0.7]]
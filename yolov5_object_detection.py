@@ -39,398 +39,4116 @@
 
 import os
 import sys
+import glob
+import argparse
+import asyncio
+import contextlib
+import functools
+import json
+import logging
+import queue
+import re
+import time
+import uuid
+import sqlite3
+import hashlib
+import platform
+import importlib.metadata
+import itertools
+import inspect
+import io
 import subprocess
 import shutil
+import threading
+import warnings
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
-from typing import Optional, List, Union
+from typing import Optional, List, Union, Iterable, Iterator, Tuple, Callable
+from urllib.parse import parse_qs, urlparse
 
 
-class YOLOv5Detector:
+# خروجی کتابخانه از طریق logging منتشر می‌شود؛ به طور پیش‌فرض چیزی چاپ نمی‌شود
+logger = logging.getLogger("yolov5_object_detection")
+logger.addHandler(logging.NullHandler())
+
+# رکوردهای ساختاریافته تشخیص (هر رکورد یک خط JSON)
+detection_logger = logging.getLogger("yolov5_object_detection.detections")
+
+
+def _enable_console_logging(level: int = logging.INFO):
     """
-    کلاس اصلی برای تشخیص اشیاء با YOLOv5
+    نمایش پیام‌های کتابخانه روی خروجی استاندارد (حالت verbose و منوی تعاملی)
     
-    این کلاس تمام عملیات مورد نیاز برای تشخیص اشیاء با استفاده از
-    مدل‌های از پیش آموزش‌دیده YOLOv5 را فراهم می‌کند.
+    فراخوانی‌های تکراری هندلر جدیدی اضافه نمی‌کنند.
+    
+    Args:
+        level: سطح logging (مثال: logging.INFO یا logging.DEBUG)
+    
+    نوشته شده توسط: رضا صفری فروشانی
+    """
+    if not any(getattr(handler, '_yolov5_console', False) for handler in logger.handlers):
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        handler._yolov5_console = True
+        logger.addHandler(handler)
+        # بدون انتشار به root تا با basicConfig کتابخانه‌های دیگر پیام‌ها دو بار چاپ نشوند
+        logger.propagate = False
+    if logger.level == logging.NOTSET or logger.level > level:
+        logger.setLevel(level)
+
+
+class YOLOv5Error(Exception):
+    """پایه تمام خطاهای این ماژول"""
+
+
+class EnvironmentNotReadyError(YOLOv5Error, RuntimeError):
+    """محیط YOLOv5 هنوز با setup_environment() آماده نشده است"""
+
+
+class SetupError(YOLOv5Error):
+    """نصب پکیج‌ها یا دانلود YOLOv5 ناموفق بود"""
+
+
+class SourceNotFoundError(YOLOv5Error, FileNotFoundError):
+    """تصویر، ویدیو یا منبع فریم پیدا نشد یا باز نشد"""
+
+
+class ImageReadError(YOLOv5Error, ValueError):
+    """محتوای تصویر قابل رمزگشایی نیست"""
+
+
+class DetectionError(YOLOv5Error):
+    """
+    اجرای تشخیص ناموفق بود
+    
+    Attributes:
+        stderr (str): خروجی خطای detect.py (فقط موتور subprocess)
+        returncode (int): کد خروج detect.py (فقط موتور subprocess)
+    """
+    
+    def __init__(self, message: str, stderr: Optional[str] = None, returncode: Optional[int] = None):
+        super().__init__(message)
+        self.stderr = stderr
+        self.returncode = returncode
+
+
+@dataclass
+class Detections:
+    """
+    نتیجه ساختاریافته تشخیص در یک تصویر
+    
+    تمام آرایه‌ها NumPy و پیوسته (contiguous) هستند و مختصات در فضای
+    تصویر اصلی قرار دارند.
+    
+    Attributes:
+        boxes (np.ndarray): کادرها با شکل (N, 4) و نوع float32 به صورت x1, y1, x2, y2
+        scores (np.ndarray): امتیاز اطمینان با شکل (N,) و نوع float32
+        class_ids (np.ndarray): شماره کلاس با شکل (N,) و نوع int16
+        class_names (list): نام کلاس هر تشخیص (از get_coco_classes)
+        image_path (str): مسیر تصویر ورودی (در صورت وجود)
+        image_shape (tuple): ابعاد تصویر ورودی (ارتفاع، عرض)
+        output_path (str): مسیر تصویر حاشیه‌نویسی شده (None اگر ذخیره نشده باشد)
     
     نویسنده: رضا صفری فروشانی
-    ایمیل: safarireza@gmail.com
-    گیتهاب: https://github.com/reza123reza
+    """
+    
+    boxes: "np.ndarray"
+    scores: "np.ndarray"
+    class_ids: "np.ndarray"
+    class_names: List[str] = field(default_factory=list)
+    image_path: Optional[str] = None
+    image_shape: Optional[tuple] = None
+    output_path: Optional[str] = None
+    
+    def __len__(self) -> int:
+        return len(self.scores)
+    
+    @classmethod
+    def from_array(cls,
+                   det,
+                   names: dict,
+                   image_path: Optional[str] = None,
+                   image_shape: Optional[tuple] = None) -> "Detections":
+        """
+        ساخت نتیجه از آرایه (N×6) شامل x1, y1, x2, y2, conf, cls
+        
+        Args:
+            det: آرایه یا تنسور خروجی مدل
+            names: دیکشنری شماره و نام کلاس‌ها
+            image_path: مسیر تصویر ورودی
+            image_shape: ابعاد تصویر ورودی
+        
+        Returns:
+            Detections: نتیجه ساختاریافته
+        """
+        import numpy as np
+        
+        det = np.asarray(det, dtype=np.float32).reshape(-1, 6)
+        class_ids = det[:, 5].astype(np.int16)
+        
+        return cls(
+            boxes=np.ascontiguousarray(det[:, :4]),
+            scores=np.ascontiguousarray(det[:, 4]),
+            class_ids=class_ids,
+            class_names=[names.get(int(c), str(int(c))) for c in class_ids],
+            image_path=image_path,
+            image_shape=tuple(image_shape[:2]) if image_shape is not None else None,
+        )
+    
+    def to_array(self):
+        """
+        تبدیل به آرایه (N×6) برای رسم یا پردازش بعدی
+        """
+        import numpy as np
+        
+        return np.concatenate([
+            self.boxes,
+            self.scores[:, None],
+            self.class_ids[:, None].astype(np.float32),
+        ], axis=1)
+    
+    def to_dict(self) -> dict:
+        """
+        تبدیل به دیکشنری قابل تبدیل به JSON (برای سرور HTTP و ذخیره نتایج)
+        """
+        return {
+            'image_path': self.image_path,
+            'image_shape': list(self.image_shape) if self.image_shape is not None else None,
+            'output_path': self.output_path,
+            'detections': [
+                {
+                    'box': [round(float(v), 2) for v in box],
+                    'score': round(float(score), 4),
+                    'class_id': int(class_id),
+                    'class_name': name,
+                }
+                for box, score, class_id, name in zip(self.boxes, self.scores,
+                                                      self.class_ids, self.class_names)
+            ],
+        }
+
+
+class PipelineStats:
+    """
+    زمان‌بندی مراحل خط لوله تشخیص
+    
+    مراحل: load (بارگذاری مدل)، decode (خواندن تصویر/فریم)، preprocess
+    (letterbox و نرمال‌سازی)، inference، nms، render (رسم کادرها) و save.
+    مجموع زمان‌ها برای تمام فراخوانی‌ها جمع می‌شود و زمان مراحل آخرین
+    فراخوانی کامل (مثلاً یک detect_image یا یک دسته سرور) در last قرار می‌گیرد.
     
     Attributes:
-        weights (str): مسیر یا نام فایل وزن‌های مدل
-        conf_threshold (float): آستانه اطمینان برای تشخیص (0-1)
-        yolov5_path (Path): مسیر پوشه YOLOv5
+        totals (dict): مجموع زمان هر مرحله (ثانیه)
+        counts (dict): تعداد دفعات اجرای هر مرحله
+        calls (int): تعداد فراخوانی‌های کامل ثبت‌شده
+        last (dict): زمان مراحل آخرین فراخوانی (ثانیه) به همراه total
+    
+    نویسنده: رضا صفری فروشانی
+    """
+    
+    STAGES = ('load', 'decode', 'preprocess', 'inference', 'nms', 'render', 'save')
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+    
+    def reset(self):
+        """
+        صفر کردن تمام آمار
+        """
+        with self._lock:
+            self.totals = dict.fromkeys(self.STAGES, 0.0)
+            self.counts = dict.fromkeys(self.STAGES, 0)
+            self.calls = 0
+            self.last = {}
+    
+    def record(self, stage: str, seconds: float):
+        """
+        ثبت زمان اجرای یک مرحله
+        """
+        with self._lock:
+            self.totals[stage] = self.totals.get(stage, 0.0) + seconds
+            self.counts[stage] = self.counts.get(stage, 0) + 1
+        
+        current = getattr(self._local, 'current', None)
+        if current is not None:
+            current[stage] = current.get(stage, 0.0) + seconds
+    
+    def summary(self) -> dict:
+        """
+        خلاصه آمار مراحل اجرا شده
+        
+        Returns:
+            dict: برای هر مرحله count، total_ms و mean_ms
+        """
+        with self._lock:
+            return {
+                stage: {
+                    'count': self.counts[stage],
+                    'total_ms': round(self.totals[stage] * 1000, 3),
+                    'mean_ms': round(self.totals[stage] * 1000 / self.counts[stage], 3),
+                }
+                for stage in self.totals if self.counts[stage]
+            }
+    
+    def report(self) -> str:
+        """
+        ثبت جدول زمان مراحل در logger ماژول
+        
+        Returns:
+            str: متن جدول (برای چاپ یا ذخیره توسط فراخواننده)
+        """
+        summary = self.summary()
+        total = sum(item['total_ms'] for item in summary.values()) or 1.0
+        
+        lines = [f"⏱️  زمان مراحل ({self.calls} فراخوانی)", "-" * 60]
+        for stage, item in summary.items():
+            lines.append(f"  {stage:<12} {item['count']:>7}  {item['total_ms']:>11.1f} ms  "
+                         f"{item['mean_ms']:>9.2f} ms  {item['total_ms'] / total:>6.1%}")
+        text = "\n".join(lines)
+        logger.info(text)
+        return text
+    
+    def _begin_call(self) -> bool:
+        # فقط بیرونی‌ترین فراخوانی در هر نخ ثبت می‌شود (detect_image → _detect_batch)
+        if getattr(self._local, 'current', None) is not None:
+            return False
+        self._local.current = {}
+        return True
+    
+    def _end_call(self, seconds: float) -> dict:
+        timings, self._local.current = self._local.current, None
+        timings['total'] = seconds
+        with self._lock:
+            self.last = timings
+            self.calls += 1
+        return timings
+
+
+class MetricsSink:
+    """
+    رابط ثبت متریک‌ها برای تشخیص‌دهنده‌های طولانی‌مدت
+    
+    پیاده‌سازی پیش‌فرض هیچ کاری انجام نمی‌دهد. برای ارسال متریک‌ها به سامانه
+    دلخواه (StatsD، OpenTelemetry و ...) کافی است از این کلاس ارث‌بری کرده و
+    سه متد زیر را بازنویسی کنید؛ PrometheusMetrics پیاده‌سازی داخلی است.
+    
+    متریک‌های ثبت‌شده توسط YOLOv5Detector:
+        yolov5_images_processed_total            تصاویر عبور کرده از مدل
+        yolov5_detections_total{class}           تعداد تشخیص‌ها به تفکیک نام کلاس
+        yolov5_stage_seconds{stage}              زمان مراحل خط لوله (هیستوگرام)
+        yolov5_batch_size                        اندازه دسته‌های مدل (هیستوگرام)
+        yolov5_cache_requests_total{result}      درخواست‌های کش (hit / miss)
+        yolov5_errors_total{reason}              خطاها
+        yolov5_queue_depth{queue}                عمق صف‌ها
+    
+    نویسنده: رضا صفری فروشانی
+    """
+    
+    def inc(self, name: str, value: float = 1.0, labels: Optional[dict] = None):
+        """افزایش یک شمارنده"""
+    
+    def observe(self, name: str, value: float, labels: Optional[dict] = None):
+        """ثبت یک مقدار در هیستوگرام"""
+    
+    def set(self, name: str, value: float, labels: Optional[dict] = None):
+        """تنظیم مقدار یک gauge"""
+
+
+# نوع، توضیح و مرزهای هیستوگرام متریک‌های شناخته‌شده
+_METRIC_SPECS = {
+    'yolov5_images_processed_total': ('counter', "Images passed through the model", None),
+    'yolov5_detections_total': ('counter', "Detections by class name", None),
+    'yolov5_stage_seconds': ('histogram', "Pipeline stage duration in seconds",
+                             (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)),
+    'yolov5_batch_size': ('histogram', "Images per model call", (1, 2, 4, 8, 16, 32, 64, 128)),
+    'yolov5_cache_requests_total': ('counter', "Result cache lookups by result", None),
+    'yolov5_cascade_images_total': ('counter', "Cascade images by result (accepted or escalated)", None),
+    'yolov5_errors_total': ('counter', "Errors by reason", None),
+    'yolov5_queue_depth': ('gauge', "Items waiting in a queue", None),
+    'yolov5_requests_total': ('counter', "HTTP detection requests by status code", None),
+    'yolov5_request_seconds': ('histogram', "HTTP detection request latency in seconds",
+                               (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)),
+}
+
+
+class PrometheusMetrics(MetricsSink):
+    """
+    ثبت متریک‌ها در حافظه و تولید خروجی متنی قالب Prometheus
+    
+    خروجی از مسیر /metrics سرور تشخیص، با exposition() یا به صورت فایل
+    (dump / start_dump برای textfile collector در node_exporter) در دسترس است.
+    
+    مثال:
+        metrics = PrometheusMetrics()
+        detector = YOLOv5Detector(engine='inprocess', metrics=metrics)
+        metrics.start_dump('/var/lib/node_exporter/yolov5.prom', interval=15)
+    
+    نوشته شده توسط: رضا صفری فروشانی
+    """
+    
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._dump_stop = None
+    
+    def describe(self, name: str, kind: str, help_text: str = '',
+                 buckets: Optional[Tuple[float, ...]] = None):
+        """
+        تعریف صریح یک متریک (نوع: counter، gauge یا histogram)
+        """
+        with self._lock:
+            self._metric(name, kind, help_text, buckets)
+    
+    def inc(self, name: str, value: float = 1.0, labels: Optional[dict] = None):
+        with self._lock:
+            series = self._metric(name, 'counter')['series']
+            key = self._label_key(labels)
+            series[key] = series.get(key, 0.0) + value
+    
+    def set(self, name: str, value: float, labels: Optional[dict] = None):
+        with self._lock:
+            self._metric(name, 'gauge')['series'][self._label_key(labels)] = float(value)
+    
+    def observe(self, name: str, value: float, labels: Optional[dict] = None):
+        with self._lock:
+            metric = self._metric(name, 'histogram')
+            key = self._label_key(labels)
+            state = metric['series'].get(key)
+            if state is None:
+                state = metric['series'][key] = [[0] * len(metric['buckets']), 0.0, 0]
+            for i, bound in enumerate(metric['buckets']):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+    
+    def exposition(self) -> str:
+        """
+        خروجی متنی همه متریک‌ها (Prometheus text format 0.0.4)
+        """
+        lines = []
+        with self._lock:
+            for name, metric in self._metrics.items():
+                if metric['help']:
+                    lines.append(f"# HELP {name} {metric['help']}")
+                lines.append(f"# TYPE {name} {metric['type']}")
+                
+                for key, value in metric['series'].items():
+                    if metric['type'] != 'histogram':
+                        lines.append(f"{name}{self._format_labels(key)} {value:g}")
+                        continue
+                    
+                    counts, total, count = value
+                    for bound, bucket_count in zip(metric['buckets'], counts):
+                        lines.append(f"{name}_bucket{self._format_labels(key, ('le', f'{bound:g}'))} "
+                                     f"{bucket_count}")
+                    lines.append(f"{name}_bucket{self._format_labels(key, ('le', '+Inf'))} {count}")
+                    lines.append(f"{name}_sum{self._format_labels(key)} {total:g}")
+                    lines.append(f"{name}_count{self._format_labels(key)} {count}")
+        
+        return '\n'.join(lines) + '\n'
+    
+    def dump(self, path: Union[str, Path]):
+        """
+        نوشتن اتمیک خروجی متنی در فایل
+        """
+        path = Path(path)
+        temp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        temp.write_text(self.exposition(), encoding='utf-8')
+        os.replace(temp, path)
+    
+    def start_dump(self, path: Union[str, Path], interval: float = 15.0):
+        """
+        نوشتن دوره‌ای خروجی در فایل در یک نخ پس‌زمینه (تا فراخوانی stop_dump)
+        """
+        self.stop_dump()
+        stop = self._dump_stop = threading.Event()
+        
+        def loop():
+            while not stop.wait(interval):
+                self.dump(path)
+        
+        threading.Thread(target=loop, name="yolov5-metrics-dump", daemon=True).start()
+    
+    def stop_dump(self):
+        """
+        توقف نوشتن دوره‌ای
+        """
+        if self._dump_stop is not None:
+            self._dump_stop.set()
+            self._dump_stop = None
+    
+    def _metric(self, name: str, kind: str, help_text: Optional[str] = None,
+                buckets: Optional[Tuple[float, ...]] = None) -> dict:
+        metric = self._metrics.get(name)
+        if metric is None:
+            spec_kind, spec_help, spec_buckets = _METRIC_SPECS.get(name, (kind, '', None))
+            metric = self._metrics[name] = {
+                'type': spec_kind,
+                'help': help_text if help_text is not None else spec_help,
+                'buckets': tuple(sorted(buckets or spec_buckets or self.DEFAULT_BUCKETS)),
+                'series': {},
+            }
+        return metric
+    
+    @staticmethod
+    def _label_key(labels: Optional[dict]) -> tuple:
+        return tuple(sorted((str(k), str(v)) for k, v in labels.items())) if labels else ()
+    
+    @staticmethod
+    def _format_labels(key: tuple, extra: Optional[tuple] = None) -> str:
+        pairs = list(key) + ([extra] if extra else [])
+        if not pairs:
+            return ''
+        escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+                   for _, value in pairs)
+        return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+# حداکثر تعداد کادر برای اجرای NMS کل دسته در یک فراخوانی
+_SINGLE_NMS_LIMIT = 4000
+
+
+def _nms_grouped(boxes, scores, groups, iou_threshold: float):
+    """
+    NMS گروهی در یک فراخوانی با جابجایی مختصات هر گروه
+    
+    کادرهای هر گروه (مثلاً هر ترکیب تصویر/کلاس) به ناحیه‌ای جدا منتقل
+    می‌شوند تا با کادرهای گروه‌های دیگر همپوشانی نداشته باشند. محاسبه
+    در float64 انجام می‌شود تا جابجایی‌های بزرگ دقت IoU را از بین نبرند.
+    
+    Args:
+        boxes: تنسور (N, 4) به صورت x1, y1, x2, y2
+        scores: تنسور (N,)
+        groups: تنسور (N,) شماره گروه هر کادر
+        iou_threshold: آستانه IoU
+    
+    Returns:
+        تنسور اندیس کادرهای باقی‌مانده به ترتیب نزولی امتیاز
+    """
+    import torch
+    import torchvision
+    
+    if boxes.numel() == 0:
+        return torch.zeros(0, dtype=torch.long, device=boxes.device)
+    
+    boxes = boxes.double()
+    _, compact = torch.unique(groups, return_inverse=True)
+    span = float(boxes.max() - boxes.min()) + 1
+    shifted = boxes + (compact.double() * span)[:, None]
+    return torchvision.ops.nms(shifted, scores.double(), iou_threshold)
+
+
+def _fused_postprocess(prediction,
+                       conf_threshold: float,
+                       iou_threshold: float,
+                       classes: Optional[List[int]] = None,
+                       max_det: int = 1000,
+                       max_nms: int = 30000) -> list:
+    """
+    پس‌پردازش برداری خروجی خام YOLOv5 برای کل دسته
+    
+    ماسک کلاس و آستانه اطمینان پیش از NMS روی تنسور خام اعمال می‌شوند و
+    سپس NMS برای تمام تصاویر و کلاس‌های دسته در یک فراخوانی اجرا می‌شود.
+    
+    Args:
+        prediction: خروجی مدل با شکل (B, A, 5 + nc)
+        conf_threshold: آستانه اطمینان (obj × cls)
+        iou_threshold: آستانه IoU برای NMS
+        classes: لیست شماره کلاس‌های مورد نظر (None = همه کلاس‌ها)
+        max_det: حداکثر تعداد تشخیص برای هر تصویر
+        max_nms: حداکثر تعداد کادر ورودی NMS برای هر تصویر
+    
+    Returns:
+        list: برای هر تصویر یک تنسور (N×6) شامل x1, y1, x2, y2, conf, cls
+    """
+    import torch
+    
+    if isinstance(prediction, (list, tuple)):
+        prediction = prediction[0]
+    
+    batch_size = prediction.shape[0]
+    
+    # ۱) برش اطمینان روی objectness (کران بالای obj × cls) پیش از هر محاسبه دیگر
+    image_index, anchor_index = (prediction[..., 4] > conf_threshold).nonzero(as_tuple=True)
+    candidates = prediction[image_index, anchor_index]
+    
+    # ۲) بهترین کلاس هر کادر، سپس برش اطمینان نهایی و ماسک کلاس‌ها (مانند detect.py)
+    conf, label = (candidates[:, 4:5] * candidates[:, 5:]).max(1)
+    keep = conf > conf_threshold
+    if classes is not None:
+        keep &= torch.isin(label, torch.as_tensor(classes, device=label.device))
+    image_index, candidates, conf, label = image_index[keep], candidates[keep], conf[keep], label[keep]
+    
+    # محدود کردن ورودی NMS به max_nms کادر برتر برای هر تصویر
+    if len(conf) > max_nms * batch_size:
+        top = conf.topk(max_nms * batch_size).indices
+        image_index, candidates, conf, label = image_index[top], candidates[top], conf[top], label[top]
+    
+    # xywh → xyxy
+    xy, wh = candidates[:, :2], candidates[:, 2:4] / 2
+    boxes = torch.cat([xy - wh, xy + wh], 1)
+    
+    detections = torch.cat([boxes, conf[:, None], label[:, None].float()], 1)
+    
+    # ۳) NMS یکجا برای تمام ترکیب‌های (تصویر، کلاس)
+    # هزینه NMS روی CPU با (تعداد کادرهای باقی‌مانده × تعداد ورودی) رشد می‌کند؛ برای
+    # ورودی‌های خیلی بزرگ (مانند torchvision.ops.batched_nms) هر تصویر جدا پردازش می‌شود
+    num_classes = prediction.shape[-1] - 5
+    if len(conf) <= _SINGLE_NMS_LIMIT:
+        kept = _nms_grouped(boxes, conf, image_index * num_classes + label, iou_threshold)
+        detections, kept_images = detections[kept], image_index[kept]
+        return [detections[kept_images == i][:max_det] for i in range(batch_size)]
+    
+    results = []
+    for i in range(batch_size):
+        mask = image_index == i
+        kept = _nms_grouped(boxes[mask], conf[mask], label[mask], iou_threshold)
+        results.append(detections[mask][kept][:max_det])
+    return results
+
+
+def _tile_windows(width: int, height: int, tile_size: int, overlap: float) -> List[Tuple[int, int, int, int]]:
+    """
+    پنجره‌های کاشی (x1, y1, x2, y2) با همپوشانی روی یک تصویر بزرگ
+    
+    آخرین کاشی هر سطر و ستون به لبه تصویر چسبانده می‌شود تا همه کاشی‌ها
+    (به جز در تصاویر کوچک‌تر از tile_size) اندازه کامل داشته باشند.
+    """
+    if not 0 <= overlap < 1:
+        raise ValueError("overlap باید بین 0 و 1 باشد")
+    step = max(1, int(tile_size * (1 - overlap)))
+    
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        return list(range(0, length - tile_size, step)) + [length - tile_size]
+    
+    return [(x, y, min(x + tile_size, width), min(y + tile_size, height))
+            for y in starts(height) for x in starts(width)]
+
+
+# فاصله (پیکسل) لبه کادر از مرز کاشی که کادر را بریده‌شده در آن مرز حساب می‌کند
+_TILE_EDGE_MARGIN = 2.0
+
+
+def _merge_tiled_detections(det,
+                            iou_threshold: float,
+                            merge: str = 'fusion',
+                            windows: Optional[List[Tuple[int, int, int, int]]] = None,
+                            global_index: Optional[int] = None):
+    """
+    ادغام تشخیص‌های کاشی‌ها (و گذر سراسری) در مختصات تصویر اصلی
+    
+    Args:
+        det: آرایه (N×7) شامل x1, y1, x2, y2, conf, cls, شماره کاشی
+        iou_threshold: آستانه همپوشانی
+        merge: 'nms' = NMS کلاسی روی همه کادرها؛
+               'fusion' = دو کادر هم‌کلاس از دو کاشی همسایه که دست‌کم یکی از آن‌ها
+               در مرز مشترک کاشی‌ها بریده شده و IoU آن‌ها در ناحیه مشترک دو کاشی از
+               آستانه بیشتر است در یک کادر (اجتماع دو کادر، بیشینه اطمینان) ادغام
+               می‌شوند؛ سپس کادرهای گذر سراسری و تکراری‌ها با NMS معمولی حذف می‌شوند
+        windows: پنجره‌های کاشی (x1, y1, x2, y2) به ترتیب شماره کاشی (لازم برای fusion)
+        global_index: شماره کاشی گذر سراسری (None = بدون گذر سراسری)
+    
+    Returns:
+        آرایه (N×6) شامل x1, y1, x2, y2, conf, cls
+    """
+    import numpy as np
+    import torch
+    
+    if merge not in ('nms', 'fusion'):
+        raise ValueError(f"merge نامعتبر: {merge} (گزینه‌ها: nms, fusion)")
+    if len(det) == 0:
+        return det[:, :6]
+    
+    def nms(boxes):
+        tensor = torch.from_numpy(np.ascontiguousarray(boxes))
+        keep = _nms_grouped(tensor[:, :4], tensor[:, 4], tensor[:, 5], iou_threshold).numpy()
+        return boxes[keep, :6]
+    
+    if merge == 'nms':
+        return nms(det)
+    if windows is None:
+        raise ValueError("برای merge='fusion' پنجره‌های کاشی (windows) لازم است")
+    
+    # کادرهای گذر سراسری در ادغام شرکت نمی‌کنند و فقط با NMS در برابر کادرهای کاشی‌ها سنجیده می‌شوند
+    is_global = det[:, 6] == global_index if global_index is not None else np.zeros(len(det), dtype=bool)
+    global_det, det = det[is_global], det[~is_global]
+    
+    windows = np.asarray(windows, dtype=np.float32)
+    width, height = windows[:, 2].max(), windows[:, 3].max()
+    m = _TILE_EDGE_MARGIN
+    
+    merged = []
+    for label in np.unique(det[:, 5]):
+        group = det[det[:, 5] == label]
+        group = group[np.argsort(-group[:, 4], kind='stable')]
+        boxes, tiles = group[:, :4], group[:, 6].astype(int)
+        win = windows[tiles]
+        # لبه‌های بریده‌شده هر کادر: چپ، بالا، راست، پایین (فقط مرزهای داخل تصویر)
+        cut = np.stack([(boxes[:, 0] - win[:, 0] <= m) & (win[:, 0] > 0),
+                        (boxes[:, 1] - win[:, 1] <= m) & (win[:, 1] > 0),
+                        (win[:, 2] - boxes[:, 2] <= m) & (win[:, 2] < width),
+                        (win[:, 3] - boxes[:, 3] <= m) & (win[:, 3] < height)], 1)
+        remaining = np.ones(len(group), dtype=bool)
+        
+        # حلقه روی کادرهای نگه‌داشته‌شده؛ مقایسه با بقیه کادرهای همان کلاس برداری است
+        for i in range(len(group)):
+            if not remaining[i]:
+                continue
+            remaining[i] = False
+            candidates = np.nonzero(remaining & (tiles != tiles[i]))[0]
+            box = boxes[i].copy()
+            if len(candidates):
+                wi, wc = win[i], win[candidates]
+                # ناحیه مشترک دو کاشی (با حاشیه، تا کاشی‌های بدون همپوشانی هم پوشش داده شوند)
+                region = np.stack([np.maximum(wi[0], wc[:, 0]) - m, np.maximum(wi[1], wc[:, 1]) - m,
+                                   np.minimum(wi[2], wc[:, 2]) + m, np.minimum(wi[3], wc[:, 3]) + m], 1)
+                neighbours = (region[:, 2] > region[:, 0]) & (region[:, 3] > region[:, 1])
+                # دست‌کم یکی از دو کادر در مرزی بریده شده که به سمت کاشی دیگر است
+                cut_c = cut[candidates]
+                shared = ((cut[i, 0] & (wc[:, 0] < wi[0])) | (cut[i, 1] & (wc[:, 1] < wi[1])) |
+                          (cut[i, 2] & (wc[:, 2] > wi[2])) | (cut[i, 3] & (wc[:, 3] > wi[3])) |
+                          (cut_c[:, 0] & (wi[0] < wc[:, 0])) | (cut_c[:, 1] & (wi[1] < wc[:, 1])) |
+                          (cut_c[:, 2] & (wi[2] > wc[:, 2])) | (cut_c[:, 3] & (wi[3] > wc[:, 3])))
+                # IoU دو کادر پس از برش به ناحیه مشترک (بخشی که هر دو کاشی دیده‌اند)
+                low, high = np.tile(region[:, :2], 2), np.tile(region[:, 2:], 2)
+                a = np.clip(box[None], low, high)
+                b = np.clip(boxes[candidates], low, high)
+                # کاشی‌های بدون همپوشانی در یک محور: فقط محور دیگر مقایسه می‌شود
+                for axis in (0, 1):
+                    thin = region[:, axis + 2] - region[:, axis] <= 2 * m
+                    a[thin, axis], a[thin, axis + 2] = region[thin, axis], region[thin, axis + 2]
+                    b[thin, axis], b[thin, axis + 2] = region[thin, axis], region[thin, axis + 2]
+                inter = (np.clip(np.minimum(a[:, 2], b[:, 2]) - np.maximum(a[:, 0], b[:, 0]), 0, None) *
+                         np.clip(np.minimum(a[:, 3], b[:, 3]) - np.maximum(a[:, 1], b[:, 1]), 0, None))
+                area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+                area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+                iou = inter / np.maximum(area_a + area_b - inter, 1e-9)
+                members = candidates[neighbours & shared & (iou >= iou_threshold)]
+                if len(members):
+                    remaining[members] = False
+                    box[:2] = np.minimum(box[:2], boxes[members, :2].min(0))
+                    box[2:] = np.maximum(box[2:], boxes[members, 2:].max(0))
+            merged.append([*box, group[i, 4], label, -1])
+    
+    merged = np.array(merged, dtype=det.dtype).reshape(-1, 7)
+    return nms(np.concatenate([merged, global_det]))
+
+
+def _detect_tiles(image,
+                  run_batches: Callable[[Iterator[list]], Iterable[list]],
+                  tile_size: int,
+                  overlap: float,
+                  global_pass: bool,
+                  merge: str,
+                  iou_threshold: float,
+                  batch_size: int):
+    """
+    تشخیص کاشی‌به‌کاشی یک تصویر بزرگ و ادغام نتایج
+    
+    کاشی‌ها برش‌های (view) تصویر اصلی هستند و فقط به صورت دسته‌های batch_size
+    به تنسور تبدیل می‌شوند، پس تصویر رمزگشایی‌شده یک بار در حافظه است.
+    
+    Args:
+        image: تصویر BGR
+        run_batches: تابعی که یک iterator از دسته‌های تصویر را گرفته و برای هر
+                دسته لیست آرایه‌های (N×6) را (به همان ترتیب) برمی‌گرداند
+        tile_size: اندازه ضلع کاشی (پیکسل)
+        overlap: نسبت همپوشانی کاشی‌های مجاور (0-1)
+        global_pass: افزودن یک گذر روی کل تصویر کوچک‌شده برای اشیاء بزرگ‌تر از کاشی
+        merge: روش ادغام ('nms' یا 'fusion'، به _merge_tiled_detections مراجعه کنید)
+        iou_threshold: آستانه همپوشانی ادغام
+        batch_size: تعداد کاشی‌ها در هر فراخوانی مدل
+    
+    Returns:
+        tuple: (آرایه N×6 در مختصات تصویر اصلی، تعداد کاشی‌ها)
+    """
+    import numpy as np
+    
+    height, width = image.shape[:2]
+    windows = _tile_windows(width, height, tile_size, overlap)
+    global_index = len(windows) if global_pass and len(windows) > 1 else None
+    if global_index is not None:
+        windows.append((0, 0, width, height))
+    
+    def batches():
+        for start in range(0, len(windows), batch_size):
+            yield [image[y1:y2, x1:x2] for x1, y1, x2, y2 in windows[start:start + batch_size]]
+    
+    parts = []
+    index = 0
+    for results in run_batches(batches()):
+        for det in results:
+            x1, y1 = windows[index][:2]
+            det = np.asarray(det, dtype=np.float32)
+            if len(det):
+                det = det.copy()
+                det[:, [0, 2]] += x1
+                det[:, [1, 3]] += y1
+                parts.append(np.concatenate([det, np.full((len(det), 1), index, dtype=np.float32)], 1))
+            index += 1
+    
+    det = np.concatenate(parts) if parts else np.zeros((0, 7), dtype=np.float32)
+    return _merge_tiled_detections(det, iou_threshold, merge, windows, global_index), len(windows)
+
+
+class _FrameSelector:
+    """
+    انتخاب فریم‌هایی که باید از مدل عبور کنند
+    
+    فریم‌ها با گام ثابت (frame_stride) انتخاب می‌شوند و در حالت تطبیقی،
+    فریمی که اختلاف نسخه کوچک‌شده خاکستری آن با آخرین فریم پردازش‌شده
+    کمتر از motion_threshold باشد نیز رد می‌شود تا تشخیص‌های قبلی
+    برای آن استفاده شوند.
+    """
+    
+    def __init__(self,
+                 frame_stride: int = 1,
+                 motion_threshold: Optional[float] = None,
+                 size: Tuple[int, int] = (64, 36)):
+        if frame_stride < 1:
+            raise ValueError("frame_stride باید حداقل 1 باشد")
+        
+        self.frame_stride = frame_stride
+        self.motion_threshold = motion_threshold
+        self.size = size
+        self.skipped = 0
+        self._last = None
+    
+    def should_infer(self, index: int, frame) -> bool:
+        """
+        Returns:
+            bool: True اگر فریم باید از مدل عبور کند
+        """
+        if index % self.frame_stride:
+            self.skipped += 1
+            return False
+        
+        if self.motion_threshold is None:
+            return True
+        
+        import cv2
+        import numpy as np
+        
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        small = cv2.resize(gray, self.size, interpolation=cv2.INTER_AREA).astype(np.float32)
+        
+        # اختلاف میانگین نرمال‌شده (0-1) با آخرین فریم پردازش‌شده
+        if self._last is not None and \
+                float(np.mean(np.abs(small - self._last))) / 255 < self.motion_threshold:
+            self.skipped += 1
+            return False
+        
+        self._last = small
+        return True
+
+
+class _LatestFrameSlot:
+    """
+    بافر تک‌خانه‌ای «آخرین فریم برنده» برای حالت زنده
+    
+    نخ دریافت همیشه فریم قبلی را بازنویسی می‌کند، بنابراین اگر استنتاج
+    از دوربین کندتر باشد فریم‌های قدیمی دور ریخته می‌شوند و تأخیر
+    نمایش افزایش نمی‌یابد.
+    """
+    
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._item = None
+        self.closed = False
+        self.dropped = 0
+    
+    def put(self, item):
+        with self._condition:
+            if self._item is not None:
+                self.dropped += 1
+            self._item = item
+            self._condition.notify()
+    
+    def get(self, timeout: Optional[float] = None):
+        """
+        Returns:
+            آخرین آیتم یا None اگر تا پایان timeout فریم جدیدی نرسید
+        """
+        with self._condition:
+            if self._item is None and not self.closed:
+                self._condition.wait(timeout)
+            item, self._item = self._item, None
+            return item
+    
+    def close(self):
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+
+class _ResultCache:
+    """
+    کش نتایج تشخیص با کلید هش محتوای تصویر و تنظیمات مدل
+    
+    دو لایه دارد: یک LRU در حافظه و یک لایه اختیاری روی دیسک (SQLite)
+    که با عبور حجم داده‌های ذخیره‌شده از max_disk_bytes، قدیمی‌ترین
+    موارد (بر اساس زمان آخرین دسترسی) را حذف می‌کند.
     """
     
-    def __init__(self, weights: str = 'yolov5m.pt', conf_threshold: float = 0.7):
+    def __init__(self,
+                 max_entries: int = 1024,
+                 cache_dir: Optional[str] = None,
+                 max_disk_bytes: int = 256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._disk_bytes = 0
+        
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._db = sqlite3.connect(
+                os.path.join(cache_dir, 'detections.sqlite'),
+                check_same_thread=False,
+                isolation_level=None,
+            )
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS detections ("
+                "key TEXT PRIMARY KEY, height INTEGER, width INTEGER, "
+                "data BLOB, size INTEGER, accessed REAL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS detections_accessed ON detections (accessed)"
+            )
+            self._disk_bytes = self._db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM detections"
+            ).fetchone()[0]
+    
+    @staticmethod
+    def make_key(data: bytes, config: str) -> str:
+        """
+        کلید کش: SHA-256 بایت‌های تصویر به همراه تنظیمات مدل
+        """
+        digest = hashlib.sha256(data)
+        digest.update(config.encode('utf-8'))
+        return digest.hexdigest()
+    
+    def get(self, key: str):
+        """
+        Returns:
+            tuple: (آرایه N×6، ابعاد تصویر) یا None در صورت نبودن در کش
+        """
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return item
+            
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT height, width, data FROM detections WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    import numpy as np
+                    
+                    self._db.execute(
+                        "UPDATE detections SET accessed = ? WHERE key = ?", (time.time(), key)
+                    )
+                    item = (np.frombuffer(row[2], dtype=np.float32).reshape(-1, 6), (row[0], row[1]))
+                    self._remember(key, item)
+                    self.hits += 1
+                    return item
+            
+            self.misses += 1
+            return None
+    
+    def put(self, key: str, det, shape: tuple):
+        import numpy as np
+        
+        det = np.ascontiguousarray(det, dtype=np.float32).reshape(-1, 6)
+        item = (det, tuple(shape[:2]))
+        
+        with self._lock:
+            self._remember(key, item)
+            
+            if self._db is not None:
+                data = det.tobytes()
+                old = self._db.execute(
+                    "SELECT size FROM detections WHERE key = ?", (key,)
+                ).fetchone()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO detections VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, item[1][0], item[1][1], data, len(data), time.time())
+                )
+                self._disk_bytes += len(data) - (old[0] if old else 0)
+                if self._disk_bytes > self.max_disk_bytes:
+                    self._evict_disk()
+    
+    def info(self) -> dict:
+        """
+        آمار کش: تعداد برخورد/عدم برخورد، نرخ برخورد و اندازه لایه‌ها
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'memory_entries': len(self._memory),
+                'disk_bytes': self._disk_bytes,
+            }
+    
+    def _remember(self, key: str, item: tuple):
+        if self.max_entries <= 0:
+            return
+        self._memory[key] = item
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+    
+    def _evict_disk(self):
+        # حذف قدیمی‌ترین موارد تا ۹۰٪ بودجه تا حذف در هر درج تکرار نشود
+        target = self.max_disk_bytes * 0.9
+        rows = self._db.execute("SELECT key, size FROM detections ORDER BY accessed").fetchall()
+        evicted = []
+        for key, size in rows:
+            if self._disk_bytes <= target:
+                break
+            evicted.append((key,))
+            self._disk_bytes -= size
+        self._db.executemany("DELETE FROM detections WHERE key = ?", evicted)
+
+
+class _MicroBatcher:
+    """
+    تجمیع درخواست‌های همزمان detect_image_async در یک فراخوانی مدل
+    
+    درخواست‌هایی که در بازه max_wait (ثانیه) پس از اولین درخواست می‌رسند،
+    تا حداکثر max_batch_size، با هم در یک دسته از مدل عبور می‌کنند.
+    درخواست‌ها با فیلتر کلاس یا وزن‌های متفاوت در دسته‌های جداگانه اجرا می‌شوند.
+    """
+    
+    def __init__(self,
+                 detector: "YOLOv5Detector",
+                 loop: "asyncio.AbstractEventLoop",
+                 max_batch_size: int,
+                 max_wait: float):
+        self.detector = detector
+        self.loop = loop
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending = []
+        self._timer = None
+    
+    def submit(self, source, classes: Optional[List[int]],
+               weights: Optional[str] = None) -> "asyncio.Future":
+        future = self.loop.create_future()
+        self._pending.append((source, classes, weights, future))
+        
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = self.loop.call_later(self.max_wait, self._flush)
+        
+        return future
+    
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        
+        pending, self._pending = self._pending, []
+        groups = {}
+        for item in pending:
+            key = (tuple(item[1]) if item[1] is not None else None, item[2])
+            groups.setdefault(key, []).append(item)
+        
+        for (classes, weights), items in groups.items():
+            task = self.loop.run_in_executor(
+                self.detector._get_async_executor(),
+                functools.partial(
+                    self.detector._detect_batch,
+                    [source for source, _, _, _ in items],
+                    list(classes) if classes is not None else None,
+                    weights=weights,
+                ),
+            )
+            task.add_done_callback(functools.partial(self._resolve, items))
+    
+    def _resolve(self, items: list, task: "asyncio.Future"):
+        error = task.exception()
+        names = self.detector.get_coco_classes()
+        
+        for index, (source, _, _, future) in enumerate(items):
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+                continue
+            
+            item = task.result()[index]
+            if item is None:
+                future.set_exception(ImageReadError("خواندن تصویر ممکن نیست"))
+            else:
+                det, shape, _ = item
+                image_path = str(source) if isinstance(source, (str, Path)) else None
+                future.set_result(Detections.from_array(det, names, image_path, shape))
+
+
+# پسوند فایل خروجی هر backend (شناسایی نوع فایل در DetectMultiBackend بر اساس پسوند است)
+_EXPORT_SUFFIXES = {'torchscript': '.torchscript', 'onnx': '.onnx'}
+_ONNX_OPSET = 13
+
+
+def _import_optional(module: str, feature: str, package: Optional[str] = None):
+    """
+    وارد کردن یک وابستگی اختیاری با پیام خطای قابل فهم
+    
+    Args:
+        module: نام ماژول (مثال: 'onnxruntime')
+        feature: قابلیتی که به این ماژول نیاز دارد (برای پیام خطا)
+        package: نام پکیج pip در صورت تفاوت با نام ماژول
+    """
+    import importlib
+    
+    try:
+        return importlib.import_module(module)
+    except ImportError as e:
+        raise EnvironmentNotReadyError(
+            f"{feature} به پکیج {package or module} نیاز دارد: pip install {package or module}"
+        ) from e
+
+
+def _map_scores(predictions: list, targets: list) -> Tuple[float, float]:
+    """
+    محاسبه mAP@0.5 و mAP@0.5:0.95 به روش val.py در YOLOv5
+    
+    Args:
+        predictions: برای هر تصویر آرایه (N×6) شامل x1, y1, x2, y2, conf, cls
+        targets: برای هر تصویر آرایه (M×5) شامل cls, x1, y1, x2, y2
+    
+    Returns:
+        tuple: (mAP@0.5, mAP@0.5:0.95)
+    """
+    import numpy as np
+    import torch
+    from utils.metrics import ap_per_class
+    from val import process_batch
+    
+    iouv = torch.linspace(0.5, 0.95, 10)
+    stats = []
+    for det, labels in zip(predictions, targets):
+        det, labels = torch.as_tensor(det, dtype=torch.float32), torch.as_tensor(labels, dtype=torch.float32)
+        correct = torch.zeros(len(det), len(iouv), dtype=torch.bool)
+        if len(det) and len(labels):
+            correct = process_batch(det, labels, iouv)
+        stats.append((correct, det[:, 4], det[:, 5], labels[:, 0]))
+    
+    correct, conf, pred_cls, target_cls = [torch.cat(column, 0).numpy() for column in zip(*stats)]
+    if not len(correct) or not correct.any():
+        return 0.0, 0.0
+    ap = ap_per_class(correct, conf, pred_cls, target_cls, names={})[5]
+    return float(ap[:, 0].mean()), float(np.mean(ap))
+
+
+# همگام‌سازی تغییر تنظیم سراسری mmap در torch.load بین نخ‌ها
+class _MmapTorchModel:
+    """
+    مدل PyTorch نگاشت‌شده با mmap از فایل وزن‌های ادغام‌شده (fuse_weights)
+    
+    attempt_load در YOLOv5 آرگومان mmap را به torch.load نمی‌دهد، پس فایل
+    مستقیماً با torch.load(mmap=True) خوانده می‌شود و رابط DetectMultiBackend
+    (فراخوانی، stride، device و model) بازسازی می‌شود. صفحات نگاشت‌شده
+    copy-on-write هستند و فایل روی دیسک تغییر نمی‌کند.
+    """
+    
+    def __init__(self, path: str, device):
+        import torch
+        
+        try:
+            checkpoint = torch.load(path, map_location='cpu', mmap=True, weights_only=False)
+        except TypeError as e:
+            raise EnvironmentNotReadyError("share_weights به torch>=2.1 نیاز دارد") from e
+        
+        # تنسورهای FP32 روی CPU بدون کپی روی صفحات نگاشت‌شده می‌مانند
+        self.model = checkpoint['model'].float().to(device).eval()
+        self.w = path
+        self.device = device
+        self.stride = max(int(self.model.stride.max()), 32)
+    
+    def eval(self):
+        return self
+    
+    def __call__(self, tensor):
+        return self.model(tensor)
+
+
+class _OnnxRuntimeModel:
+    """
+    مدل ONNX Runtime با همان رابط DetectMultiBackend (فراخوانی، stride و device)
+    
+    DetectMultiBackend جلسه را بدون SessionOptions می‌سازد و اعمال بودجه نخ‌ها
+    پس از آن به ساخت دوباره جلسه (تجزیه دوباره گراف) نیاز دارد؛ اینجا جلسه
+    یک بار و مستقیماً با تنظیمات نهایی ساخته می‌شود.
+    """
+    
+    def __init__(self, path: str, device, num_threads: int):
+        onnxruntime = _import_optional('onnxruntime', "backend='onnx'")
+        
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = num_threads
+        providers = ['CPUExecutionProvider']
+        if device.type == 'cuda':
+            providers.insert(0, 'CUDAExecutionProvider')
+        
+        self.w = path
+        self.device = device
+        self.session = onnxruntime.InferenceSession(path, sess_options=options, providers=providers)
+        self.input_name = self.session.get_inputs()[0].name
+        self.output_names = [output.name for output in self.session.get_outputs()]
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.stride = int(metadata.get('stride', 32))
+    
+    def eval(self):
+        return self
+    
+    def __call__(self, tensor):
+        import torch
+        
+        outputs = self.session.run(self.output_names, {self.input_name: tensor.cpu().numpy()})
+        outputs = [torch.from_numpy(output).to(self.device) for output in outputs]
+        return outputs[0] if len(outputs) == 1 else outputs
+
+
+def _process_memory(pid: Optional[int] = None) -> dict:
+    """
+    مصرف حافظه یک پروسه (مگابایت) از /proc/<pid>/smaps_rollup
+    
+    rss: کل صفحات مقیم؛ pss: سهم منصفانه پروسه از صفحات اشتراکی؛
+    anonymous: حافظه خصوصی غیرقابل اشتراک (هزینه واقعی هر کارگر اضافه)
+    
+    Returns:
+        dict: rss، pss، shared و anonymous (در سیستم‌های غیر لینوکس فقط rss از getrusage)
+    """
+    path = Path(f"/proc/{pid or 'self'}/smaps_rollup")
+    if not path.exists():
+        import resource
+        
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {'rss': round(peak_rss / (1024 * 1024) if sys.platform == 'darwin' else peak_rss / 1024, 1)}
+    
+    fields = {}
+    for line in path.read_text().splitlines()[1:]:
+        name, _, value = line.partition(':')
+        if value.strip().endswith('kB'):
+            fields[name] = int(value.split()[0])
+    shared = fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0)
+    return {key: round(value / 1024, 1) for key, value in (
+        ('rss', fields.get('Rss', 0)),
+        ('pss', fields.get('Pss', 0)),
+        ('shared', shared),
+        ('anonymous', fields.get('Anonymous', 0)),
+    )}
+
+
+class ModelRegistry:
+    """
+    مخزن مدل‌های بارگذاری‌شده با سیاست LRU و بودجه حافظه
+    
+    چند مدل (مثلاً yolov5s برای حالت سریع و yolov5l برای حالت دقیق) همزمان
+    در حافظه می‌مانند تا تعویض مدل هزینه بارگذاری نداشته باشد. اگر مجموع
+    حجم مدل‌ها از max_bytes (یا تعداد آن‌ها از max_models) بیشتر شود،
+    مدل‌هایی که مدت بیشتری استفاده نشده‌اند از حافظه خارج می‌شوند. یک مخزن
+    را می‌توان بین چند تشخیص‌دهنده به اشتراک گذاشت.
+    
+    مثال:
+        registry = ModelRegistry(max_bytes=1024 ** 3)
+        detector = YOLOv5Detector('yolov5s.pt', engine='inprocess', registry=registry)
+        detector.detect_image("a.jpg")                       # yolov5s
+        detector.detect_image("a.jpg", weights='yolov5l.pt')  # yolov5l، بدون خروج yolov5s
+    
+    نوشته شده توسط: رضا صفری فروشانی
+    """
+    
+    def __init__(self, max_bytes: int = 2 * 1024 ** 3, max_models: Optional[int] = None):
+        """
+        Args:
+            max_bytes: بودجه حافظه مدل‌های مقیم (بایت)
+            max_models: حداکثر تعداد مدل‌های مقیم (None = فقط بودجه حافظه)
+        """
+        self.max_bytes = max_bytes
+        self.max_models = max_models
+        self._models = OrderedDict()   # کلید → (مدل، حجم به بایت)
+        self._loading = {}             # کلید → قفل بارگذاری (هر مدل فقط یک بار بارگذاری می‌شود)
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+    
+    def __len__(self) -> int:
+        return len(self._models)
+    
+    def __contains__(self, key) -> bool:
+        return key in self._models
+    
+    def get(self, key, loader: Callable[[], object]):
+        """
+        دریافت مدل از حافظه یا بارگذاری آن با loader
+        
+        بارگذاری یک مدل، دسترسی نخ‌های دیگر به مدل‌های مقیم را مسدود نمی‌کند.
+        
+        Args:
+            key: کلید یکتای مدل (مسیر وزن‌ها و تنظیمات اجرا)
+            loader: تابع بدون آرگومان که مدل را می‌سازد
+        """
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return self._models[key][0]
+            load_lock = self._loading.setdefault(key, threading.Lock())
+        
+        with load_lock:
+            with self._lock:
+                if key in self._models:
+                    self._models.move_to_end(key)
+                    self.hits += 1
+                    return self._models[key][0]
+            
+            model = loader()
+            size = self._model_bytes(model)
+            with self._lock:
+                self.misses += 1
+                self._models[key] = (model, size)
+                self._loading.pop(key, None)
+                self._evict()
+        return model
+    
+    def evict(self, key=None):
+        """
+        خارج کردن یک مدل (یا همه مدل‌ها اگر key داده نشود) از حافظه
+        """
+        with self._lock:
+            for evicted in (list(self._models) if key is None else [key]):
+                if evicted in self._models:
+                    self._remove(evicted)
+    
+    def info(self) -> dict:
+        """
+        فهرست مدل‌های مقیم (از قدیمی‌ترین استفاده به جدیدترین) و آمار مخزن
+        """
+        with self._lock:
+            models = [{'key': list(key), 'mb': round(size / 2 ** 20, 1)}
+                      for key, (_, size) in self._models.items()]
+            used = sum(size for _, size in self._models.values())
+        return {
+            'models': models,
+            'bytes': used,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+    
+    def _evict(self):
+        # جدیدترین مدل (انتهای OrderedDict) همیشه مقیم می‌ماند
+        used = sum(size for _, size in self._models.values())
+        while len(self._models) > 1 and (
+                used > self.max_bytes or (self.max_models is not None and len(self._models) > self.max_models)):
+            used -= self._remove(next(iter(self._models)))
+    
+    def _remove(self, key) -> int:
+        # خروج دستی (evict) و خودکار (LRU) در یک جا شمرده و ثبت می‌شوند؛ فراخواننده قفل را در اختیار دارد
+        _, size = self._models.pop(key)
+        self.evictions += 1
+        logger.info(f"♻️  مدل {key[0]} از حافظه خارج شد ({size / 2 ** 20:.0f} MB)")
+        return size
+    
+    @staticmethod
+    def _model_bytes(model) -> int:
+        """
+        تخمین حجم مدل: پارامترها و بافرهای torch یا حجم فایل مدل (ONNX Runtime)
+        """
+        network = getattr(model, 'model', None)
+        if hasattr(network, 'parameters'):
+            tensors = itertools.chain(network.parameters(), network.buffers())
+            size = sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+            if size:
+                return size
+        path = getattr(model, 'w', None)
+        return os.path.getsize(path) if isinstance(path, str) and os.path.isfile(path) else 0
+
+
+class YOLOv5Detector:
+    """
+    کلاس اصلی برای تشخیص اشیاء با YOLOv5
+    
+    این کلاس تمام عملیات مورد نیاز برای تشخیص اشیاء با استفاده از
+    مدل‌های از پیش آموزش‌دیده YOLOv5 را فراهم می‌کند.
+    
+    نویسنده: رضا صفری فروشانی
+    ایمیل: safarireza@gmail.com
+    گیتهاب: https://github.com/reza123reza
+    
+    Attributes:
+        weights (str): مسیر یا نام فایل وزن‌های مدل
+        conf_threshold (float): آستانه اطمینان برای تشخیص (0-1)
+        yolov5_path (Path): مسیر پوشه YOLOv5
+        engine (str): موتور اجرا ('subprocess' یا 'inprocess')
+    """
+    
+    # پسوندهای تصویری قابل پردازش در detect_images
+    IMAGE_EXTENSIONS = ('.bmp', '.jpg', '.jpeg', '.png', '.tif', '.tiff', '.webp')
+    
+    # پکیج‌هایی که setup_environment نصب می‌کند: (نام pip، عنوان نمایشی)
+    _REQUIRED_PACKAGES = [
+        ('tensorflow', 'TensorFlow'),
+        ('tensorboard', 'TensorBoard'),
+        ('torch', 'PyTorch'),
+    ]
+    
+    # فایل مهر وضعیت محیط بررسی‌شده (داخل پوشه yolov5)
+    _SETUP_STAMP = '.setup_stamp.json'
+    
+    # پالت رنگ کادرها (BGR) - همان پالت detect.py
+    _PALETTE = [
+        (56, 56, 255), (151, 157, 255), (31, 112, 255), (29, 178, 255), (49, 210, 207),
+        (10, 249, 72), (23, 204, 146), (134, 219, 61), (52, 147, 26), (187, 212, 0),
+        (168, 153, 44), (255, 194, 0), (147, 69, 52), (255, 115, 100), (236, 24, 0),
+        (255, 56, 132), (133, 0, 82), (255, 56, 203), (200, 149, 255), (199, 55, 255),
+    ]
+    
+    def __init__(self,
+                 weights: str = 'yolov5m.pt',
+                 conf_threshold: float = 0.7,
+                 engine: str = 'subprocess',
+                 img_size: int = 640,
+                 iou_threshold: float = 0.45,
+                 device: str = 'cpu',
+                 cache_size: int = 0,
+                 cache_dir: Optional[str] = None,
+                 cache_max_bytes: int = 256 * 1024 * 1024,
+                 async_batch_size: int = 16,
+                 async_batch_window: float = 0.005,
+                 async_workers: int = 4,
+                 metrics: Optional[MetricsSink] = None,
+                 verbose: Union[bool, int] = False,
+                 raise_errors: bool = False,
+                 log_detections: Union[bool, str, Path] = False,
+                 backend: str = 'torch',
+                 precision: str = 'fp32',
+                 calibration=None,
+                 registry: Optional[ModelRegistry] = None,
+                 share_weights: bool = False,
+                 cascade_weights: Optional[str] = None,
+                 cascade_band: Tuple[float, Optional[float]] = (0.25, None),
+                 cascade_empty: bool = True):
+        """
+        مقداردهی اولیه کلاس تشخیص‌دهنده YOLOv5
+        
+        Args:
+            weights: نام یا مسیر فایل وزن‌های مدل
+                    گزینه‌ها: yolov5s.pt, yolov5m.pt, yolov5l.pt, yolov5x.pt
+            conf_threshold: آستانه اطمینان (بین 0 تا 1)
+            engine: موتور اجرا
+                    'subprocess': اجرای detect.py در یک پروسه جدید برای هر فراخوانی
+                    'inprocess': بارگذاری یک‌باره مدل در همین پروسه و استفاده مجدد از آن
+            img_size: اندازه ورودی مدل در موتور inprocess (پیکسل)
+            iou_threshold: آستانه IoU برای NMS در موتور inprocess
+            device: دستگاه اجرای مدل در موتور inprocess (مثال: 'cpu' یا 'cuda:0')
+            cache_size: تعداد نتایج نگه‌داری‌شده در کش LRU حافظه (0 = غیرفعال)
+                    کلید کش هش محتوای تصویر به همراه weights، conf_threshold و classes است؛
+                    detect_image فقط با engine='inprocess' از کش استفاده می‌کند
+            cache_dir: پوشه لایه دیسکی کش (SQLite) - نتایج بین اجراها حفظ می‌شوند
+            cache_max_bytes: حداکثر حجم لایه دیسکی کش (بایت)
+            async_batch_size: حداکثر تعداد درخواست‌های detect_image_async در یک دسته
+            async_batch_window: مدت انتظار برای تجمیع درخواست‌های همزمان async (ثانیه)
+            async_workers: تعداد نخ‌های اجرای متدهای async
+            metrics: مقصد ثبت متریک‌ها (مثلاً PrometheusMetrics؛ None = بدون ثبت)
+            verbose: نمایش پیام‌های پیشرفت روی خروجی استاندارد
+                    True = سطح INFO، یا یک سطح logging (مثال: logging.DEBUG)؛
+                    False = بدون چاپ (پیام‌ها همچنان به logger ماژول ارسال می‌شوند)
+            raise_errors: پرتاب خطاهای نوع‌دار (YOLOv5Error) به جای ثبت پیام و برگرداندن None
+                    False = رفتار قبلی (ثبت پیام و برگرداندن None)
+            log_detections: ثبت هر نتیجه تشخیص به صورت یک خط JSON
+                    True = خروجی استاندارد، مسیر فایل = افزودن به آن فایل
+            backend: اجراکننده شبکه در موتور inprocess
+                    'torch': PyTorch معمولی (eager)
+                    'torchscript' یا 'onnx': خروجی یک‌باره از مدل (ذخیره کنار فایل وزن‌ها)
+                    و اجرا با TorchScript یا ONNX Runtime (معمولاً سریع‌تر روی CPU)
+            precision: دقت محاسبات در موتور inprocess
+                    'fp32': بدون تغییر
+                    'int8': کوانتیزه‌سازی پس از آموزش با ONNX Runtime (backend خودکار onnx می‌شود)
+            calibration: تصاویر کالیبراسیون برای precision='int8' (پوشه، الگوی glob یا لیست)
+                    None = کوانتیزه‌سازی پویا (فقط وزن‌ها)؛ در غیر این صورت ایستا (وزن‌ها و فعال‌سازی‌ها)
+            registry: مخزن مدل‌های مقیم (قابل اشتراک بین تشخیص‌دهنده‌ها)
+                    None = مخزن اختصاصی با بودجه پیش‌فرض؛ هر متد detect_* با آرگومان
+                    weights می‌تواند مدل دیگری را بدون هزینه بارگذاری مجدد استفاده کند
+            share_weights: نگاشت حافظه (mmap) فایل وزن‌های ادغام‌شده به جای کپی در حافظه پروسه
+                    (فقط backend='torch')؛ چند پروسه روی یک میزبان یک نسخه از وزن‌ها را
+                    در page cache به اشتراک می‌گذارند (به fuse_weights مراجعه کنید)
+            cascade_weights: حالت آبشاری در موتور inprocess - هر تصویر ابتدا با weights
+                    (مدل کوچک) پردازش شده و فقط تصاویر نامطمئن با این مدل بزرگ‌تر
+                    (مثال: 'yolov5l.pt') دوباره اجرا می‌شوند؛ None = غیرفعال
+            cascade_band: بازه اطمینان نامطمئن (پایین، بالا) برای مدل کوچک؛ تصویری که
+                    تشخیصی در این بازه داشته باشد به مدل بزرگ ارجاع می‌شود
+                    (بالا None = conf_threshold)
+            cascade_empty: ارجاع تصاویری که مدل کوچک در آن‌ها هیچ تشخیصی (بالای حد پایین بازه) ندارد
+        
+        نوشته شده توسط: رضا صفری فروشانی
+        """
+        if engine not in ('subprocess', 'inprocess'):
+            raise ValueError(f"موتور نامعتبر: {engine} (گزینه‌ها: subprocess, inprocess)")
+        if precision not in ('fp32', 'int8'):
+            raise ValueError(f"precision نامعتبر: {precision} (گزینه‌ها: fp32, int8)")
+        if precision == 'int8':
+            if backend == 'torchscript':
+                raise ValueError("precision='int8' فقط با backend='onnx' پشتیبانی می‌شود")
+            backend = 'onnx'
+        if backend != 'torch' and backend not in _EXPORT_SUFFIXES:
+            raise ValueError(f"backend نامعتبر: {backend} (گزینه‌ها: torch, torchscript, onnx)")
+        if backend != 'torch' and engine != 'inprocess':
+            raise ValueError("backend‌های torchscript و onnx فقط در موتور inprocess پشتیبانی می‌شوند")
+        if share_weights and backend != 'torch':
+            raise ValueError("share_weights فقط با backend='torch' پشتیبانی می‌شود")
+        cascade_band = (cascade_band[0], conf_threshold if cascade_band[1] is None else cascade_band[1])
+        if cascade_weights is not None and not cascade_band[0] < cascade_band[1]:
+            raise ValueError(f"cascade_band نامعتبر: {cascade_band} (حد پایین باید کمتر از حد بالا باشد)")
+        
+        self.weights = weights
+        self.conf_threshold = conf_threshold
+        self.engine = engine
+        self.img_size = img_size
+        self.iou_threshold = iou_threshold
+        self.device = device
+        self.backend = backend
+        self.precision = precision
+        self.calibration = calibration
+        self.share_weights = share_weights
+        self.cascade_weights = cascade_weights
+        self.cascade_band = cascade_band
+        self.cascade_empty = cascade_empty
+        self.yolov5_path = None
+        
+        # مدل‌های مقیم در حافظه (فقط موتور inprocess، بارگذاری در اولین استفاده)
+        self.registry = registry if registry is not None else ModelRegistry()
+        self._model_lock = threading.Lock()
+        
+        # آمار حالت آبشاری (ارجاع به مدل بزرگ)
+        self._cascade_lock = threading.Lock()
+        self._cascade_stats = {'images': 0, 'escalated': 0, 'empty': 0,
+                               'small_seconds': 0.0, 'large_seconds': 0.0}
+        
+        # کش نتایج (فقط مسیرهای درون‌پردازه‌ای)
+        self._cache = None
+        if cache_size > 0 or cache_dir is not None:
+            self._cache = _ResultCache(cache_size, cache_dir, cache_max_bytes)
+        
+        # API async: استخر نخ‌ها و تجمیع‌کننده درخواست‌ها (ساخت در اولین استفاده)
+        self.async_batch_size = async_batch_size
+        self.async_batch_window = async_batch_window
+        self.async_workers = async_workers
+        self._async_executor = None
+        self._batcher = None
+        
+        # زمان‌بندی مراحل خط لوله و توابع ثبت‌شده (فقط مسیرهای درون‌پردازه‌ای)
+        self.stats = PipelineStats()
+        self._stage_hooks = []
+        self._call_hooks = []
+        self._torch_profiling = False
+        self.metrics = metrics if metrics is not None else MetricsSink()
+        
+        # خروجی: logging به جای چاپ مستقیم، و خطاهای نوع‌دار در صورت درخواست
+        if verbose:
+            _enable_console_logging(logging.INFO if verbose is True else int(verbose))
+        self.raise_errors = raise_errors
+        self.log_detections = bool(log_detections)
+        if log_detections:
+            self._attach_detection_handler(log_detections)
+        
+        logger.info("╔" + "═" * 78 + "╗")
+        logger.info("║" + " " * 20 + "YOLOv5 Object Detector" + " " * 35 + "║")
+        logger.info("║" + " " * 78 + "║")
+        logger.info("║" + "  نویسنده: رضا صفری فروشانی".ljust(77) + " ║")
+        logger.info("║" + "  ایمیل: safarireza@gmail.com".ljust(77) + " ║")
+        logger.info("║" + "  گیتهاب: https://github.com/reza123reza".ljust(77) + " ║")
+        logger.info("╚" + "═" * 78 + "╝")
+        
+        if self._cache is not None and engine == 'subprocess':
+            logger.warning("⚠ detect_image با engine='subprocess' از کش نتایج استفاده نمی‌کند؛ کش فقط در "
+                           "مسیرهای درون‌پردازه‌ای (detect_images، API async، سرور) فعال است "
+                           "(برای detect_image از engine='inprocess' استفاده کنید)")
+        
+    def setup_environment(self,
+                          interactive: Optional[bool] = None,
+                          force: bool = False) -> bool:
+        """
+        نصب و راه‌اندازی محیط YOLOv5
+        
+        این متد تمام پکیج‌های لازم را نصب کرده و YOLOv5 را دانلود می‌کند.
+        پس از یک راه‌اندازی موفق، وضعیت محیط (نسخه پکیج‌ها، مفسر پایتون و
+        requirements یولو) در فایل مهر yolov5/.setup_stamp.json ثبت می‌شود و
+        فراخوانی‌های بعدی در صورت عدم تغییر، در چند میلی‌ثانیه برمی‌گردند.
+        
+        Args:
+            interactive: پرسیدن سؤال از کاربر (None = فقط اگر ورودی یک ترمینال باشد)
+            force: نادیده گرفتن فایل مهر و بررسی کامل دوباره
+        
+        Returns:
+            bool: True در صورت موفقیت، False در صورت خطا
+            
+        توسعه‌دهنده: رضا صفری فروشانی (safarireza@gmail.com)
+        """
+        if interactive is None:
+            interactive = sys.stdin is not None and sys.stdin.isatty()
+        
+        yolov5_dir = Path(os.path.abspath('yolov5'))
+        
+        # مسیر سریع: محیط از قبل بررسی شده و تغییری نکرده است
+        if not force and self._environment_verified(yolov5_dir):
+            self.yolov5_path = yolov5_dir
+            logger.info(f"✓ محیط YOLOv5 از قبل آماده است: {self.yolov5_path}")
+            return True
+        
+        try:
+            logger.info("\n" + "═" * 80)
+            logger.info("شروع راه‌اندازی محیط YOLOv5")
+            logger.info("توسعه‌دهنده: رضا صفری فروشانی")
+            logger.info("═" * 80)
+            
+            missing = [(package, title) for package, title in self._REQUIRED_PACKAGES
+                       if self._installed_version(package) is None]
+            
+            # مرحله 1: آپگرید pip (فقط اگر پکیجی برای نصب وجود دارد)
+            logger.info("\n[1/5] در حال آپگرید pip...")
+            if missing:
+                result = subprocess.run(
+                    [sys.executable, "-m", "pip", "install", "--upgrade", "pip", "--quiet"],
+                    capture_output=True,
+                    text=True
+                )
+                if result.returncode == 0:
+                    logger.info("      ✓ pip با موفقیت آپگرید شد")
+                else:
+                    logger.warning("      ⚠ خطا در آپگرید pip (ادامه می‌دهیم...)")
+            else:
+                logger.info("      ✓ نیازی نیست (همه پکیج‌ها نصب هستند)")
+            
+            # مراحل 2 تا 4: نصب TensorFlow، TensorBoard و PyTorch (فقط موارد ناموجود)
+            for step, (package, title) in enumerate(self._REQUIRED_PACKAGES, 2):
+                logger.info(f"\n[{step}/5] در حال نصب {title}...")
+                version = self._installed_version(package)
+                if version is not None:
+                    logger.info(f"      ✓ {title} از قبل نصب است ({version})")
+                    continue
+                
+                result = subprocess.run(
+                    [sys.executable, "-m", "pip", "install", package, "--quiet"],
+                    capture_output=True,
+                    text=True
+                )
+                if result.returncode == 0:
+                    logger.info(f"      ✓ {title} نصب شد")
+                else:
+                    logger.warning(f"      ⚠ خطا در نصب {title}")
+            
+            # مرحله 5: دانلود YOLOv5
+            logger.info("\n[5/5] در حال دانلود YOLOv5...")
+            if yolov5_dir.exists():
+                logger.info("      ℹ پوشه yolov5 از قبل وجود دارد")
+                user_input = 'n'
+                if interactive:
+                    user_input = input("      آیا می‌خواهید دوباره دانلود شود؟ (y/n): ")
+                if user_input.lower() == 'y':
+                    shutil.rmtree(yolov5_dir)
+                    subprocess.run(
+                        ['git', 'clone', 'https://github.com/ultralytics/yolov5', str(yolov5_dir)],
+                        capture_output=True
+                    )
+                    logger.info("      ✓ YOLOv5 دانلود شد")
+            else:
+                result = subprocess.run(
+                    ['git', 'clone', 'https://github.com/ultralytics/yolov5', str(yolov5_dir)],
+                    capture_output=True,
+                    text=True
+                )
+                if result.returncode == 0:
+                    logger.info("      ✓ YOLOv5 دانلود شد")
+                else:
+                    self._fail(SetupError(f"خطا در دانلود YOLOv5: {result.stderr.strip()}"))
+                    return False
+            
+            # تنظیم مسیر YOLOv5
+            self.yolov5_path = yolov5_dir
+            
+            # نصب requirements
+            logger.info("\n      در حال نصب requirements...")
+            result = subprocess.run(
+                [sys.executable, "-m", "pip", "install", "-r", "requirements.txt", "--quiet"],
+                capture_output=True,
+                text=True,
+                cwd=self.yolov5_path
+            )
+            requirements_ok = result.returncode == 0
+            if requirements_ok:
+                logger.info("      ✓ Requirements نصب شد")
+            else:
+                logger.warning(f"      ⚠ خطا در نصب requirements (مسیر سریع تا راه‌اندازی موفق غیرفعال است):\n"
+                               f"{result.stderr.strip()}")
+            
+            # ثبت وضعیت بررسی‌شده محیط برای مسیر سریع فراخوانی‌های بعدی (فقط اگر نصب کامل بوده)
+            fingerprint = self._environment_fingerprint(yolov5_dir)
+            stamp = yolov5_dir / self._SETUP_STAMP
+            if requirements_ok and all(fingerprint['packages'].values()):
+                stamp.write_text(json.dumps(fingerprint, indent=2), encoding='utf-8')
+            elif stamp.exists():
+                stamp.unlink()
+            
+            logger.info("\n" + "═" * 80)
+            if requirements_ok:
+                logger.info("✓ راه‌اندازی با موفقیت کامل شد!")
+            else:
+                logger.warning("⚠ راه‌اندازی انجام شد اما نصب requirements ناموفق بود")
+            logger.info(f"✓ مسیر YOLOv5: {self.yolov5_path}")
+            logger.info("═" * 80)
+            
+            return True
+            
+        except Exception as e:
+            self._fail(e if isinstance(e, YOLOv5Error) else SetupError(f"خطا در راه‌اندازی: {e}"), e)
+            return False
+    
+    @staticmethod
+    def _installed_version(package: str) -> Optional[str]:
+        """
+        نسخه نصب‌شده یک پکیج (None اگر نصب نباشد)
+        """
+        try:
+            return importlib.metadata.version(package)
+        except importlib.metadata.PackageNotFoundError:
+            return None
+    
+    def _environment_fingerprint(self, yolov5_dir: Path) -> dict:
+        """
+        وضعیت فعلی محیط برای مقایسه با فایل مهر
+        """
+        requirements = yolov5_dir / "requirements.txt"
+        return {
+            'python': sys.executable,
+            'python_version': platform.python_version(),
+            'packages': {package: self._installed_version(package)
+                         for package, _ in self._REQUIRED_PACKAGES},
+            'requirements_sha256': hashlib.sha256(requirements.read_bytes()).hexdigest()
+                                   if requirements.exists() else None,
+        }
+    
+    def _environment_verified(self, yolov5_dir: Path) -> bool:
+        """
+        بررسی اینکه فایل مهر وجود دارد و با وضعیت فعلی محیط یکسان است
+        """
+        stamp = yolov5_dir / self._SETUP_STAMP
+        if not (yolov5_dir / "detect.py").exists() or not stamp.exists():
+            return False
+        
+        try:
+            recorded = json.loads(stamp.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return False
+        
+        return recorded == self._environment_fingerprint(yolov5_dir)
+    
+    def detect_image(self, 
+                    image_path: str, 
+                    classes: Optional[List[int]] = None,
+                    save_dir: str = 'runs/detect',
+                    show_result: bool = True,
+                    save: bool = True,
+                    return_detections: bool = False,
+                    weights: Optional[str] = None) -> Union[str, Detections, None]:
+        """
+        تشخیص اشیاء در یک تصویر
+        
+        این متد از مدل YOLOv5 برای تشخیص اشیاء در تصویر ورودی استفاده می‌کند.
+        
+        Args:
+            image_path: مسیر تصویر ورودی
+            classes: لیست شماره کلاس‌های مورد نظر (None = همه کلاس‌ها)
+                    مثال: [0, 2] برای person و car
+            save_dir: مسیر ذخیره نتایج (نسبی = نسبت به پوشه YOLOv5)
+                    هر فراخوانی یک زیرپوشه یکتا در این مسیر می‌سازد
+            show_result: نمایش نتیجه (در محیط نوتبوک)
+            save: رسم و ذخیره تصویر حاشیه‌نویسی شده
+                  (False = صرفه‌جویی در زمان رسم و فشرده‌سازی JPEG)
+            return_detections: بازگرداندن شیء Detections به جای مسیر تصویر خروجی
+            weights: وزن‌های مدل برای همین فراخوانی (None = self.weights)
+                    مدل از registry خوانده می‌شود و تعویض آن هزینه بارگذاری مجدد ندارد
+        
+        Returns:
+            str: مسیر تصویر خروجی یا None در صورت خطا
+            Detections: اگر return_detections=True باشد
+        
+        کد نوشته شده توسط: رضا صفری فروشانی
+        GitHub: https://github.com/reza123reza
+        """
+        if self.yolov5_path is None:
+            return self._fail(EnvironmentNotReadyError("لطفاً ابتدا setup_environment() را اجرا کنید"))
+        
+        if not os.path.exists(image_path):
+            return self._fail(SourceNotFoundError(f"تصویر پیدا نشد: {image_path}"))
+        
+        logger.info(f"\n{'═'*80}")
+        logger.info(f"تشخیص اشیاء در تصویر")
+        logger.info(f"نویسنده: رضا صفری فروشانی (safarireza@gmail.com)")
+        logger.info(f"{'═'*80}")
+        logger.info(f"📷 تصویر ورودی: {image_path}")
+        weights = weights or self.weights
+        logger.info(f"⚙️  وزن مدل: {weights}")
+        logger.info(f"📊 آستانه اطمینان: {self.conf_threshold}")
+        
+        if self.engine == 'inprocess':
+            with self._timed_call():
+                return self._detect_image_inprocess(image_path, classes, show_result,
+                                                    save, return_detections, save_dir, weights)
+        
+        try:
+            # ساخت دستور (مسیرها مطلق هستند و دایرکتوری کاری پروسه تغییر نمی‌کند)
+            cmd = [
+                sys.executable, str(self.yolov5_path / "detect.py"),
+                "--weights", weights,
+                "--conf-thres", str(self.conf_threshold),
+                "--source", os.path.abspath(image_path)
+            ]
+            
+            # پوشه خروجی یکتا برای این فراخوانی (بدون جستجوی runs/detect/exp*)
+            run_dir = self._new_output_dir(save_dir, mkdir=False)
+            cmd.extend(["--project", str(run_dir.parent), "--name", run_dir.name, "--exist-ok"])
+            
+            if classes is not None:
+                cmd.extend(["--classes"] + [str(c) for c in classes])
+                logger.info(f"🎯 کلاس‌های فیلتر شده: {classes}")
+            
+            if return_detections:
+                cmd.extend(["--save-txt", "--save-conf"])
+            if not save:
+                cmd.append("--nosave")
+            
+            logger.info(f"\n⏳ در حال پردازش...")
+            
+            # اجرای تشخیص
+            result = subprocess.run(cmd, capture_output=True, text=True, cwd=self.yolov5_path)
+            
+            if result.returncode == 0:
+                logger.info("✓ تشخیص با موفقیت انجام شد!")
+                
+                output_file = run_dir / Path(image_path).name
+                
+                if return_detections:
+                    label_file = run_dir / "labels" / f"{Path(image_path).stem}.txt"
+                    detections = self._read_label_file(label_file, image_path)
+                    if output_file.exists():
+                        detections.output_path = str(output_file)
+                        logger.info(f"💾 نتیجه ذخیره شد: {output_file}")
+                        if show_result:
+                            self._display_result(output_file)
+                    return detections
+                
+                if output_file.exists():
+                    logger.info(f"💾 نتیجه ذخیره شد: {output_file}")
+                    
+                    # نمایش نتیجه
+                    if show_result:
+                        self._display_result(output_file)
+                    
+                    return str(output_file)
+            else:
+                raise DetectionError(f"اجرای detect.py ناموفق بود:\n{result.stderr}",
+                                     stderr=result.stderr, returncode=result.returncode)
+                
+        except Exception as e:
+            return self._fail(e if isinstance(e, YOLOv5Error) else DetectionError(f"خطا در تشخیص: {e}"), e)
+        
+        return None
+    
+    def detect_images(self,
+                      sources: Union[str, Path, Iterable[Union[str, Path]]],
+                      batch_size: int = 16,
+                      classes: Optional[List[int]] = None,
+                      save: bool = True,
+                      return_detections: bool = False,
+                      save_dir: str = 'runs/detect',
+                      weights: Optional[str] = None) -> List[Union[str, Detections, None]]:
+        """
+        تشخیص اشیاء در چندین تصویر به صورت دسته‌ای
+        
+        تصاویر با letterbox به اندازه ثابت img_size تبدیل شده و هر دسته
+        در یک فراخوانی (forward) مدل مقیم پردازش می‌شود. این متد صرف‌نظر
+        از مقدار engine همیشه از مدل مقیم در حافظه استفاده می‌کند.
+        
+        Args:
+            sources: لیست مسیر تصاویر، مسیر یک پوشه یا یک الگوی glob
+                    مثال: "frames/", "frames/*.jpg", ["a.jpg", "b.jpg"]
+            batch_size: تعداد تصاویر در هر دسته
+            classes: لیست شماره کلاس‌های مورد نظر (None = همه کلاس‌ها)
+            save: رسم و ذخیره تصاویر حاشیه‌نویسی شده
+            return_detections: بازگرداندن اشیاء Detections به جای مسیر تصاویر خروجی
+            save_dir: مسیر ذخیره نتایج (نسبی = نسبت به پوشه YOLOv5)
+            weights: وزن‌های مدل برای همین فراخوانی (None = self.weights)
+                    مدل از registry خوانده می‌شود و تعویض آن هزینه بارگذاری مجدد ندارد
+        
+        Returns:
+            list: مسیر تصویر خروجی (یا Detections) برای هر ورودی به همان ترتیب ورودی
+                  (None برای تصاویری که خوانده نشدند)
+        
+        نوشته شده توسط: رضا صفری فروشانی
+        """
+        if self.yolov5_path is None:
+            self._fail(EnvironmentNotReadyError("لطفاً ابتدا setup_environment() را اجرا کنید"))
+            return []
+        
+        if batch_size < 1:
+            raise ValueError("batch_size باید حداقل 1 باشد")
+        
+        image_paths = self._expand_image_sources(sources)
+        
+        logger.info(f"\n{'═'*80}")
+        logger.info(f"تشخیص دسته‌ای اشیاء در تصاویر")
+        logger.info(f"نویسنده: رضا صفری فروشانی")
+        logger.info(f"{'═'*80}")
+        logger.info(f"🖼️  تعداد تصاویر: {len(image_paths)}")
+        logger.info(f"📦 اندازه دسته: {batch_size}")
+        logger.info(f"⚙️  وزن مدل: {weights or self.weights}")
+        logger.info(f"📊 آستانه اطمینان: {self.conf_threshold}")
+        if classes is not None:
+            logger.info(f"🎯 کلاس‌های فیلتر شده: {classes}")
+        
+        if not image_paths:
+            logger.warning("⚠ تصویری برای پردازش پیدا نشد")
+            return []
+        
+        import cv2
+        
+        names = self.get_coco_classes()
+        results: List[Union[str, Detections, None]] = [None] * len(image_paths)
+        output_names = self._unique_output_names(image_paths) if save else None
+        save_path = None
+        num_batches = (len(image_paths) + batch_size - 1) // batch_size
+        
+        with self._timed_call():
+            for batch_index, start in enumerate(range(0, len(image_paths), batch_size), 1):
+                batch_paths = image_paths[start:start + batch_size]
+                
+                try:
+                    batch = self._detect_batch(batch_paths, classes, keep_images=save, weights=weights)
+                except Exception as e:
+                    self.metrics.inc('yolov5_errors_total', labels={'reason': 'detect'})
+                    self._fail(DetectionError(f"خطا در پردازش دسته {batch_index}: {e}"), e)
+                    continue
+                
+                if save and save_path is None:
+                    save_path = self._new_output_dir(save_dir)
+                
+                for i, item in enumerate(batch, start):
+                    if item is None:
+                        continue
+                    det, shape, image = item
+                    
+                    output_file = None
+                    if save:
+                        output_file = str(save_path / output_names[i])
+                        annotated = self._draw_detections(image, det)
+                        with self._stage('save'):
+                            cv2.imwrite(output_file, annotated)
+                    
+                    if return_detections or self.log_detections:
+                        result = Detections.from_array(det, names, image_paths[i], shape)
+                        result.output_path = output_file
+                        self._log_detections(result, weights=weights or self.weights)
+                    results[i] = result if return_detections else output_file
+                
+                logger.info(f"✓ دسته {batch_index}/{num_batches} پردازش شد")
+        
+        if save_path is not None:
+            logger.info(f"💾 نتایج ذخیره شد: {save_path}")
+        
+        return results
+    
+    def detect_tiled(self,
+                     image,
+                     tile_size: Optional[int] = None,
+                     overlap: float = 0.2,
+                     global_pass: bool = True,
+                     merge: str = 'fusion',
+                     batch_size: int = 8,
+                     classes: Optional[List[int]] = None,
+                     save: bool = True,
+                     return_detections: bool = False,
+                     save_dir: str = 'runs/detect',
+                     weights: Optional[str] = None) -> Union[str, Detections, None]:
+        """
+        تشخیص کاشی‌بندی‌شده (sliced) برای تصاویر خیلی بزرگ
+        
+        detect_image کل تصویر را به اندازه ورودی مدل کوچک می‌کند و اشیاء کوچک
+        در تصاویر هوایی یا پانوراما از بین می‌روند. این متد تصویر را به
+        کاشی‌های همپوشان با اندازه ورودی مدل تقسیم کرده، کاشی‌ها را دسته‌ای از
+        مدل مقیم عبور می‌دهد و کادرها را در مرز کاشی‌ها ادغام می‌کند. این متد
+        صرف‌نظر از مقدار engine همیشه از مدل مقیم در حافظه استفاده می‌کند.
+        
+        Args:
+            image: مسیر تصویر یا آرایه BGR
+            tile_size: اندازه ضلع کاشی (None = img_size)
+            overlap: نسبت همپوشانی کاشی‌های مجاور (0-1)؛ باید از اندازه بزرگ‌ترین
+                    شیء کوچک مورد نظر بیشتر باشد
+            global_pass: افزودن یک گذر روی کل تصویر کوچک‌شده (برای اشیاء بزرگ‌تر از کاشی)
+            merge: ادغام کادرها - 'fusion' (اجتماع کادرهای بریده‌شده در مرز کاشی‌ها)
+                    یا 'nms' (NMS معمولی)
+            batch_size: تعداد کاشی‌ها در هر فراخوانی مدل
+            classes: لیست شماره کلاس‌های مورد نظر (None = همه کلاس‌ها)
+            save: رسم و ذخیره تصویر حاشیه‌نویسی شده
+            return_detections: بازگرداندن شیء Detections به جای مسیر تصویر خروجی
+            save_dir: مسیر ذخیره نتایج (نسبی = نسبت به پوشه YOLOv5)
+            weights: وزن‌های مدل (None = self.weights)
+        
+        Returns:
+            str: مسیر تصویر خروجی یا None در صورت خطا
+            Detections: اگر return_detections=True باشد
+        
+        نوشته شده توسط: رضا صفری فروشانی
+        """
+        import numpy as np
+        
+        if self.yolov5_path is None:
+            return self._fail(EnvironmentNotReadyError("لطفاً ابتدا setup_environment() را اجرا کنید"))
+        if batch_size < 1:
+            raise ValueError("batch_size باید حداقل 1 باشد")
+        
+        image_path = str(image) if isinstance(image, (str, Path)) else None
+        if image_path is not None and not os.path.exists(image_path):
+            return self._fail(SourceNotFoundError(f"تصویر پیدا نشد: {image_path}"))
+        tile_size = tile_size or self.img_size
+        weights = weights or self.weights
+        
+        logger.info(f"\n{'═'*80}")
+        logger.info(f"تشخیص کاشی‌بندی‌شده اشیاء در تصویر بزرگ")
+        logger.info(f"نویسنده: رضا صفری فروشانی")
+        logger.info(f"{'═'*80}")
+        logger.info(f"📷 تصویر ورودی: {image_path or '<array>'}")
+        logger.info(f"🧩 کاشی: {tile_size}px، همپوشانی {overlap:.0%}، ادغام: {merge}")
+        logger.info(f"⚙️  وزن مدل: {weights}")
+        
+        try:
+            import cv2
+            
+            with self._timed_call():
+                if image_path is not None:
+                    with self._stage('decode'):
+                        image = cv2.imread(image_path)
+                    if image is None:
+                        raise ImageReadError(f"خواندن تصویر ممکن نیست: {image_path}")
+                
+                det, num_tiles = _detect_tiles(
+                    image,
+                    lambda batches: (self._run_model(batch, classes, weights) for batch in batches),
+                    tile_size, overlap, global_pass, merge, self.iou_threshold, batch_size,
+                )
+                logger.info(f"✓ تشخیص با موفقیت انجام شد! ({num_tiles} کاشی، {len(det)} شیء)")
+                
+                output_file = None
+                if save:
+                    name = Path(image_path).name if image_path is not None else 'tiled.jpg'
+                    output_file = self._new_output_dir(save_dir) / name
+                    with self._stage('save'):
+                        cv2.imwrite(str(output_file), self._draw_detections(image, det))
+                    logger.info(f"💾 نتیجه ذخیره شد: {output_file}")
+                
+                if return_detections or self.log_detections:
+                    detections = Detections.from_array(det, self.get_coco_classes(), image_path, image.shape)
+                    detections.output_path = str(output_file) if output_file else None
+                    self._log_detections(detections, weights=weights, tiles=num_tiles)
+                    if return_detections:
+                        return detections
+                
+                return str(output_file) if output_file else None
+            
+        except Exception as e:
+            self.metrics.inc('yolov5_errors_total', labels={'reason': 'detect'})
+            self._fail(e if isinstance(e, YOLOv5Error) else DetectionError(f"خطا در تشخیص کاشی‌بندی‌شده: {e}"), e)
+        
+        return None
+    
+    def detect_video(self, 
+                    video_path: str, 
+                    classes: Optional[List[int]] = None,
+                    save_dir: str = 'runs/detect',
+                    frame_stride: int = 1,
+                    motion_threshold: Optional[float] = None,
+                    weights: Optional[str] = None) -> Optional[str]:
+        """
+        تشخیص اشیاء در یک ویدیو
+        
+        Args:
+            video_path: مسیر ویدیو ورودی
+            classes: لیست شماره کلاس‌های مورد نظر
+            save_dir: مسیر ذخیره نتایج (نسبی = نسبت به پوشه YOLOv5)
+                    هر فراخوانی یک زیرپوشه یکتا در این مسیر می‌سازد
+            frame_stride: اجرای مدل فقط روی هر n فریم (بقیه از تشخیص قبلی استفاده می‌کنند)
+            motion_threshold: حالت تطبیقی - فریم‌هایی که اختلاف میانگین آن‌ها
+                    با آخرین فریم پردازش‌شده (0-1) کمتر از این مقدار باشد
+                    از مدل عبور نمی‌کنند (فقط موتور inprocess، مثال: 0.02)
+            weights: وزن‌های مدل برای همین فراخوانی (None = self.weights)
+                    مدل از registry خوانده می‌شود و تعویض آن هزینه بارگذاری مجدد ندارد
+        
+        Returns:
+            str: مسیر ویدیوی خروجی یا None در صورت خطا
+            
+        نوشته شده توسط: رضا صفری فروشانی
+        Email: safarireza@gmail.com
+        """
+        if self.yolov5_path is None:
+            return self._fail(EnvironmentNotReadyError("لطفاً ابتدا setup_environment() را اجرا کنید"))
+        
+        if not os.path.exists(video_path):
+            return self._fail(SourceNotFoundError(f"ویدیو پیدا نشد: {video_path}"))
+        
+        logger.info(f"\n{'═'*80}")
+        logger.info(f"تشخیص اشیاء در ویدیو")
+        logger.info(f"نویسنده: رضا صفری فروشانی")
+        logger.info(f"{'═'*80}")
+        logger.info(f"🎬 ویدیو ورودی: {video_path}")
+        weights = weights or self.weights
+        logger.info(f"⚙️  وزن مدل: {weights}")
+        logger.info(f"📊 آستانه اطمینان: {self.conf_threshold}")
+        
+        if self.engine == 'inprocess':
+            with self._timed_call():
+                return self._detect_video_inprocess(video_path, classes, frame_stride,
+                                                    motion_threshold, save_dir, weights)
+        
+        try:
+            # ساخت دستور (مسیرها مطلق هستند و دایرکتوری کاری پروسه تغییر نمی‌کند)
+            cmd = [
+                sys.executable, str(self.yolov5_path / "detect.py"),
+                "--weights", weights,
+                "--conf-thres", str(self.conf_threshold),
+                "--source", os.path.abspath(video_path)
+            ]
+            
+            # پوشه خروجی یکتا برای این فراخوانی
+            run_dir = self._new_output_dir(save_dir, mkdir=False)
+            cmd.extend(["--project", str(run_dir.parent), "--name", run_dir.name, "--exist-ok"])
+            
+            if classes is not None:
+                cmd.extend(["--classes"] + [str(c) for c in classes])
+                logger.info(f"🎯 کلاس‌های فیلتر شده: {classes}")
+            
+            if frame_stride > 1:
+                cmd.extend(["--vid-stride", str(frame_stride)])
+                logger.info(f"⏭️  گام فریم: {frame_stride}")
+            if motion_threshold is not None:
+                logger.warning("⚠ حالت تطبیقی (motion_threshold) فقط در موتور inprocess پشتیبانی می‌شود")
+            
+            logger.info(f"\n⏳ در حال پردازش ویدیو (ممکن است زمان‌بر باشد)...")
+            
+            # اجرای تشخیص
+            result = subprocess.run(cmd, capture_output=True, text=True, cwd=self.yolov5_path)
+            
+            if result.returncode == 0:
+                logger.info("✓ پردازش ویدیو با موفقیت انجام شد!")
+                
+                # پیدا کردن ویدیوی خروجی (پسوند توسط detect.py تعیین می‌شود)
+                video_name = Path(video_path).stem
+                output_file = list(run_dir.glob(f"{video_name}.*"))
+                
+                if output_file:
+                    logger.info(f"💾 ویدیو ذخیره شد: {output_file[0]}")
+                    return str(output_file[0])
+            else:
+                raise DetectionError(f"اجرای detect.py ناموفق بود:\n{result.stderr}",
+                                     stderr=result.stderr, returncode=result.returncode)
+                
+        except Exception as e:
+            return self._fail(e if isinstance(e, YOLOv5Error) else DetectionError(f"خطا در پردازش ویدیو: {e}"), e)
+        
+        return None
+    
+    def stream_video(self,
+                     video_path: str,
+                     classes: Optional[List[int]] = None,
+                     batch_size: int = 8,
+                     save: bool = True,
+                     output_path: Optional[str] = None,
+                     save_dir: str = 'runs/detect',
+                     queue_size: int = 32,
+                     frame_stride: int = 1,
+                     motion_threshold: Optional[float] = None,
+                     frame_selector: Optional[_FrameSelector] = None,
+                     weights: Optional[str] = None) -> Iterator[Tuple[int, Detections]]:
+        """
+        پردازش جریانی ویدیو با مراحل همزمان خواندن / استنتاج / نوشتن
+        
+        یک نخ (thread) فریم‌ها را رمزگشایی می‌کند، فریم‌ها در دسته‌های
+        batch_size از مدل مقیم عبور می‌کنند و نخ دیگری فریم‌های حاشیه‌نویسی
+        شده را در فایل خروجی می‌نویسد. مراحل با صف‌های محدود به هم متصل‌اند
+        تا مصرف حافظه ثابت بماند.
+        
+        Args:
+            video_path: مسیر ویدیو ورودی
+            classes: لیست شماره کلاس‌های مورد نظر
+            batch_size: تعداد فریم‌ها در هر فراخوانی مدل
+            save: نوشتن ویدیوی حاشیه‌نویسی شده
+            output_path: مسیر ویدیوی خروجی (None = پوشه یکتای جدید در save_dir)
+            save_dir: مسیر ذخیره نتایج (نسبی = نسبت به پوشه YOLOv5)
+            queue_size: ظرفیت صف‌های بین مراحل
+            frame_stride: اجرای مدل فقط روی هر n فریم
+            motion_threshold: رد کردن فریم‌هایی که اختلاف آن‌ها با آخرین فریم
+                    پردازش‌شده کمتر از این مقدار است (0-1)
+            frame_selector: انتخاب‌گر فریم آماده (به جای frame_stride و motion_threshold)
+            weights: وزن‌های مدل (None = self.weights)
+        
+        فریم‌های رد شده همچنان خروجی دارند و تشخیص‌های آخرین فریم
+        پردازش‌شده برای آن‌ها تکرار می‌شود.
+        
+        Yields:
+            tuple: (شماره فریم، Detections) به ترتیب فریم‌ها
+        
+        نوشته شده توسط: رضا صفری فروشانی
+        """
+        import cv2
+        import numpy as np
+        
+        if batch_size < 1:
+            raise ValueError("batch_size باید حداقل 1 باشد")
+        
+        if frame_selector is None:
+            frame_selector = _FrameSelector(frame_stride, motion_threshold)
+        
+        weights = weights or self.weights
+        self._load_model(weights)
+        
+        capture = cv2.VideoCapture(str(video_path))
+        if not capture.isOpened():
+            raise SourceNotFoundError(f"ویدیو باز نشد: {video_path}")
+        fps = capture.get(cv2.CAP_PROP_FPS) or 30
+        
+        if save and output_path is None:
+            output_path = str(self._new_output_dir(save_dir) / f"{Path(video_path).stem}.mp4")
+        
+        frame_queue = queue.Queue(maxsize=queue_size)
+        write_queue = queue.Queue(maxsize=queue_size)
+        stop = threading.Event()
+        errors = []
+        
+        def read_frames():
+            # مرحله ۱: رمزگشایی فریم‌ها
+            try:
+                index = 0
+                while not stop.is_set():
+                    with self._stage('decode'):
+                        ok, frame = capture.read()
+                    if not ok:
+                        break
+                    infer = frame_selector.should_infer(index, frame)
+                    if not self._queue_put(frame_queue, (index, frame, infer), stop):
+                        break
+                    index += 1
+            except Exception as e:
+                errors.append(e)
+            finally:
+                self._queue_put(frame_queue, None, stop)
+        
+        def write_frames():
+            # مرحله ۳: رسم و فشرده‌سازی فریم‌ها
+            writer = None
+            try:
+                while True:
+                    try:
+                        item = write_queue.get(timeout=0.1)
+                    except queue.Empty:
+                        if stop.is_set():
+                            break
+                        continue
+                    if item is None:
+                        break
+                    frame, det = item
+                    if writer is None:
+                        h, w = frame.shape[:2]
+                        writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (w, h))
+                    annotated = self._draw_detections(frame, det)
+                    with self._stage('save'):
+                        writer.write(annotated)
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+            finally:
+                if writer is not None:
+                    writer.release()
+        
+        reader = threading.Thread(target=read_frames, name="yolov5-reader", daemon=True)
+        reader.start()
+        writer_thread = None
+        if save:
+            writer_thread = threading.Thread(target=write_frames, name="yolov5-writer", daemon=True)
+            writer_thread.start()
+        
+        names = self.get_coco_classes()
+        
+        try:
+            # مرحله ۲: استنتاج دسته‌ای
+            # فریم‌های رد شده در pending می‌مانند تا تشخیص فریم پردازش‌شده قبلی به آن‌ها برسد
+            max_pending = max(batch_size, queue_size)
+            last_det = np.zeros((0, 6), dtype=np.float32)
+            finished = False
+            while not finished:
+                pending = []
+                infer_count = 0
+                while infer_count < batch_size and len(pending) < max_pending:
+                    try:
+                        item = frame_queue.get(timeout=0.1)
+                    except queue.Empty:
+                        if errors:
+                            raise errors[0]
+                        continue
+                    if item is None:
+                        finished = True
+                        break
+                    pending.append(item)
+                    infer_count += item[2]
+                
+                if errors:
+                    raise errors[0]
+                if not pending:
+                    break
+                
+                self.metrics.set('yolov5_queue_depth', frame_queue.qsize(), {'queue': 'stream'})
+                infer_frames = [frame for _, frame, infer in pending if infer]
+                detections = iter(self._run_model(infer_frames, classes, weights) if infer_frames else [])
+                for index, frame, infer in pending:
+                    if infer:
+                        last_det = next(detections)
+                    if save:
+                        self._queue_put(write_queue, (frame, last_det), stop)
+                    result = Detections.from_array(last_det, names, str(video_path), frame.shape)
+                    self._log_detections(result, frame=index, weights=weights)
+                    yield index, result
+            
+            if writer_thread is not None:
+                self._queue_put(write_queue, None, stop)
+                writer_thread.join()
+            if errors:
+                raise errors[0]
+        finally:
+            stop.set()
+            reader.join()
+            if writer_thread is not None:
+                writer_thread.join()
+            capture.release()
+    
+    def stream_videos(self,
+                      sources: Iterable[Union[str, int]],
+                      classes: Optional[List[int]] = None,
+                      batch_size: int = 16,
+                      save: bool = True,
+                      save_dir: str = 'runs/detect',
+                      queue_size: int = 8,
+                      frame_stride: int = 1,
+                      motion_threshold: Optional[float] = None,
+                      weights: Optional[str] = None,
+                      stats: Optional[dict] = None) -> Iterator[Tuple[int, int, Detections]]:
+        """
+        پردازش همزمان چند ویدیو با یک مدل مقیم و دسته‌های استنتاج مشترک
+        
+        هر منبع یک نخ رمزگشایی و یک صف محدود جداگانه دارد. حلقه استنتاج به
+        صورت نوبتی (round-robin) از هر جریان یک فریم برمی‌دارد تا دسته پر شود،
+        پس هر دسته از مدل فریم‌های چند جریان را با سهم برابر دارد و یک جریان
+        کند یا سریع بقیه را عقب نمی‌اندازد. خروجی هر جریان در فایل جداگانه‌ای
+        نوشته می‌شود.
+        
+        Args:
+            sources: مسیر ویدیوها (یا شماره دوربین / آدرس RTSP)
+            classes: لیست شماره کلاس‌های مورد نظر
+            batch_size: تعداد فریم‌ها در هر فراخوانی مدل (از همه جریان‌ها)
+            save: نوشتن ویدیوی حاشیه‌نویسی شده هر جریان
+            save_dir: مسیر ذخیره نتایج (نسبی = نسبت به پوشه YOLOv5)
+            queue_size: ظرفیت صف فریم‌های هر جریان
+            frame_stride: اجرای مدل فقط روی هر n فریم هر جریان
+            motion_threshold: رد کردن فریم‌های کم‌تغییر هر جریان (0-1)
+            weights: وزن‌های مدل (None = self.weights)
+            stats: دیکشنری اختیاری که آمار اجرا در آن به‌روز می‌شود
+                    (outputs، frames هر جریان، batches، inferred)
+        
+        Yields:
+            tuple: (شماره جریان، شماره فریم، Detections) - ترتیب فریم‌های هر جریان حفظ می‌شود
+        
+        نوشته شده توسط: رضا صفری فروشانی
+        """
+        import cv2
+        import numpy as np
+        
+        if batch_size < 1:
+            raise ValueError("batch_size باید حداقل 1 باشد")
+        
+        sources = list(sources)
+        weights = weights or self.weights
+        self._load_model(weights)
+        
+        captures = []
+        try:
+            for source in sources:
+                capture = cv2.VideoCapture(source if isinstance(source, int) else str(source))
+                captures.append(capture)
+                if not capture.isOpened():
+                    raise SourceNotFoundError(f"ویدیو باز نشد: {source}")
+        except Exception:
+            for capture in captures:
+                capture.release()
+            raise
+        
+        outputs = [None] * len(sources)
+        if save:
+            run_dir = self._new_output_dir(save_dir)
+            used = set()
+            for i, source in enumerate(sources):
+                stem = Path(str(source)).stem or f"stream{i}"
+                name = stem if stem not in used else f"{stem}_{i}"
+                used.add(name)
+                outputs[i] = str(run_dir / f"{name}.mp4")
+        
+        stats = stats if stats is not None else {}
+        stats.update(outputs=outputs, frames=[0] * len(sources), batches=0, inferred=0)
+        
+        stop = threading.Event()
+        ready = threading.Event()
+        errors = []
+        frame_queues = [queue.Queue(maxsize=queue_size) for _ in sources]
+        write_queues = [queue.Queue(maxsize=queue_size) for _ in sources] if save else []
+        selectors = [_FrameSelector(frame_stride, motion_threshold) for _ in sources]
+        
+        def read_frames(stream):
+            # مرحله ۱: رمزگشایی فریم‌های یک جریان
+            try:
+                index = 0
+                while not stop.is_set():
+                    with self._stage('decode'):
+                        ok, frame = captures[stream].read()
+                    if not ok:
+                        break
+                    infer = selectors[stream].should_infer(index, frame)
+                    if not self._queue_put(frame_queues[stream], (index, frame, infer), stop):
+                        break
+                    ready.set()
+                    index += 1
+            except Exception as e:
+                errors.append(e)
+            finally:
+                self._queue_put(frame_queues[stream], None, stop)
+                ready.set()
+        
+        def write_frames(stream):
+            # مرحله ۳: رسم و فشرده‌سازی فریم‌های یک جریان
+            writer = None
+            fps = captures[stream].get(cv2.CAP_PROP_FPS) or 30
+            try:
+                while True:
+                    try:
+                        item = write_queues[stream].get(timeout=0.1)
+                    except queue.Empty:
+                        if stop.is_set():
+                            break
+                        continue
+                    if item is None:
+                        break
+                    frame, det = item
+                    if writer is None:
+                        h, w = frame.shape[:2]
+                        writer = cv2.VideoWriter(outputs[stream], cv2.VideoWriter_fourcc(*'mp4v'), fps, (w, h))
+                    annotated = self._draw_detections(frame, det)
+                    with self._stage('save'):
+                        writer.write(annotated)
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+            finally:
+                if writer is not None:
+                    writer.release()
+        
+        threads = [threading.Thread(target=read_frames, args=(i,), name=f"yolov5-reader-{i}", daemon=True)
+                   for i in range(len(sources))]
+        writers = [threading.Thread(target=write_frames, args=(i,), name=f"yolov5-writer-{i}", daemon=True)
+                   for i in range(len(sources))] if save else []
+        for thread in threads + writers:
+            thread.start()
+        
+        names = self.get_coco_classes()
+        
+        try:
+            # مرحله ۲: استنتاج دسته‌ای مشترک با نوبت‌دهی بین جریان‌ها
+            # فریم‌های رد شده (frame_stride) در pending می‌مانند تا تشخیص قبلی همان جریان به آن‌ها برسد
+            active = list(range(len(sources)))
+            last_det = [np.zeros((0, 6), dtype=np.float32) for _ in sources]
+            max_pending = max(batch_size, queue_size * len(sources))
+            offset = 0
+            while active:
+                pending = []
+                infer_count = 0
+                while infer_count < batch_size and len(pending) < max_pending and active:
+                    ready.clear()
+                    taken = False
+                    for stream in active[offset % len(active):] + active[:offset % len(active)]:
+                        if infer_count >= batch_size:
+                            break
+                        try:
+                            item = frame_queues[stream].get_nowait()
+                        except queue.Empty:
+                            continue
+                        taken = True
+                        offset += 1
+                        if item is None:
+                            active.remove(stream)
+                            continue
+                        pending.append((stream, *item))
+                        infer_count += item[2]
+                    if errors:
+                        raise errors[0]
+                    if not taken:
+                        # دسته نیمه‌پر بدون انتظار اجرا می‌شود؛ در غیر این صورت منتظر فریم جدید
+                        if pending:
+                            break
+                        ready.wait(0.1)
+                
+                if not pending:
+                    continue
+                
+                self.metrics.set('yolov5_queue_depth', sum(q.qsize() for q in frame_queues), {'queue': 'multistream'})
+                infer_frames = [frame for _, _, frame, infer in pending if infer]
+                detections = iter(self._run_model(infer_frames, classes, weights) if infer_frames else [])
+                if infer_frames:
+                    stats['batches'] += 1
+                    stats['inferred'] += len(infer_frames)
+                for stream, index, frame, infer in pending:
+                    if infer:
+                        last_det[stream] = next(detections)
+                    if save:
+                        self._queue_put(write_queues[stream], (frame, last_det[stream]), stop)
+                    stats['frames'][stream] += 1
+                    result = Detections.from_array(last_det[stream], names, str(sources[stream]), frame.shape)
+                    self._log_detections(result, stream=stream, frame=index, weights=weights)
+                    yield stream, index, result
+            
+            for write_queue in write_queues:
+                self._queue_put(write_queue, None, stop)
+            for thread in writers:
+                thread.join()
+            if errors:
+                raise errors[0]
+        finally:
+            stop.set()
+            for thread in threads + writers:
+                thread.join()
+            for capture in captures:
+                capture.release()
+    
+    def detect_videos(self,
+                      video_paths: Iterable[Union[str, int]],
+                      classes: Optional[List[int]] = None,
+                      batch_size: int = 16,
+                      save_dir: str = 'runs/detect',
+                      frame_stride: int = 1,
+                      motion_threshold: Optional[float] = None,
+                      weights: Optional[str] = None) -> Optional[dict]:
+        """
+        تشخیص اشیاء در چند ویدیو به صورت همزمان با یک مدل مقیم
+        
+        برخلاف چند فراخوانی detect_video (هر کدام یک پروسه detect.py و یک مدل)،
+        همه جریان‌ها دسته‌های استنتاج مشترک دارند (به stream_videos مراجعه کنید).
+        این متد صرف‌نظر از مقدار engine همیشه از مدل مقیم در حافظه استفاده می‌کند.
+        
+        Args:
+            video_paths: مسیر ویدیوها (یا شماره دوربین / آدرس RTSP)
+            classes: لیست شماره کلاس‌های مورد نظر
+            batch_size: تعداد فریم‌ها در هر فراخوانی مدل
+            save_dir: مسیر ذخیره نتایج (نسبی = نسبت به پوشه YOLOv5)
+            frame_stride: اجرای مدل فقط روی هر n فریم هر جریان
+            motion_threshold: رد کردن فریم‌های کم‌تغییر هر جریان (0-1)
+            weights: وزن‌های مدل (None = self.weights)
+        
+        Returns:
+            dict: outputs (مسیر ویدیوی خروجی هر جریان)، frames، batches، mean_batch_size،
+                  batch_utilization و fps کل؛ یا None در صورت خطا
+        
+        نوشته شده توسط: رضا صفری فروشانی
+        """
+        if self.yolov5_path is None:
+            return self._fail(EnvironmentNotReadyError("لطفاً ابتدا setup_environment() را اجرا کنید"))
+        
+        video_paths = list(video_paths)
+        for path in video_paths:
+            if not isinstance(path, int) and '://' not in str(path) and not os.path.exists(path):
+                return self._fail(SourceNotFoundError(f"ویدیو پیدا نشد: {path}"))
+        
+        logger.info(f"\n{'═'*80}")
+        logger.info(f"تشخیص اشیاء در چند ویدیو (مدل مشترک)")
+        logger.info(f"نویسنده: رضا صفری فروشانی")
+        logger.info(f"{'═'*80}")
+        logger.info(f"🎬 تعداد جریان‌ها: {len(video_paths)}")
+        logger.info(f"📦 اندازه دسته: {batch_size}")
+        logger.info(f"⚙️  وزن مدل: {weights or self.weights}")
+        if classes is not None:
+            logger.info(f"🎯 کلاس‌های فیلتر شده: {classes}")
+        
+        stats = {}
+        try:
+            start = time.perf_counter()
+            with self._timed_call():
+                for _ in self.stream_videos(video_paths, classes, batch_size, save_dir=save_dir,
+                                            frame_stride=frame_stride, motion_threshold=motion_threshold,
+                                            weights=weights, stats=stats):
+                    pass
+            elapsed = time.perf_counter() - start
+        except Exception as e:
+            return self._fail(e if isinstance(e, YOLOv5Error) else DetectionError(f"خطا در پردازش ویدیوها: {e}"), e)
+        
+        batches = stats['batches']
+        stats['mean_batch_size'] = round(stats['inferred'] / batches, 3) if batches else 0.0
+        stats['batch_utilization'] = round(stats['mean_batch_size'] / batch_size, 3)
+        stats['fps'] = round(sum(stats['frames']) / elapsed, 3) if elapsed else 0.0
+        
+        logger.info(f"✓ پردازش {len(video_paths)} ویدیو انجام شد! ({sum(stats['frames'])} فریم، "
+                    f"{stats['fps']:.1f} فریم بر ثانیه)")
+        logger.info(f"📦 میانگین اندازه دسته: {stats['mean_batch_size']} "
+                    f"(بهره‌وری {stats['batch_utilization']:.0%})")
+        for output, frames in zip(stats['outputs'], stats['frames']):
+            logger.info(f"💾 {output} ({frames} فریم)")
+        return stats
+    
+    def detect_webcam(self, 
+                     classes: Optional[List[int]] = None,
+                     camera_index: int = 0,
+                     frame_stride: int = 1,
+                     motion_threshold: Optional[float] = None,
+                     source: Union[int, str, Iterable, None] = None,
+                     on_result: Optional[Callable] = None,
+                     display: bool = True,
+                     max_frames: Optional[int] = None,
+                     weights: Optional[str] = None) -> Optional[dict]:
+        """
+        تشخیص اشیاء زنده از وبکم
+        
+        این متد تشخیص اشیاء را به صورت لحظه‌ای از دوربین وب انجام می‌دهد.
+        برای خروج کلید 'q' را فشار دهید.
+        
+        در موتور inprocess، دریافت فریم در یک نخ جداگانه انجام می‌شود و
+        استنتاج همیشه فقط جدیدترین فریم را پردازش می‌کند (فریم‌های قدیمی
+        دور ریخته می‌شوند) تا تأخیر محدود بماند.
+        
+        Args:
+            classes: لیست شماره کلاس‌های مورد نظر
+            camera_index: شماره دوربین (معمولاً 0)
+            frame_stride: اجرای مدل فقط روی هر n فریم
+            motion_threshold: حالت تطبیقی - رد کردن فریم‌های کم‌تغییر (فقط موتور inprocess)
+            source: منبع جایگزین دوربین - مسیر فایل ویدیو یا یک iterable از
+                    فریم‌های BGR (مثلاً یک generator مصنوعی برای اجرای بدون نمایشگر)
+            on_result: تابعی که برای هر فریم با (شماره فریم، Detections، تأخیر به ثانیه)
+                    فراخوانی می‌شود (فقط موتور inprocess)
+            display: نمایش پنجره خروجی با OpenCV
+            max_frames: توقف پس از پردازش این تعداد فریم
+            weights: وزن‌های مدل برای همین فراخوانی (None = self.weights)
+                    مدل از registry خوانده می‌شود و تعویض آن هزینه بارگذاری مجدد ندارد
+        
+        Returns:
+            dict: آمار اجرا شامل تأخیر انتها به انتها (فقط موتور inprocess)
+        
+        توسعه یافته توسط: رضا صفری فروشانی
+        https://github.com/reza123reza
+        """
+        if self.yolov5_path is None:
+            return self._fail(EnvironmentNotReadyError("لطفاً ابتدا setup_environment() را اجرا کنید"))
+        
+        logger.info(f"\n{'═'*80}")
+        logger.info(f"تشخیص اشیاء زنده از وبکم")
+        logger.info(f"نویسنده: رضا صفری فروشانی")
+        logger.info(f"{'═'*80}")
+        if source is None:
+            source = camera_index
+        logger.info(f"📹 منبع تصویر: {source if isinstance(source, (int, str, Path)) else type(source).__name__}")
+        weights = weights or self.weights
+        logger.info(f"⚙️  وزن مدل: {weights}")
+        logger.info(f"📊 آستانه اطمینان: {self.conf_threshold}")
+        logger.info(f"\nℹ️  برای خروج کلید 'q' را فشار دهید")
+        
+        if self.engine == 'inprocess':
+            with self._timed_call():
+                return self._detect_webcam_inprocess(classes, source, frame_stride, motion_threshold,
+                                                     on_result, display, max_frames, weights)
+        
+        if not isinstance(source, (int, str, Path)):
+            return self._fail(DetectionError("منبع فریم سفارشی فقط در موتور inprocess پشتیبانی می‌شود"))
+        
+        try:
+            # ساخت دستور (مسیرها مطلق هستند و دایرکتوری کاری پروسه تغییر نمی‌کند)
+            cmd = [
+                sys.executable, str(self.yolov5_path / "detect.py"),
+                "--weights", weights,
+                "--conf-thres", str(self.conf_threshold),
+                "--source", os.path.abspath(source) if os.path.exists(str(source)) else str(source)
+            ]
+            
+            if classes is not None:
+                cmd.extend(["--classes"] + [str(c) for c in classes])
+                logger.info(f"🎯 کلاس‌های فیلتر شده: {classes}")
+            
+            if frame_stride > 1:
+                cmd.extend(["--vid-stride", str(frame_stride)])
+                logger.info(f"⏭️  گام فریم: {frame_stride}")
+            if motion_threshold is not None:
+                logger.warning("⚠ حالت تطبیقی (motion_threshold) فقط در موتور inprocess پشتیبانی می‌شود")
+            
+            logger.info(f"\n⏳ در حال راه‌اندازی دوربین...")
+            
+            # اجرای تشخیص
+            subprocess.run(cmd, cwd=self.yolov5_path)
+            
+            logger.info("\n✓ تشخیص متوقف شد")
+                
+        except KeyboardInterrupt:
+            logger.info("\n\nℹ️  تشخیص توسط کاربر متوقف شد")
+        except Exception as e:
+            return self._fail(DetectionError(f"خطا در اجرای وبکم: {e}"), e)
+    
+    async def detect_image_async(self, image, classes: Optional[List[int]] = None,
+                                 weights: Optional[str] = None) -> Detections:
+        """
+        نسخه async تشخیص در یک تصویر برای سرویس‌های asyncio
+        
+        درخواست‌های همزمانی که در بازه async_batch_window می‌رسند به صورت
+        خودکار در یک فراخوانی مدل تجمیع می‌شوند و حلقه رویداد مسدود نمی‌شود.
+        این متد همیشه از مدل مقیم در حافظه استفاده می‌کند.
+        
+        Args:
+            image: مسیر تصویر، بایت‌های فایل تصویر یا آرایه BGR
+            classes: لیست شماره کلاس‌های مورد نظر
+            weights: وزن‌های مدل (None = self.weights)؛ فقط درخواست‌های هم‌مدل تجمیع می‌شوند
+        
+        Returns:
+            Detections: نتیجه ساختاریافته
+        
+        نوشته شده توسط: رضا صفری فروشانی
+        """
+        loop = asyncio.get_running_loop()
+        if self._batcher is None or self._batcher.loop is not loop:
+            self._batcher = _MicroBatcher(self, loop, self.async_batch_size, self.async_batch_window)
+        return await self._batcher.submit(image, classes, weights)
+    
+    async def detect_images_async(self,
+                                  sources: Union[str, Path, Iterable[Union[str, Path]]],
+                                  batch_size: int = 16,
+                                  classes: Optional[List[int]] = None,
+                                  save: bool = True,
+                                  return_detections: bool = False,
+                                  save_dir: str = 'runs/detect',
+                                  weights: Optional[str] = None) -> List[Union[str, Detections, None]]:
+        """
+        نسخه async متد detect_images (اجرا در استخر نخ‌های تشخیص‌دهنده)
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_async_executor(),
+            functools.partial(self.detect_images, sources, batch_size, classes,
+                              save, return_detections, save_dir, weights)
+        )
+    
+    async def detect_video_async(self,
+                                 video_path: str,
+                                 classes: Optional[List[int]] = None,
+                                 **kwargs) -> Optional[str]:
+        """
+        نسخه async متد detect_video (اجرا در استخر نخ‌های تشخیص‌دهنده)
+        
+        Args:
+            video_path: مسیر ویدیو ورودی
+            classes: لیست شماره کلاس‌های مورد نظر
+            **kwargs: سایر آرگومان‌های detect_video
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_async_executor(),
+            functools.partial(self.detect_video, video_path, classes, **kwargs)
+        )
+    
+    def _get_async_executor(self):
+        """
+        استخر نخ‌های اجرای متدهای async (ساخت در اولین استفاده)
+        """
+        if self._async_executor is None:
+            with self._model_lock:
+                if self._async_executor is None:
+                    from concurrent.futures import ThreadPoolExecutor
+                    self._async_executor = ThreadPoolExecutor(
+                        max_workers=self.async_workers, thread_name_prefix="yolov5-async"
+                    )
+        return self._async_executor
+    
+    def _detect_webcam_inprocess(self,
+                                 classes: Optional[List[int]],
+                                 source,
+                                 frame_stride: int,
+                                 motion_threshold: Optional[float],
+                                 on_result: Optional[Callable] = None,
+                                 display: bool = True,
+                                 max_frames: Optional[int] = None,
+                                 weights: Optional[str] = None) -> Optional[dict]:
+        """
+        تشخیص زنده با مدل مقیم در حافظه (موتور inprocess)
+        
+        یک نخ دریافت، فریم‌ها را در _LatestFrameSlot بازنویسی می‌کند و حلقه
+        استنتاج همیشه فقط جدیدترین فریم را پردازش می‌کند. تأخیر انتها به انتها
+        از لحظه دریافت فریم تا آماده شدن نتیجه اندازه‌گیری می‌شود.
+        
+        Returns:
+            dict: آمار اجرا (تعداد فریم‌ها، فریم‌های دور ریخته، تأخیر میانگین/بیشینه)
+        """
+        import time
+        import cv2
+        import numpy as np
+        
+        slot = _LatestFrameSlot()
+        stop = threading.Event()
+        errors = []
+        
+        def capture_frames():
+            capture = None
+            try:
+                if isinstance(source, (int, str, Path)):
+                    capture = cv2.VideoCapture(source if isinstance(source, int) else str(source))
+                    if not capture.isOpened():
+                        raise SourceNotFoundError(f"منبع تصویر باز نشد: {source}")
+                    # فایل ویدیو با سرعت واقعی خود پخش می‌شود تا رفتار دوربین را شبیه‌سازی کند
+                    interval = 0.0
+                    if not isinstance(source, int):
+                        interval = 1.0 / (capture.get(cv2.CAP_PROP_FPS) or 30)
+                    
+                    def read_frame():
+                        with self._stage('decode'):
+                            return capture.read()
+                    
+                    frames = iter(read_frame, (False, None))
+                else:
+                    interval = 0.0
+                    frames = ((True, frame) for frame in source)
+                
+                index = 0
+                next_time = time.perf_counter()
+                for ok, frame in frames:
+                    if stop.is_set() or not ok:
+                        break
+                    slot.put((index, frame, time.perf_counter()))
+                    index += 1
+                    if interval:
+                        next_time += interval
+                        time.sleep(max(0.0, next_time - time.perf_counter()))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                if capture is not None:
+                    capture.release()
+                slot.close()
+        
+        stats = {'frames': 0, 'dropped': 0, 'skipped': 0,
+                 'mean_latency': 0.0, 'max_latency': 0.0}
+        latencies = []
+        capture_thread = threading.Thread(target=capture_frames, name="yolov5-capture", daemon=True)
+        
+        try:
+            logger.info(f"\n⏳ در حال راه‌اندازی دوربین (in-process)...")
+            weights = weights or self.weights
+            self._load_model(weights)
+            capture_thread.start()
+            
+            selector = _FrameSelector(frame_stride, motion_threshold)
+            names = self.get_coco_classes()
+            det = np.zeros((0, 6), dtype=np.float32)
+            
+            while True:
+                item = slot.get(timeout=0.5)
+                if item is None:
+                    if slot.closed:
+                        break
+                    continue
+                
+                index, frame, captured_at = item
+                if selector.should_infer(index, frame):
+                    det = self._run_model([frame], classes, weights)[0]
+                
+                latency = time.perf_counter() - captured_at
+                latencies.append(latency)
+                
+                if on_result is not None or self.log_detections:
+                    result = Detections.from_array(det, names, None, frame.shape)
+                    self._log_detections(result, frame=index, latency=latency, weights=weights)
+                    if on_result is not None:
+                        on_result(index, result, latency)
+                
+                if display:
+                    cv2.imshow("YOLOv5", self._draw_detections(frame, det))
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        break
+                
+                if max_frames is not None and len(latencies) >= max_frames:
+                    break
+            
+            if errors:
+                raise errors[0]
+            
+            stats.update(
+                frames=len(latencies),
+                dropped=slot.dropped,
+                skipped=selector.skipped,
+                mean_latency=sum(latencies) / len(latencies) if latencies else 0.0,
+                max_latency=max(latencies, default=0.0),
+            )
+            logger.info(f"\n✓ تشخیص متوقف شد ({stats['frames']} فریم پردازش شد، "
+                        f"{stats['dropped']} فریم قدیمی دور ریخته شد)")
+            logger.info(f"⏱️  تأخیر انتها به انتها: میانگین {stats['mean_latency'] * 1000:.1f} ms، "
+                        f"بیشینه {stats['max_latency'] * 1000:.1f} ms")
+            return stats
+            
+        except KeyboardInterrupt:
+            logger.info("\n\nℹ️  تشخیص توسط کاربر متوقف شد")
+        except Exception as e:
+            self.metrics.inc('yolov5_errors_total', labels={'reason': 'webcam'})
+            self._fail(e if isinstance(e, YOLOv5Error) else DetectionError(f"خطا در اجرای وبکم: {e}"), e)
+        finally:
+            stop.set()
+            if capture_thread.is_alive():
+                capture_thread.join()
+            if display:
+                cv2.destroyAllWindows()
+        
+        return None
+    
+    def _detect_video_inprocess(self,
+                                video_path: str,
+                                classes: Optional[List[int]],
+                                frame_stride: int = 1,
+                                motion_threshold: Optional[float] = None,
+                                save_dir: str = 'runs/detect',
+                                weights: Optional[str] = None) -> Optional[str]:
+        """
+        تشخیص اشیاء در ویدیو با خط لوله جریانی stream_video (موتور inprocess)
+        
+        نوشته شده توسط: رضا صفری فروشانی
+        """
+        try:
+            if classes is not None:
+                logger.info(f"🎯 کلاس‌های فیلتر شده: {classes}")
+            logger.info(f"\n⏳ در حال پردازش ویدیو (in-process)...")
+            
+            output_file = self._new_output_dir(save_dir) / f"{Path(video_path).stem}.mp4"
+            selector = _FrameSelector(frame_stride, motion_threshold)
+            frames = objects = 0
+            for _, detections in self.stream_video(video_path, classes, output_path=str(output_file),
+                                                   frame_selector=selector, weights=weights):
+                frames += 1
+                objects += len(detections)
+            
+            logger.info(f"✓ پردازش ویدیو با موفقیت انجام شد! ({frames} فریم، {objects} شیء)")
+            if selector.skipped:
+                logger.info(f"⏭️  {selector.skipped} فریم بدون استنتاج (استفاده از تشخیص قبلی)")
+            logger.info(f"💾 ویدیو ذخیره شد: {output_file}")
+            return str(output_file)
+            
+        except Exception as e:
+            self.metrics.inc('yolov5_errors_total', labels={'reason': 'video'})
+            self._fail(e if isinstance(e, YOLOv5Error) else DetectionError(f"خطا در پردازش ویدیو: {e}"), e)
+        
+        return None
+    
+    def _new_output_dir(self, save_dir: str, mkdir: bool = True) -> Path:
+        """
+        ساخت مسیر پوشه خروجی یکتا برای یک فراخوانی
+        
+        نام پوشه از زمان و یک شناسه تصادفی ساخته می‌شود، بنابراین نیازی
+        به پیمایش اجراهای قبلی نیست و فراخوانی‌های همزمان تداخل ندارند.
+        
+        Args:
+            save_dir: پوشه پایه (مسیر نسبی نسبت به پوشه YOLOv5 تفسیر می‌شود)
+            mkdir: ساختن پوشه
+        """
+        base = Path(save_dir)
+        if not base.is_absolute():
+            base = self.yolov5_path / base
+        
+        run_dir = base / f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        if mkdir:
+            run_dir.mkdir(parents=True, exist_ok=True)
+        return run_dir
+    
+    @staticmethod
+    def _queue_put(target: "queue.Queue", item, stop: threading.Event) -> bool:
+        """
+        قرار دادن آیتم در صف محدود بدون قفل شدن دائمی پس از توقف خط لوله
+        
+        Returns:
+            bool: True اگر آیتم در صف قرار گرفت، False اگر خط لوله متوقف شد
+        """
+        while not stop.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def _display_result(self, output_file: Union[str, Path]):
+        """
+        نمایش تصویر خروجی در محیط نوتبوک (در صورت وجود IPython)
+        """
+        try:
+            from IPython.display import Image, display
+            logger.info("\n📸 نمایش نتیجه:")
+            display(Image(filename=str(output_file)))
+        except ImportError:
+            logger.info("ℹ️  برای نمایش تصویر در محیط نوتبوک قرار دهید")
+    
+    @classmethod
+    def _expand_image_sources(cls, sources) -> List[str]:
+        """
+        تبدیل ورودی detect_images (پوشه، الگوی glob یا لیست مسیرها) به لیست مسیرها
+        """
+        if isinstance(sources, (str, Path)):
+            sources = str(sources)
+            if os.path.isdir(sources):
+                return sorted(
+                    str(p) for p in Path(sources).iterdir()
+                    if p.suffix.lower() in cls.IMAGE_EXTENSIONS
+                )
+            if glob.has_magic(sources):
+                return sorted(glob.glob(sources, recursive=True))
+            return [sources]
+        
+        return [str(p) for p in sources]
+    
+    @staticmethod
+    def _unique_output_names(paths: List[str]) -> List[str]:
+        """
+        نام فایل خروجی یکتا برای هر ورودی در یک پوشه خروجی مشترک
+        
+        ورودی‌های هم‌نام از پوشه‌های مختلف (مثلاً الگوی glob بازگشتی) با پسوند
+        شماره ورودی از هم جدا می‌شوند: a/img.jpg → img.jpg، b/img.jpg → img_1.jpg
+        """
+        used = set()
+        names = []
+        for index, path in enumerate(paths):
+            path = Path(path)
+            name, suffix = path.name, index
+            while name in used:
+                name = f"{path.stem}_{suffix}{path.suffix}"
+                suffix += 1
+            used.add(name)
+            names.append(name)
+        return names
+    
+    def _read_label_file(self, label_file: Path, image_path: str) -> Detections:
+        """
+        خواندن فایل برچسب detect.py (--save-txt --save-conf) به صورت Detections
+        
+        هر خط فایل شامل: cls x_center y_center width height conf (نرمال شده)
+        """
+        import cv2
+        import numpy as np
+        
+        image = cv2.imread(str(image_path))
+        h, w = image.shape[:2]
+        
+        det = np.zeros((0, 6), dtype=np.float32)
+        if label_file.exists():
+            rows = np.loadtxt(label_file, dtype=np.float32, ndmin=2)
+            if len(rows):
+                xc, yc, bw, bh = rows[:, 1] * w, rows[:, 2] * h, rows[:, 3] * w, rows[:, 4] * h
+                det = np.stack([xc - bw / 2, yc - bh / 2, xc + bw / 2, yc + bh / 2,
+                                rows[:, 5], rows[:, 0]], axis=1)
+        
+        return Detections.from_array(det, self.get_coco_classes(), str(image_path), image.shape)
+    
+    def add_stage_hook(self, callback: Callable[[str, float], None]):
+        """
+        ثبت تابعی که پس از هر مرحله با (نام مرحله، زمان بر حسب ثانیه) فراخوانی می‌شود
+        
+        مثال:
+            detector.add_stage_hook(lambda stage, seconds: logger.debug(f"{stage}: {seconds:.4f}s"))
+        """
+        self._stage_hooks.append(callback)
+    
+    def add_call_hook(self, callback: Callable[[dict], None]):
+        """
+        ثبت تابعی که پس از هر فراخوانی کامل با دیکشنری زمان مراحل فراخوانی می‌شود
+        """
+        self._call_hooks.append(callback)
+    
+    def remove_hook(self, callback: Callable):
+        """
+        حذف تابع ثبت‌شده با add_stage_hook یا add_call_hook
+        """
+        for hooks in (self._stage_hooks, self._call_hooks):
+            if callback in hooks:
+                hooks.remove(callback)
+    
+    @contextlib.contextmanager
+    def profile(self, kind: str = 'cprofile', output: Optional[Union[str, Path]] = None,
+                top: int = 20):
+        """
+        پروفایل کردن تشخیص‌های داخل بلوک with
+        
+        Args:
+            kind: 'cprofile' (فایل .prof برای snakeviz/pstats) یا
+                  'torch' (trace کروم برای chrome://tracing یا Perfetto؛
+                  مراحل خط لوله با نام yolov5::<stage> در trace دیده می‌شوند)
+            output: مسیر فایل خروجی (None = پوشه یکتای جدید در runs/profile)
+            top: تعداد سطرهای خلاصه چاپ شده
+        
+        cProfile فقط نخ فراخوان را پروفایل می‌کند.
+        
+        مثال:
+            with detector.profile('torch') as trace_path:
+                detector.detect_image("image.jpg")
+        
+        نوشته شده توسط: رضا صفری فروشانی
+        """
+        if kind not in ('cprofile', 'torch'):
+            raise ValueError(f"نوع پروفایل نامعتبر: {kind} (گزینه‌ها: cprofile, torch)")
+        
+        if output is None:
+            output = self._new_output_dir('runs/profile') / ('profile.prof' if kind == 'cprofile'
+                                                             else 'trace.json')
+        output = Path(output)
+        
+        if kind == 'cprofile':
+            import cProfile
+            import pstats
+            
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield output
+            finally:
+                profiler.disable()
+                profiler.dump_stats(str(output))
+                report = io.StringIO()
+                pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(top)
+                logger.info(report.getvalue())
+        else:
+            import torch
+            from torch.profiler import ProfilerActivity
+            
+            activities = [ProfilerActivity.CPU]
+            if self.device != 'cpu' and torch.cuda.is_available():
+                activities.append(ProfilerActivity.CUDA)
+            
+            with torch.profiler.profile(activities=activities, record_shapes=True) as profiler:
+                self._torch_profiling = True
+                try:
+                    yield output
+                finally:
+                    self._torch_profiling = False
+            profiler.export_chrome_trace(str(output))
+            logger.info(profiler.key_averages().table(sort_by='self_cpu_time_total', row_limit=top))
+        
+        logger.info(f"💾 پروفایل ذخیره شد: {output}")
+    
+    @contextlib.contextmanager
+    def _stage(self, name: str):
+        """
+        زمان‌سنجی یک مرحله خط لوله و اطلاع‌رسانی به توابع ثبت‌شده
+        """
+        label = contextlib.nullcontext()
+        if self._torch_profiling:
+            import torch
+            label = torch.profiler.record_function(f"yolov5::{name}")
+        
+        with label:
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                seconds = time.perf_counter() - start
+                self.stats.record(name, seconds)
+                self.metrics.observe('yolov5_stage_seconds', seconds, {'stage': name})
+                for hook in self._stage_hooks:
+                    hook(name, seconds)
+    
+    def _fail(self, error: 'YOLOv5Error', cause: Optional[BaseException] = None):
+        """
+        گزارش یک خطا بر اساس raise_errors
+        
+        با raise_errors=True خطای نوع‌دار پرتاب می‌شود و در غیر این صورت
+        فقط پیام آن ثبت شده و None برگردانده می‌شود.
+        """
+        if self.raise_errors:
+            if cause is not None and cause is not error:
+                raise error from cause
+            raise error
+        logger.error(f"✗ {error}")
+        return None
+    
+    @staticmethod
+    def _attach_detection_handler(target: Union[bool, str, Path]):
+        """
+        افزودن هندلر خطوط JSON به detection_logger (خروجی استاندارد یا فایل)
+        """
+        if target is True:
+            key = '<stdout>'
+            handler = logging.StreamHandler(sys.stdout)
+        else:
+            key = os.path.abspath(str(target))
+            handler = logging.FileHandler(key, encoding='utf-8')
+        
+        if any(getattr(existing, '_yolov5_target', None) == key for existing in detection_logger.handlers):
+            handler.close()
+            return
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        handler._yolov5_target = key
+        detection_logger.addHandler(handler)
+        detection_logger.setLevel(logging.INFO)
+        # خطوط JSON نباید با پیام‌های پیشرفت در کنسول تکرار شوند
+        detection_logger.propagate = False
+    
+    def _log_detections(self, detections: Detections, **context):
+        """
+        ثبت یک نتیجه تشخیص به صورت یک خط JSON روی detection_logger
+        """
+        if not self.log_detections:
+            return
+        record = detections.to_dict()
+        record['weights'] = self.weights
+        record.update(context)
+        record['time'] = time.time()
+        detection_logger.info(json.dumps(record, ensure_ascii=False))
+    
+    @contextlib.contextmanager
+    def _timed_call(self):
+        """
+        مرزبندی یک فراخوانی کامل برای stats.last و add_call_hook
+        """
+        outermost = self.stats._begin_call()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if outermost:
+                timings = self.stats._end_call(time.perf_counter() - start)
+                for hook in self._call_hooks:
+                    hook(timings)
+    
+    def _resolve_weights(self, weights: str) -> str:
+        """
+        تبدیل نام وزن‌ها به مسیر مطلق
+        
+        نام‌های ساده (مثل yolov5m.pt) مانند detect.py نسبت به پوشه YOLOv5
+        تفسیر می‌شوند تا فایل دانلود شده قبلی دوباره استفاده شود.
+        """
+        if os.path.isabs(weights) or os.path.exists(weights):
+            return os.path.abspath(weights)
+        return str(self.yolov5_path / weights)
+    
+    def _import_yolov5(self):
+        """
+        افزودن پوشه YOLOv5 به sys.path برای استفاده از ماژول‌های آن در همین پروسه
+        """
+        if self.yolov5_path is None:
+            raise EnvironmentNotReadyError("لطفاً ابتدا setup_environment() را اجرا کنید")
+        
+        yolov5_dir = str(self.yolov5_path)
+        if yolov5_dir not in sys.path:
+            sys.path.insert(0, yolov5_dir)
+    
+    def _load_model(self, weights: Optional[str] = None):
+        """
+        دریافت مدل مقیم از registry (بارگذاری تنبل در اولین استفاده)
+        
+        هر مدل فقط یک بار بارگذاری شده و تا زمانی که بودجه حافظه registry
+        اجازه دهد برای تشخیص‌های بعدی در حافظه باقی می‌ماند.
+        
+        Args:
+            weights: وزن‌های مدل (None = self.weights)
+        
+        Returns:
+            DetectMultiBackend: مدل آماده استنتاج
+        
+        نوشته شده توسط: رضا صفری فروشانی
+        """
+        weights = weights or self.weights
+        return self.registry.get(self._model_key(weights), functools.partial(self._build_model, weights))
+    
+    def _model_key(self, weights: str) -> tuple:
+        """
+        کلید مدل در registry (هر تنظیمی که مدل بارگذاری‌شده را تغییر دهد)
+        """
+        self._import_yolov5()
+        exported = self.backend != 'torch'
+        return (
+            self._resolve_weights(weights), self.backend, self.precision,
+            str(self.calibration) if self.precision == 'int8' else None,
+            self.img_size if exported else None, self.device,
+        )
+    
+    def _build_model(self, weights: str):
+        """
+        بارگذاری یک مدل در همین پروسه (فراخوانی شده توسط registry)
+        """
+        logger.info(f"⏳ بارگذاری مدل {weights} در حافظه...")
+        with self._stage('load'):
+            self._import_yolov5()
+            
+            import torch
+            from models.common import DetectMultiBackend
+            
+            path = self._resolve_weights(weights)
+            if self.share_weights:
+                path = str(self.fuse_weights(weights=weights))
+            elif self.backend != 'torch':
+                if self.backend == 'onnx':
+                    # خطای نبود onnxruntime پیش از صدور زمان‌بر مدل
+                    _import_optional('onnxruntime', "backend='onnx'")
+                path = str(self.export(self.backend, weights=weights))
+                if self.precision == 'int8':
+                    path = str(self.quantize(weights=weights))
+            
+            if self.backend == 'onnx':
+                # بودجه نخ‌های torch (DetectorPool، بنچمارک) برای ONNX Runtime هم اعمال می‌شود
+                model = _OnnxRuntimeModel(path, torch.device(self.device), torch.get_num_threads())
+            elif self.share_weights:
+                model = _MmapTorchModel(path, torch.device(self.device))
+            else:
+                model = DetectMultiBackend(path, device=torch.device(self.device))
+            model.eval()
+        logger.info("✓ مدل بارگذاری شد و برای فراخوانی‌های بعدی مقیم است")
+        return model
+    
+    def _export_path(self, backend: str, weights: Optional[str] = None) -> Path:
+        """
+        مسیر فایل خروجی کش‌شده کنار فایل وزن‌ها (مثال: yolov5s_640.onnx)
+        """
+        weights = Path(self._resolve_weights(weights or self.weights))
+        return weights.with_name(f"{weights.stem}_{self.img_size}{_EXPORT_SUFFIXES[backend]}")
+    
+    def fuse_weights(self, force: bool = False, weights: Optional[str] = None) -> Path:
+        """
+        ساخت فایل وزن‌های ادغام‌شده (Conv+BN) با دقت FP32 برای بارگذاری با mmap
+        
+        فایل‌های رسمی YOLOv5 با دقت FP16 و بدون ادغام ذخیره شده‌اند، پس هر پروسه
+        هنگام بارگذاری یک کپی خصوصی از وزن‌ها می‌سازد. این فایل دقیقاً همان
+        تنسورهایی را دارد که مدل در حال اجرا استفاده می‌کند، بنابراین با
+        share_weights=True تنسورها مستقیماً روی صفحات نگاشت‌شده فایل ساخته
+        می‌شوند و تمام پروسه‌های یک میزبان یک نسخه از آن را در page cache
+        به اشتراک می‌گذارند. فایل کنار وزن‌ها ذخیره می‌شود (مثال: yolov5l_fused.pt)
+        و تا زمانی که از فایل وزن‌ها جدیدتر باشد دوباره ساخته نمی‌شود.
+        
+        Args:
+            force: ساخت دوباره حتی اگر فایل کش‌شده معتبر باشد
+            weights: وزن‌های مدل (None = self.weights)
+        
+        Returns:
+            Path: مسیر فایل وزن‌های ادغام‌شده
+        
+        نوشته شده توسط: رضا صفری فروشانی
+        """
+        self._import_yolov5()
+        weights = Path(self._resolve_weights(weights or self.weights))
+        output = weights.with_name(f"{weights.stem}_fused.pt")
+        if not force and output.exists() and output.stat().st_mtime >= weights.stat().st_mtime:
+            return output
+        
+        import torch
+        from models.common import DetectMultiBackend
+        
+        logger.info(f"⏳ ساخت وزن‌های ادغام‌شده {output.name} برای اشتراک بین پروسه‌ها...")
+        model = DetectMultiBackend(str(weights), device=torch.device('cpu')).model.float().eval()
+        
+        # نوشتن در فایل موقت و جایگزینی اتمی (امن برای چند پروسه همزمان)
+        temporary = output.with_name(f".{output.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            torch.save({'model': model}, str(temporary))
+            os.replace(temporary, output)
+        finally:
+            if temporary.exists():
+                temporary.unlink()
+        
+        logger.info(f"✓ وزن‌های ادغام‌شده ساخته شد ({output.stat().st_size / 2 ** 20:.0f} MB): {output}")
+        return output
+    
+    def export(self,
+               backend: str = 'onnx',
+               output: Optional[Union[str, Path]] = None,
+               force: bool = False,
+               weights: Optional[str] = None) -> Path:
+        """
+        خروجی گرفتن از مدل برای TorchScript یا ONNX Runtime
+        
+        فایل خروجی کنار فایل وزن‌ها ذخیره می‌شود و تا زمانی که از فایل وزن‌ها
+        جدیدتر باشد دوباره ساخته نمی‌شود. اندازه ورودی (img_size) ثابت و
+        اندازه دسته پویا است.
+        
+        Args:
+            backend: 'torchscript' یا 'onnx'
+            output: مسیر فایل خروجی (None = کنار فایل وزن‌ها، مثال: yolov5s_640.onnx)
+            force: ساخت دوباره حتی اگر فایل کش‌شده معتبر باشد
+            weights: وزن‌های مدل (None = self.weights)
+        
+        Returns:
+            Path: مسیر فایل خروجی
+        
+        مثال:
+            detector = YOLOv5Detector('yolov5s.pt', engine='inprocess', backend='onnx')
+            detector.setup_environment()
+            detector.export('onnx')          # اختیاری؛ در اولین تشخیص خودکار انجام می‌شود
+        
+        نوشته شده توسط: رضا صفری فروشانی
+        """
+        if backend not in _EXPORT_SUFFIXES:
+            raise ValueError(f"backend نامعتبر برای خروجی: {backend} (گزینه‌ها: torchscript, onnx)")
+        
+        self._import_yolov5()
+        output = Path(output) if output is not None else self._export_path(backend, weights)
+        weights = Path(self._resolve_weights(weights or self.weights))
+        if not force and output.exists() and output.stat().st_mtime >= weights.stat().st_mtime:
+            return output
+        
+        onnx = _import_optional('onnx', "backend='onnx'") if backend == 'onnx' else None
+        
+        import torch
+        from models.common import DetectMultiBackend
+        from models.yolo import Detect
+        
+        logger.info(f"⏳ خروجی گرفتن از {weights.name} برای {backend} (img_size={self.img_size})...")
+        start = time.perf_counter()
+        
+        # یک نسخه جداگانه روی CPU: گرید لایه Detect مدل مقیم در inference_mode ساخته
+        # شده و قابل ردیابی نیست
+        source = DetectMultiBackend(str(weights), device=torch.device('cpu'))
+        model = source.model.float().eval()
+        for module in model.modules():
+            if isinstance(module, Detect):
+                module.inplace = False
+                module.export = True
+        
+        sample = torch.zeros(1, 3, self.img_size, self.img_size)
+        metadata = {'stride': int(source.stride), 'names': source.names}
+        
+        # نوشتن در فایل موقت و جایگزینی اتمی (امن برای چند پروسه همزمان)
+        temporary = output.with_name(f".{output.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with torch.no_grad(), warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                model(sample)  # ساخت گرید Detect پیش از ردیابی تا گراف هر اجرا یکسان باشد
+                if backend == 'torchscript':
+                    traced = torch.jit.trace(model, sample, strict=False)
+                    traced.save(str(temporary), _extra_files={
+                        'config.txt': json.dumps({'shape': list(sample.shape), **metadata})
+                    })
+                else:
+                    options = {}
+                    if 'dynamo' in inspect.signature(torch.onnx.export).parameters:
+                        options['dynamo'] = False
+                    torch.onnx.export(
+                        model, sample, str(temporary),
+                        opset_version=_ONNX_OPSET,
+                        input_names=['images'],
+                        output_names=['output0'],
+                        dynamic_axes={'images': {0: 'batch'}, 'output0': {0: 'batch'}},
+                        **options,
+                    )
+                    proto = onnx.load(str(temporary))
+                    for key, value in metadata.items():
+                        entry = proto.metadata_props.add()
+                        entry.key, entry.value = key, str(value)
+                    onnx.save(proto, str(temporary))
+            os.replace(temporary, output)
+        finally:
+            if temporary.exists():
+                temporary.unlink()
+        
+        logger.info(f"✓ خروجی {backend} ساخته شد ({time.perf_counter() - start:.1f} ثانیه): {output}")
+        return output
+    
+    def quantize(self, calibration=None, force: bool = False, weights: Optional[str] = None) -> Path:
+        """
+        کوانتیزه‌سازی INT8 پس از آموزش با ONNX Runtime
+        
+        بدون تصاویر کالیبراسیون، کوانتیزه‌سازی پویا (وزن‌ها INT8 و فعال‌سازی‌ها در
+        زمان اجرا) و با آن‌ها کوانتیزه‌سازی ایستا (QDQ، وزن‌ها و فعال‌سازی‌ها) انجام
+        می‌شود. رمزگشایی کادرها در لایه Detect در FP32 باقی می‌ماند تا مختصات دقیق بمانند.
+        فایل خروجی کنار فایل ONNX کش می‌شود (مثال: yolov5m_640_int8.onnx).
+        
+        Args:
+            calibration: تصاویر کالیبراسیون (None = self.calibration)
+            force: ساخت دوباره حتی اگر فایل کش‌شده معتبر باشد
+            weights: وزن‌های مدل (None = self.weights)
+        
+        Returns:
+            Path: مسیر مدل کوانتیزه‌شده
+        
+        نوشته شده توسط: رضا صفری فروشانی
+        """
+        calibration = self.calibration if calibration is None else calibration
+        quantization = _import_optional('onnxruntime.quantization', "precision='int8'", 'onnxruntime')
+        
+        source = self.export('onnx', weights=weights)
+        paths = []
+        if calibration is None:
+            output = source.with_name(f"{source.stem}_int8.onnx")
+        else:
+            paths = self._expand_image_sources(calibration)
+            if not paths:
+                raise SourceNotFoundError(f"هیچ تصویر کالیبراسیونی پیدا نشد: {calibration}")
+            # هر مجموعه کالیبراسیون فایل جداگانه خود را دارد
+            digest = hashlib.sha1(json.dumps(
+                [[path, os.path.getsize(path), os.path.getmtime(path)] for path in paths]
+            ).encode()).hexdigest()[:8]
+            output = source.with_name(f"{source.stem}_int8_{digest}.onnx")
+        
+        if not force and output.exists() and output.stat().st_mtime >= source.stat().st_mtime:
+            return output
+        
+        onnx = _import_optional('onnx', "precision='int8'")
+        
+        import cv2
+        import numpy as np
+        from utils.augmentations import letterbox
+        
+        mode = 'ایستا' if paths else 'پویا'
+        logger.info(f"⏳ کوانتیزه‌سازی INT8 ({mode}) {source.name}...")
+        start = time.perf_counter()
+        
+        # گره‌های رمزگشایی لایه Detect (آخرین ماژول، مثال: /model.24/Mul_3) در FP32 می‌مانند
+        nodes = onnx.load(str(source)).graph.node
+        modules = [int(match.group(1)) for match in (re.match(r'/model\.(\d+)/', node.name) for node in nodes)
+                   if match]
+        head = f"/model.{max(modules)}/" if modules else None
+        exclude = [node.name for node in nodes
+                   if head and node.name.startswith(head) and node.op_type != 'Conv']
+        
+        img_size = self.img_size
+        
+        class CalibrationReader(quantization.CalibrationDataReader):
+            """خواندن تنبل تصاویر کالیبراسیون با همان پیش‌پردازش استنتاج"""
+            
+            def __init__(self):
+                self.paths = iter(paths)
+            
+            def get_next(self):
+                for path in self.paths:
+                    image = cv2.imread(path)
+                    if image is not None:
+                        batch = letterbox(image, img_size, auto=False)[0][None]
+                        batch = np.ascontiguousarray(batch[..., ::-1].transpose(0, 3, 1, 2))
+                        return {'images': batch.astype(np.float32) / 255}
+                return None
+        
+        temporary = output.with_name(f".{output.stem}.{uuid.uuid4().hex}.onnx")
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                if paths:
+                    quantization.quantize_static(
+                        str(source), str(temporary), CalibrationReader(),
+                        quant_format=quantization.QuantFormat.QDQ,
+                        activation_type=quantization.QuantType.QUInt8,
+                        weight_type=quantization.QuantType.QInt8,
+                        per_channel=True,
+                        nodes_to_exclude=exclude,
+                    )
+                else:
+                    # وزن‌های QUInt8: کرنل‌های ConvInteger روی CPU برای QInt8 بسیار کندترند
+                    quantization.quantize_dynamic(
+                        str(source), str(temporary),
+                        weight_type=quantization.QuantType.QUInt8,
+                        nodes_to_exclude=exclude,
+                    )
+            os.replace(temporary, output)
+        finally:
+            if temporary.exists():
+                temporary.unlink()
+        
+        logger.info(f"✓ مدل INT8 ساخته شد ({time.perf_counter() - start:.1f} ثانیه، "
+                    f"{source.stat().st_size / 2**20:.1f} → {output.stat().st_size / 2**20:.1f} MB): {output}")
+        return output
+    
+    def compare_precision(self,
+                          images,
+                          labels: Optional[Union[str, Path]] = None,
+                          batch_size: int = 8) -> dict:
         """
-        مقداردهی اولیه کلاس تشخیص‌دهنده YOLOv5
+        مقایسه مدل INT8 با مدل FP32 روی یک مجموعه اعتبارسنجی
+        
+        تشخیص‌های FP32 مرجع در نظر گرفته می‌شوند: توافق (precision/recall/F1 با
+        IoU ≥ 0.5 و کلاس یکسان) و mAP@0.5 مدل INT8 نسبت به آن‌ها گزارش می‌شود.
+        اگر برچسب‌های واقعی (قالب YOLO) داده شوند، mAP هر دو مدل و اختلاف آن‌ها هم
+        محاسبه می‌شود. تشخیص‌ها با conf_threshold همین تشخیص‌دهنده انجام می‌شوند.
         
         Args:
-            weights: نام یا مسیر فایل وزن‌های مدل
-                    گزینه‌ها: yolov5s.pt, yolov5m.pt, yolov5l.pt, yolov5x.pt
-            conf_threshold: آستانه اطمینان (بین 0 تا 1)
+            images: تصاویر اعتبارسنجی (پوشه، الگوی glob یا لیست)
+            labels: پوشه فایل‌های برچسب YOLO (<نام تصویر>.txt: cls xc yc w h نرمال‌شده)
+            batch_size: اندازه دسته
+        
+        Returns:
+            dict: تعداد تشخیص‌ها، توافق، mAP، زمان هر تصویر و حجم فایل مدل هر دو دقت
         
         نوشته شده توسط: رضا صفری فروشانی
         """
-        self.weights = weights
-        self.conf_threshold = conf_threshold
-        self.yolov5_path = None
-        self.original_dir = os.getcwd()
+        if self.precision != 'int8':
+            raise ValueError("compare_precision فقط برای precision='int8' معنا دارد")
         
-        print("╔" + "═" * 78 + "╗")
-        print("║" + " " * 20 + "YOLOv5 Object Detector" + " " * 35 + "║")
-        print("║" + " " * 78 + "║")
-        print("║" + "  نویسنده: رضا صفری فروشانی".ljust(77) + " ║")
-        print("║" + "  ایمیل: safarireza@gmail.com".ljust(77) + " ║")
-        print("║" + "  گیتهاب: https://github.com/reza123reza".ljust(77) + " ║")
-        print("╚" + "═" * 78 + "╝")
+        import cv2
+        import numpy as np
+        import torch
         
-    def setup_environment(self) -> bool:
-        """
-        نصب و راه‌اندازی محیط YOLOv5
+        self._load_model()
+        from utils.general import xywhn2xyxy
+        from val import process_batch
         
-        این متد تمام پکیج‌های لازم را نصب کرده و YOLOv5 را دانلود می‌کند.
+        paths = self._expand_image_sources(images)
+        decoded = [(path, cv2.imread(path)) for path in paths]
+        decoded = [(path, image) for path, image in decoded if image is not None]
+        if not decoded:
+            raise ImageReadError(f"هیچ تصویر اعتبارسنجی قابل خواندنی پیدا نشد: {images}")
+        frames = [image for _, image in decoded]
         
-        Returns:
-            bool: True در صورت موفقیت، False در صورت خطا
-            
-        توسعه‌دهنده: رضا صفری فروشانی (safarireza@gmail.com)
-        """
-        try:
-            print("\n" + "═" * 80)
-            print("شروع راه‌اندازی محیط YOLOv5")
-            print("توسعه‌دهنده: رضا صفری فروشانی")
-            print("═" * 80)
-            
-            # مرحله 1: آپگرید pip
-            print("\n[1/5] در حال آپگرید pip...")
-            result = subprocess.run(
-                [sys.executable, "-m", "pip", "install", "--upgrade", "pip", "--quiet"],
-                capture_output=True,
-                text=True
-            )
-            if result.returncode == 0:
-                print("      ✓ pip با موفقیت آپگرید شد")
-            else:
-                print("      ⚠ خطا در آپگرید pip (ادامه می‌دهیم...)")
-            
-            # مرحله 2: نصب TensorFlow
-            print("\n[2/5] در حال نصب TensorFlow...")
-            result = subprocess.run(
-                [sys.executable, "-m", "pip", "install", "tensorflow", "--quiet"],
-                capture_output=True,
-                text=True
-            )
-            if result.returncode == 0:
-                print("      ✓ TensorFlow نصب شد")
-            else:
-                print("      ⚠ خطا در نصب TensorFlow")
-            
-            # مرحله 3: نصب TensorBoard
-            print("\n[3/5] در حال نصب TensorBoard...")
-            result = subprocess.run(
-                [sys.executable, "-m", "pip", "install", "tensorboard", "--quiet"],
-                capture_output=True,
-                text=True
-            )
-            if result.returncode == 0:
-                print("      ✓ TensorBoard نصب شد")
-            
-            # مرحله 4: نصب PyTorch
-            print("\n[4/5] در حال نصب PyTorch...")
-            result = subprocess.run(
-                [sys.executable, "-m", "pip", "install", "torch", "--quiet"],
-                capture_output=True,
-                text=True
-            )
-            if result.returncode == 0:
-                print("      ✓ PyTorch نصب شد")
-            else:
-                print("      ⚠ خطا در نصب PyTorch")
+        reference = YOLOv5Detector(
+            weights=self.weights, conf_threshold=self.conf_threshold, engine='inprocess',
+            img_size=self.img_size, iou_threshold=self.iou_threshold, device=self.device,
+            backend='onnx', raise_errors=True,
+        )
+        reference.yolov5_path = self.yolov5_path
+        
+        def run(detector):
+            detector._run_model(frames[:1])  # گرم‌کردن
+            start = time.perf_counter()
+            results = []
+            for index in range(0, len(frames), batch_size):
+                results.extend(detector._run_model(frames[index:index + batch_size]))
+            return results, (time.perf_counter() - start) * 1000 / len(frames)
+        
+        fp32, fp32_ms = run(reference)
+        int8, int8_ms = run(self)
+        
+        # توافق با FP32: کادرهای FP32 نقش برچسب واقعی را دارند
+        as_targets = [np.concatenate([det[:, 5:6], det[:, :4]], 1) for det in fp32]
+        matched = 0
+        for det, target in zip(int8, as_targets):
+            if len(det) and len(target):
+                matched += int(process_batch(torch.as_tensor(det), torch.as_tensor(target),
+                                             torch.tensor([0.5]))[:, 0].sum())
+        count_fp32, count_int8 = sum(len(det) for det in fp32), sum(len(det) for det in int8)
+        precision = matched / count_int8 if count_int8 else 1.0
+        recall = matched / count_fp32 if count_fp32 else 1.0
+        
+        result = {
+            'images': len(frames),
+            'calibration': 'static' if self.calibration is not None else 'dynamic',
+            'detections_fp32': count_fp32,
+            'detections_int8': count_int8,
+            'agreement': {
+                'precision': round(precision, 4),
+                'recall': round(recall, 4),
+                'f1': round(2 * precision * recall / (precision + recall), 4) if precision + recall else 0.0,
+            },
+            'map50_vs_fp32': round(_map_scores(int8, as_targets)[0], 4),
+            'ms_per_image_fp32': round(fp32_ms, 2),
+            'ms_per_image_int8': round(int8_ms, 2),
+            'model_mb_fp32': round(reference.export('onnx').stat().st_size / 2**20, 2),
+            'model_mb_int8': round(self.quantize().stat().st_size / 2**20, 2),
+        }
+        
+        if labels is not None:
+            targets = []
+            for path, image in decoded:
+                label_file = Path(labels) / f"{Path(path).stem}.txt"
+                rows = np.zeros((0, 5), dtype=np.float32)
+                if label_file.exists():
+                    rows = np.loadtxt(label_file, dtype=np.float32, ndmin=2).reshape(-1, 5)
+                    h, w = image.shape[:2]
+                    rows[:, 1:] = xywhn2xyxy(rows[:, 1:], w, h)
+                targets.append(rows)
             
-            # مرحله 5: دانلود YOLOv5
-            print("\n[5/5] در حال دانلود YOLOv5...")
-            if os.path.exists('yolov5'):
-                print("      ℹ پوشه yolov5 از قبل وجود دارد")
-                user_input = input("      آیا می‌خواهید دوباره دانلود شود؟ (y/n): ")
-                if user_input.lower() == 'y':
-                    shutil.rmtree('yolov5')
-                    subprocess.run(
-                        ['git', 'clone', 'https://github.com/ultralytics/yolov5'],
-                        capture_output=True
-                    )
-                    print("      ✓ YOLOv5 دانلود شد")
-            else:
-                result = subprocess.run(
-                    ['git', 'clone', 'https://github.com/ultralytics/yolov5'],
-                    capture_output=True,
-                    text=True
+            for name, predictions in (('fp32', fp32), ('int8', int8)):
+                result[f'map50_{name}'], result[f'map_{name}'] = (
+                    round(score, 4) for score in _map_scores(predictions, targets)
                 )
-                if result.returncode == 0:
-                    print("      ✓ YOLOv5 دانلود شد")
-                else:
-                    print("      ✗ خطا در دانلود YOLOv5")
-                    return False
-            
-            # تنظیم مسیر YOLOv5
-            self.yolov5_path = Path(os.path.abspath('yolov5'))
-            os.chdir(self.yolov5_path)
-            
-            # نصب requirements
-            print("\n      در حال نصب requirements...")
-            subprocess.run(
-                [sys.executable, "-m", "pip", "install", "-r", "requirements.txt", "--quiet"],
-                capture_output=True
-            )
-            print("      ✓ Requirements نصب شد")
-            
-            # بازگشت به مسیر اصلی
-            os.chdir(self.original_dir)
-            
-            print("\n" + "═" * 80)
-            print("✓ راه‌اندازی با موفقیت کامل شد!")
-            print(f"✓ مسیر YOLOv5: {self.yolov5_path}")
-            print("═" * 80)
-            
-            return True
-            
-        except Exception as e:
-            print(f"\n✗ خطا در راه‌اندازی: {str(e)}")
-            os.chdir(self.original_dir)
-            return False
+            result['map50_delta'] = round(result['map50_int8'] - result['map50_fp32'], 4)
+            result['map_delta'] = round(result['map_int8'] - result['map_fp32'], 4)
+        
+        logger.info(f"📊 INT8 در برابر FP32 ({len(frames)} تصویر): توافق F1={result['agreement']['f1']:.3f}، "
+                    f"mAP@0.5 نسبت به FP32={result['map50_vs_fp32']:.3f}")
+        if labels is not None:
+            logger.info(f"   mAP@0.5: FP32={result['map50_fp32']:.3f}، INT8={result['map50_int8']:.3f} "
+                        f"(اختلاف {result['map50_delta']:+.3f})")
+        logger.info(f"⏱️  زمان هر تصویر: FP32={fp32_ms:.1f} ms، INT8={int8_ms:.1f} ms  "
+                    f"حجم مدل: {result['model_mb_fp32']:.1f} → {result['model_mb_int8']:.1f} MB")
+        return result
     
-    def detect_image(self, 
-                    image_path: str, 
-                    classes: Optional[List[int]] = None,
-                    save_dir: str = 'runs/detect',
-                    show_result: bool = True) -> Optional[str]:
+    def check_parity(self,
+                     images=None,
+                     num_images: int = 4,
+                     rtol: float = 1e-3,
+                     atol: float = 1e-3) -> dict:
         """
-        تشخیص اشیاء در یک تصویر
+        مقایسه عددی خروجی backend فعلی با اجرای eager مدل PyTorch
         
-        این متد از مدل YOLOv5 برای تشخیص اشیاء در تصویر ورودی استفاده می‌کند.
+        خروجی خام شبکه (پیش از NMS) و تشخیص‌های نهایی هر دو مسیر روی
+        یک تنسور ورودی یکسان مقایسه می‌شوند.
         
         Args:
-            image_path: مسیر تصویر ورودی
-            classes: لیست شماره کلاس‌های مورد نظر (None = همه کلاس‌ها)
-                    مثال: [0, 2] برای person و car
-            save_dir: مسیر ذخیره نتایج
-            show_result: نمایش نتیجه (در محیط نوتبوک)
+            images: مسیر تصاویر، پوشه یا الگوی glob (None = تصاویر مصنوعی)
+            num_images: تعداد تصاویر مصنوعی
+            rtol: خطای نسبی مجاز
+            atol: خطای مطلق مجاز
         
         Returns:
-            str: مسیر تصویر خروجی یا None در صورت خطا
+            dict: بیشینه و میانگین اختلاف مطلق، تعداد تشخیص‌ها در هر مسیر،
+                  تعداد تشخیص‌های منطبق (IoU ≥ 0.9 و کلاس یکسان) و نتیجه (passed)
         
-        کد نوشته شده توسط: رضا صفری فروشانی
-        GitHub: https://github.com/reza123reza
+        نوشته شده توسط: رضا صفری فروشانی
         """
-        if self.yolov5_path is None:
-            print("✗ لطفاً ابتدا setup_environment() را اجرا کنید")
-            return None
+        import cv2
+        import numpy as np
+        import torch
         
-        if not os.path.exists(image_path):
-            print(f"✗ تصویر پیدا نشد: {image_path}")
-            return None
+        model = self._load_model()
+        from models.common import DetectMultiBackend
+        from utils.metrics import box_iou
         
-        print(f"\n{'═'*80}")
-        print(f"تشخیص اشیاء در تصویر")
-        print(f"نویسنده: رضا صفری فروشانی (safarireza@gmail.com)")
-        print(f"{'═'*80}")
-        print(f"📷 تصویر ورودی: {image_path}")
-        print(f"⚙️  وزن مدل: {self.weights}")
-        print(f"📊 آستانه اطمینان: {self.conf_threshold}")
+        if images is None:
+            decoded = [cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+                       for data in _synthetic_images(num_images)]
+        else:
+            decoded = [cv2.imread(path) for path in self._expand_image_sources(images)]
+            decoded = [image for image in decoded if image is not None]
+        if not decoded:
+            raise ImageReadError("هیچ تصویری برای مقایسه پیدا نشد")
         
-        try:
-            os.chdir(self.yolov5_path)
-            
-            # ساخت دستور
-            cmd = [
-                sys.executable, "detect.py",
-                "--weights", self.weights,
-                "--conf-thres", str(self.conf_threshold),
-                "--source", os.path.abspath(image_path)
-            ]
-            
-            if classes is not None:
-                cmd.extend(["--classes"] + [str(c) for c in classes])
-                print(f"🎯 کلاس‌های فیلتر شده: {classes}")
-            
-            print(f"\n⏳ در حال پردازش...")
-            
-            # اجرای تشخیص
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                print("✓ تشخیص با موفقیت انجام شد!")
-                
-                # پیدا کردن آخرین فولدر exp
-                detect_path = self.yolov5_path / "runs" / "detect"
-                exp_folders = sorted([d for d in detect_path.iterdir() if d.is_dir()])
-                if exp_folders:
-                    latest_exp = exp_folders[-1]
-                    output_file = latest_exp / Path(image_path).name
-                    
-                    if output_file.exists():
-                        print(f"💾 نتیجه ذخیره شد: {output_file}")
-                        
-                        # نمایش نتیجه
-                        if show_result:
-                            try:
-                                from IPython.display import Image, display
-                                print("\n📸 نمایش نتیجه:")
-                                display(Image(filename=str(output_file)))
-                            except ImportError:
-                                print("ℹ️  برای نمایش تصویر در محیط نوتبوک قرار دهید")
-                        
-                        os.chdir(self.original_dir)
-                        return str(output_file)
-            else:
-                print(f"✗ خطا: {result.stderr}")
-                
-        except Exception as e:
-            print(f"✗ خطا در تشخیص: {str(e)}")
-        finally:
-            os.chdir(self.original_dir)
+        reference = model if self.backend == 'torch' else DetectMultiBackend(
+            self._resolve_weights(self.weights), device=model.device
+        ).eval()
         
-        return None
+        tensor = self._preprocess(decoded)
+        with torch.inference_mode():
+            outputs = [network(tensor) for network in (reference, model)]
+        expected, actual = [(out[0] if isinstance(out, (list, tuple)) else out).float().cpu()
+                            for out in outputs]
+        
+        difference = (actual - expected).abs()
+        passed = bool((difference <= atol + rtol * expected.abs()).all())
+        
+        eager_det, backend_det = [
+            _fused_postprocess(out, self.conf_threshold, self.iou_threshold, None)
+            for out in (expected, actual)
+        ]
+        matched = 0
+        for a, b in zip(eager_det, backend_det):
+            if len(a) and len(b):
+                iou = box_iou(a[:, :4], b[:, :4]) * (a[:, 5:6] == b[:, 5].unsqueeze(0))
+                matched += int((iou.max(1).values >= 0.9).sum())
+        
+        result = {
+            'backend': self.backend,
+            'images': len(decoded),
+            'max_abs_diff': float(difference.max()),
+            'mean_abs_diff': float(difference.mean()),
+            'detections_eager': sum(len(det) for det in eager_det),
+            'detections_backend': sum(len(det) for det in backend_det),
+            'matched': matched,
+            'passed': passed,
+        }
+        logger.info(f"{'✓' if passed else '⚠'} مقایسه {self.backend} با eager: "
+                    f"بیشینه اختلاف {result['max_abs_diff']:.2e}، "
+                    f"تشخیص‌ها {result['detections_backend']}/{result['detections_eager']} "
+                    f"(منطبق: {matched})")
+        return result
     
-    def detect_video(self, 
-                    video_path: str, 
-                    classes: Optional[List[int]] = None,
-                    save_dir: str = 'runs/detect') -> Optional[str]:
+    def _run_model(self, images: list, classes: Optional[List[int]] = None,
+                   weights: Optional[str] = None) -> list:
         """
-        تشخیص اشیاء در یک ویدیو
+        اجرای مدل مقیم روی لیستی از تصاویر BGR
         
         Args:
-            video_path: مسیر ویدیو ورودی
-            classes: لیست شماره کلاس‌های مورد نظر
-            save_dir: مسیر ذخیره نتایج
+            images: لیست تصاویر (numpy array با ترتیب کانال BGR)
+            classes: لیست شماره کلاس‌های مورد نظر (None = همه کلاس‌ها)
+            weights: وزن‌های مدل (None = self.weights)
         
         Returns:
-            str: مسیر ویدیوی خروجی یا None در صورت خطا
-            
-        نوشته شده توسط: رضا صفری فروشانی
-        Email: safarireza@gmail.com
+            list: برای هر تصویر یک آرایه (N×6) شامل x1, y1, x2, y2, conf, cls
+                  در مختصات تصویر اصلی
         """
-        if self.yolov5_path is None:
-            print("✗ لطفاً ابتدا setup_environment() را اجرا کنید")
-            return None
+        if self._cascade_active(weights):
+            results = self._run_cascade(images, classes)
+        else:
+            results = self._forward(images, classes, weights)
         
-        if not os.path.exists(video_path):
-            print(f"✗ ویدیو پیدا نشد: {video_path}")
+        self._record_detections(results)
+        return results
+    
+    def _forward(self, images: list, classes: Optional[List[int]] = None,
+                 weights: Optional[str] = None, conf_threshold: Optional[float] = None) -> list:
+        """
+        یک عبور کامل (پیش‌پردازش، استنتاج، NMS) از یک مدل
+        """
+        model = self._load_model(weights)
+        with self._stage('preprocess'):
+            tensor = self._preprocess(images, model)
+        with self._stage('inference'):
+            pred = self._infer(tensor, model)
+        with self._stage('nms'):
+            return self._postprocess(pred, tensor.shape[2:], images, classes, conf_threshold)
+    
+    def _cascade_active(self, weights: Optional[str]) -> bool:
+        """
+        آیا فراخوانی با این وزن‌ها از حالت آبشاری استفاده می‌کند (فقط مدل پیش‌فرض)
+        """
+        return self.cascade_weights is not None and weights in (None, self.weights)
+    
+    def _run_cascade(self, images: list, classes: Optional[List[int]]) -> list:
+        """
+        اجرای آبشاری: مدل کوچک روی همه تصاویر، مدل بزرگ فقط روی تصاویر نامطمئن
+        
+        مدل کوچک با حد پایین cascade_band اجرا می‌شود. تصویری که تشخیصی در
+        بازه نامطمئن (یا با cascade_empty هیچ تشخیصی) داشته باشد دوباره با
+        cascade_weights اجرا می‌شود و نتیجه آن با تشخیص‌های مطمئن مدل کوچک
+        (NMS کلاسی) ادغام می‌شود. بقیه تصاویر فقط تشخیص‌های بالای
+        conf_threshold مدل کوچک را نگه می‌دارند.
+        """
+        import numpy as np
+        import torch
+        
+        low, high = self.cascade_band
+        self._load_model(self.weights)  # زمان بارگذاری در آمار آبشار شمرده نمی‌شود
+        start = time.perf_counter()
+        small = self._forward(images, classes, self.weights, conf_threshold=low)
+        small_seconds = time.perf_counter() - start
+        
+        results, escalate, empty = [], [], 0
+        for i, det in enumerate(small):
+            uncertain = bool(((det[:, 4] >= low) & (det[:, 4] < high)).any())
+            if not len(det) and self.cascade_empty:
+                empty += 1
+                uncertain = True
+            if uncertain:
+                escalate.append(i)
+            results.append(det[det[:, 4] >= self.conf_threshold])
+        
+        large_seconds = 0.0
+        if escalate:
+            self._load_model(self.cascade_weights)
+            start = time.perf_counter()
+            large = self._forward([images[i] for i in escalate], classes, self.cascade_weights)
+            large_seconds = time.perf_counter() - start
+            for i, det in zip(escalate, large):
+                combined = np.concatenate([det, small[i][small[i][:, 4] >= high]])
+                tensor = torch.from_numpy(combined)
+                keep = _nms_grouped(tensor[:, :4], tensor[:, 4], tensor[:, 5], self.iou_threshold)
+                results[i] = combined[keep.numpy()]
+        
+        with self._cascade_lock:
+            stats = self._cascade_stats
+            stats['images'] += len(images)
+            stats['escalated'] += len(escalate)
+            stats['empty'] += empty
+            stats['small_seconds'] += small_seconds
+            stats['large_seconds'] += large_seconds
+        self.metrics.inc('yolov5_cascade_images_total', len(images) - len(escalate), {'result': 'accepted'})
+        self.metrics.inc('yolov5_cascade_images_total', len(escalate), {'result': 'escalated'})
+        return results
+    
+    def cascade_info(self) -> Optional[dict]:
+        """
+        آمار حالت آبشاری (None اگر غیرفعال باشد)
+        
+        Returns:
+            dict: images, escalated, escalation_rate, empty (ارجاع به دلیل نبود تشخیص)،
+                  small_ms_per_image و large_ms_per_escalated
+        """
+        if self.cascade_weights is None:
             return None
+        with self._cascade_lock:
+            stats = dict(self._cascade_stats)
+        images, escalated = stats.pop('images'), stats.pop('escalated')
+        return {
+            'weights': self.weights,
+            'cascade_weights': self.cascade_weights,
+            'band': list(self.cascade_band),
+            'images': images,
+            'escalated': escalated,
+            'escalation_rate': round(escalated / images, 4) if images else 0.0,
+            'empty': stats['empty'],
+            'small_ms_per_image': round(stats['small_seconds'] * 1000 / images, 3) if images else 0.0,
+            'large_ms_per_escalated': round(stats['large_seconds'] * 1000 / escalated, 3) if escalated else 0.0,
+        }
+    
+    def _record_detections(self, results: list):
+        """
+        ثبت تعداد تصاویر، اندازه دسته و تشخیص‌ها به تفکیک کلاس در metrics
+        """
+        if type(self.metrics) is MetricsSink:
+            return
         
-        print(f"\n{'═'*80}")
-        print(f"تشخیص اشیاء در ویدیو")
-        print(f"نویسنده: رضا صفری فروشانی")
-        print(f"{'═'*80}")
-        print(f"🎬 ویدیو ورودی: {video_path}")
-        print(f"⚙️  وزن مدل: {self.weights}")
-        print(f"📊 آستانه اطمینان: {self.conf_threshold}")
+        import numpy as np
         
-        try:
-            os.chdir(self.yolov5_path)
-            
-            # ساخت دستور
-            cmd = [
-                sys.executable, "detect.py",
-                "--weights", self.weights,
-                "--conf-thres", str(self.conf_threshold),
-                "--source", os.path.abspath(video_path)
-            ]
-            
-            if classes is not None:
-                cmd.extend(["--classes"] + [str(c) for c in classes])
-                print(f"🎯 کلاس‌های فیلتر شده: {classes}")
-            
-            print(f"\n⏳ در حال پردازش ویدیو (ممکن است زمان‌بر باشد)...")
-            
-            # اجرای تشخیص
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                print("✓ پردازش ویدیو با موفقیت انجام شد!")
-                
-                # پیدا کردن ویدیوی خروجی
-                detect_path = self.yolov5_path / "runs" / "detect"
-                exp_folders = sorted([d for d in detect_path.iterdir() if d.is_dir()])
-                if exp_folders:
-                    latest_exp = exp_folders[-1]
-                    video_name = Path(video_path).stem
-                    output_file = list(latest_exp.glob(f"{video_name}.*"))
-                    
-                    if output_file:
-                        print(f"💾 ویدیو ذخیره شد: {output_file[0]}")
-                        os.chdir(self.original_dir)
-                        return str(output_file[0])
-            else:
-                print(f"✗ خطا: {result.stderr}")
-                
-        except Exception as e:
-            print(f"✗ خطا در پردازش ویدیو: {str(e)}")
-        finally:
-            os.chdir(self.original_dir)
+        self.metrics.inc('yolov5_images_processed_total', len(results))
+        self.metrics.observe('yolov5_batch_size', len(results))
         
-        return None
+        class_ids = np.concatenate([det[:, 5] for det in results]) if results else []
+        if len(class_ids):
+            names = self.get_coco_classes()
+            for class_id, count in zip(*np.unique(class_ids.astype(np.int64), return_counts=True)):
+                self.metrics.inc('yolov5_detections_total', int(count),
+                                 {'class': names.get(int(class_id), str(class_id))})
     
-    def detect_webcam(self, 
+    def _preprocess(self, images: list, model=None):
+        """
+        letterbox، تبدیل BGR→RGB و نرمال‌سازی دسته تصاویر به یک تنسور
+        """
+        if model is None:
+            model = self._load_model()
+        
+        import numpy as np
+        import torch
+        from utils.augmentations import letterbox
+        
+        stride = int(model.stride)
+        
+        # letterbox با اندازه ثابت تا تمام تصاویر در یک تنسور قرار گیرند
+        batch = np.stack([
+            letterbox(im, self.img_size, stride=stride, auto=False)[0]
+            for im in images
+        ])
+        batch = np.ascontiguousarray(batch[..., ::-1].transpose(0, 3, 1, 2))  # BGR→RGB, BHWC→BCHW
+        return torch.from_numpy(batch).to(model.device).float() / 255
+    
+    def _infer(self, tensor, model=None):
+        """
+        اجرای شبکه روی تنسور ورودی
+        """
+        import torch
+        
+        if model is None:
+            model = self._load_model()
+        with torch.inference_mode():
+            pred = model(tensor)
+        _cuda_sync(self.device)  # زمان‌سنجی دقیق مرحله inference روی GPU
+        return pred
+    
+    def _postprocess(self, pred, input_shape: tuple, images: list,
                      classes: Optional[List[int]] = None,
-                     camera_index: int = 0):
+                     conf_threshold: Optional[float] = None) -> list:
         """
-        تشخیص اشیاء زنده از وبکم
+        NMS و بازگرداندن کادرها به مختصات تصاویر اصلی
+        """
+        from utils.general import scale_boxes
         
-        این متد تشخیص اشیاء را به صورت لحظه‌ای از دوربین وب انجام می‌دهد.
-        برای خروج کلید 'q' را فشار دهید.
+        if conf_threshold is None:
+            conf_threshold = self.conf_threshold
+        pred = _fused_postprocess(pred, conf_threshold, self.iou_threshold, classes)
+        
+        results = []
+        for det, im0 in zip(pred, images):
+            if len(det):
+                det[:, :4] = scale_boxes(input_shape, det[:, :4], im0.shape).round()
+            results.append(det.cpu().numpy())
+        
+        return results
+    
+    def _detect_batch(self,
+                      sources: list,
+                      classes: Optional[List[int]],
+                      keep_images: bool = False,
+                      weights: Optional[str] = None) -> list:
+        """
+        خواندن و تشخیص یک دسته از تصاویر با یک فراخوانی مدل (با استفاده از کش نتایج)
         
         Args:
+            sources: مسیر تصاویر، بایت‌های فایل تصویر یا آرایه‌های BGR
             classes: لیست شماره کلاس‌های مورد نظر
-            camera_index: شماره دوربین (معمولاً 0)
+            keep_images: بازگرداندن تصویر رمزگشایی‌شده (برای رسم) حتی در صورت برخورد کش
+            weights: وزن‌های مدل (None = self.weights)
         
-        توسعه یافته توسط: رضا صفری فروشانی
-        https://github.com/reza123reza
+        Returns:
+            list: برای هر ورودی (آرایه N×6، ابعاد تصویر، تصویر یا None)
+                  یا None اگر تصویر خوانده نشد
         """
-        if self.yolov5_path is None:
-            print("✗ لطفاً ابتدا setup_environment() را اجرا کنید")
-            return
+        import cv2
+        import numpy as np
         
-        print(f"\n{'═'*80}")
-        print(f"تشخیص اشیاء زنده از وبکم")
-        print(f"نویسنده: رضا صفری فروشانی")
-        print(f"{'═'*80}")
-        print(f"📹 دوربین: {camera_index}")
-        print(f"⚙️  وزن مدل: {self.weights}")
-        print(f"📊 آستانه اطمینان: {self.conf_threshold}")
-        print(f"\nℹ️  برای خروج کلید 'q' را فشار دهید")
+        with self._timed_call():
+            results = [None] * len(sources)
+            pending = []
+            config = self._cache_config(classes, weights) if self._cache is not None else None
+            
+            for i, source in enumerate(sources):
+                image = source if isinstance(source, np.ndarray) else None
+                data = bytes(source) if isinstance(source, (bytes, bytearray, memoryview)) else None
+                
+                key = cached = None
+                if self._cache is not None:
+                    if image is None and data is None:
+                        try:
+                            data = Path(source).read_bytes()
+                        except OSError:
+                            logger.warning(f"⚠ خواندن تصویر ممکن نیست: {source}")
+                            self.metrics.inc('yolov5_errors_total', labels={'reason': 'decode'})
+                            continue
+                    
+                    key_data = data if data is not None else image.tobytes() + repr(image.shape).encode()
+                    key = _ResultCache.make_key(key_data, config)
+                    cached = self._cache.get(key)
+                    self.metrics.inc('yolov5_cache_requests_total',
+                                     labels={'result': 'miss' if cached is None else 'hit'})
+                
+                if image is None and (cached is None or keep_images):
+                    with self._stage('decode'):
+                        if data is not None:
+                            image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+                        else:
+                            image = cv2.imread(str(source))
+                
+                if cached is not None:
+                    results[i] = (cached[0], cached[1], image)
+                    continue
+                
+                if image is None:
+                    logger.warning(f"⚠ خواندن تصویر ممکن نیست: {source if data is None else '<bytes>'}")
+                    self.metrics.inc('yolov5_errors_total', labels={'reason': 'decode'})
+                    continue
+                pending.append((i, image, key))
+            
+            if pending:
+                detections = self._run_model([image for _, image, _ in pending], classes, weights)
+                for (i, image, key), det in zip(pending, detections):
+                    if key is not None:
+                        self._cache.put(key, det, image.shape)
+                    results[i] = (det, image.shape[:2], image if keep_images else None)
+            
+            return results
+    
+    def _cache_config(self, classes: Optional[List[int]], weights: Optional[str] = None) -> str:
+        """
+        بخش تنظیمات کلید کش (هر تنظیمی که خروجی مدل را تغییر دهد)
+        """
+        config = [
+            weights or self.weights, self.backend, self.precision, self.conf_threshold, self.iou_threshold, self.img_size,
+            sorted(classes) if classes is not None else None,
+        ]
+        if self._cascade_active(weights):
+            config.append([self.cascade_weights, *self.cascade_band, self.cascade_empty])
+        return json.dumps(config)
+    
+    def cache_info(self) -> Optional[dict]:
+        """
+        آمار کش نتایج (None اگر کش فعال نباشد)
         
-        try:
-            os.chdir(self.yolov5_path)
+        Returns:
+            dict: hits, misses, hit_rate, memory_entries, disk_bytes
+        """
+        return self._cache.info() if self._cache is not None else None
+    
+    def _draw_detections(self, image, det):
+        """
+        رسم کادرها و برچسب‌ها روی یک کپی از تصویر
+        
+        Args:
+            image: تصویر BGR
+            det: آرایه (N×6) خروجی _run_model
+        
+        Returns:
+            numpy.ndarray: تصویر حاشیه‌نویسی شده
+        """
+        import cv2
+        
+        with self._stage('render'):
+            names = self.get_coco_classes()
+            annotated = image.copy()
+            line_width = max(round(sum(image.shape[:2]) / 2 * 0.003), 2)
             
-            # ساخت دستور
-            cmd = [
-                sys.executable, "detect.py",
-                "--weights", self.weights,
-                "--conf-thres", str(self.conf_threshold),
-                "--source", str(camera_index)
-            ]
+            for x1, y1, x2, y2, conf, cls in det:
+                cls = int(cls)
+                color = self._PALETTE[cls % len(self._PALETTE)]
+                p1, p2 = (int(x1), int(y1)), (int(x2), int(y2))
+                cv2.rectangle(annotated, p1, p2, color, line_width, lineType=cv2.LINE_AA)
+                
+                label = f"{names.get(cls, cls)} {conf:.2f}"
+                font_scale = line_width / 3
+                thickness = max(line_width - 1, 1)
+                w, h = cv2.getTextSize(label, 0, fontScale=font_scale, thickness=thickness)[0]
+                outside = p1[1] - h >= 3
+                p3 = (p1[0] + w, p1[1] - h - 3 if outside else p1[1] + h + 3)
+                cv2.rectangle(annotated, p1, p3, color, -1, cv2.LINE_AA)
+                cv2.putText(annotated, label, (p1[0], p1[1] - 2 if outside else p1[1] + h + 2),
+                            0, font_scale, (255, 255, 255), thickness=thickness, lineType=cv2.LINE_AA)
+            
+            return annotated
+    
+    def _detect_image_inprocess(self,
+                                image_path: str,
+                                classes: Optional[List[int]],
+                                show_result: bool,
+                                save: bool = True,
+                                return_detections: bool = False,
+                                save_dir: str = 'runs/detect',
+                                weights: Optional[str] = None) -> Union[str, Detections, None]:
+        """
+        تشخیص اشیاء در تصویر با مدل مقیم در حافظه (موتور inprocess)
+        
+        نتیجه در یک پوشه یکتای جدید داخل save_dir ذخیره می‌شود.
+        
+        نوشته شده توسط: رضا صفری فروشانی
+        """
+        try:
+            import cv2
             
             if classes is not None:
-                cmd.extend(["--classes"] + [str(c) for c in classes])
-                print(f"🎯 کلاس‌های فیلتر شده: {classes}")
+                logger.info(f"🎯 کلاس‌های فیلتر شده: {classes}")
+            logger.info(f"\n⏳ در حال پردازش (in-process)...")
             
-            print(f"\n⏳ در حال راه‌اندازی دوربین...")
+            item = self._detect_batch([str(image_path)], classes, keep_images=save, weights=weights)[0]
+            if item is None:
+                raise ImageReadError(f"خواندن تصویر ممکن نیست: {image_path}")
             
-            # اجرای تشخیص
-            subprocess.run(cmd)
+            det, shape, image = item
+            logger.info(f"✓ تشخیص با موفقیت انجام شد! ({len(det)} شیء)")
+            
+            output_file = None
+            if save:
+                output_file = self._new_output_dir(save_dir) / Path(image_path).name
+                annotated = self._draw_detections(image, det)
+                with self._stage('save'):
+                    cv2.imwrite(str(output_file), annotated)
+                logger.info(f"💾 نتیجه ذخیره شد: {output_file}")
+                
+                if show_result:
+                    self._display_result(output_file)
+            
+            if return_detections or self.log_detections:
+                detections = Detections.from_array(
+                    det, self.get_coco_classes(), str(image_path), shape
+                )
+                detections.output_path = str(output_file) if output_file else None
+                self._log_detections(detections, weights=weights or self.weights)
+                if return_detections:
+                    return detections
+            
+            return str(output_file) if output_file else None
             
-            print("\n✓ تشخیص متوقف شد")
-                
-        except KeyboardInterrupt:
-            print("\n\nℹ️  تشخیص توسط کاربر متوقف شد")
         except Exception as e:
-            print(f"✗ خطا: {str(e)}")
-        finally:
-            os.chdir(self.original_dir)
+            self.metrics.inc('yolov5_errors_total', labels={'reason': 'detect'})
+            self._fail(e if isinstance(e, YOLOv5Error) else DetectionError(f"خطا در تشخیص: {e}"), e)
+        
+        return None
     
-    def get_coco_classes(self) -> dict:
+    @staticmethod
+    def get_coco_classes() -> dict:
         """
         دریافت لیست کلاس‌های COCO
         
@@ -487,7 +4205,1082 @@ class YOLOv5Detector:
         print(f"{'═'*80}\n")
 
 
-def main():
+# تشخیص‌دهنده مقیم هر پروسه کارگر DetectorPool (در _pool_worker_init ساخته می‌شود)
+_POOL_DETECTOR: Optional[YOLOv5Detector] = None
+
+
+def _pool_worker_init(detector_kwargs: dict, yolov5_path: str, num_threads: int, pids=None):
+    """
+    راه‌اندازی یک پروسه کارگر: تنظیم بودجه نخ‌های torch و بارگذاری مدل
+    
+    شماره پروسه پس از بارگذاری مدل در صف pids گزارش می‌شود (برای memory_usage).
+    """
+    global _POOL_DETECTOR
+    
+    import torch
+    torch.set_num_threads(num_threads)
+    
+    detector = YOLOv5Detector(engine='inprocess', raise_errors=True, **detector_kwargs)
+    detector.yolov5_path = Path(yolov5_path)
+    detector._load_model()
+    _POOL_DETECTOR = detector
+    if pids is not None:
+        pids.put(os.getpid())
+
+
+def _pool_worker_detect(paths: List[str], classes: Optional[List[int]]) -> List[Optional[Detections]]:
+    """
+    پردازش یک دسته از تصاویر در پروسه کارگر با یک فراخوانی مدل
+    """
+    detector = _POOL_DETECTOR
+    names = detector.get_coco_classes()
+    
+    results: List[Optional[Detections]] = []
+    for path, item in zip(paths, detector._detect_batch(paths, classes)):
+        if item is None:
+            results.append(None)
+        else:
+            det, shape, _ = item
+            results.append(Detections.from_array(det, names, path, shape))
+    
+    return results
+
+
+def _pool_worker_arrays(images: list, classes: Optional[List[int]]) -> list:
+    """
+    اجرای مدل کارگر روی لیستی از آرایه‌های BGR (مثلاً کاشی‌های detect_tiled)
+    """
+    return _POOL_DETECTOR._run_model(images, classes)
+
+
+class DetectorPool:
+    """
+    مجموعه‌ای از پروسه‌های کارگر برای استنتاج موازی روی CPU
+    
+    هر کارگر یک نسخه مقیم از مدل با بودجه ثابت نخ‌های torch نگه می‌دارد.
+    روی پردازنده‌های پرهسته، چند پروسه با تعداد نخ کم معمولاً بسیار
+    بهتر از یک پروسه با تمام نخ‌ها مقیاس‌پذیر است. با share_weights=True
+    همه کارگرها یک فایل وزن را با mmap نگاشت می‌کنند و وزن‌ها فقط یک بار
+    در حافظه میزبان قرار می‌گیرند.
+    
+    مثال:
+        with DetectorPool('yolov5s.pt', num_workers=8, threads_per_worker=4) as pool:
+            results = pool.detect_images("frames/", batch_size=8)
+            print(pool.memory_usage())
+    
+    نوشته شده توسط: رضا صفری فروشانی
+    """
+    
+    def __init__(self,
+                 weights: str = 'yolov5m.pt',
+                 conf_threshold: float = 0.7,
+                 num_workers: Optional[int] = None,
+                 threads_per_worker: Optional[int] = None,
+                 yolov5_path: Union[str, Path] = 'yolov5',
+                 img_size: int = 640,
+                 iou_threshold: float = 0.45,
+                 backend: str = 'torch',
+                 share_weights: bool = False):
+        """
+        Args:
+            weights: نام یا مسیر فایل وزن‌های مدل
+            conf_threshold: آستانه اطمینان (بین 0 تا 1)
+            num_workers: تعداد پروسه‌های کارگر (None = یک کارگر برای هر ۴ هسته)
+            threads_per_worker: تعداد نخ‌های torch در هر کارگر
+                    (None = تقسیم مساوی هسته‌ها بین کارگرها)
+            yolov5_path: مسیر پوشه YOLOv5 (ساخته شده توسط setup_environment)
+            img_size: اندازه ورودی مدل
+            iou_threshold: آستانه IoU برای NMS
+            backend: اجراکننده شبکه در هر کارگر (torch، torchscript، onnx)
+            share_weights: اشتراک وزن‌ها بین کارگرها با mmap (فقط backend='torch')
+        """
+        cpu_count = os.cpu_count() or 1
+        self.num_workers = num_workers or max(1, cpu_count // 4)
+        self.threads_per_worker = threads_per_worker or max(1, cpu_count // self.num_workers)
+        self.yolov5_path = Path(os.path.abspath(yolov5_path))
+        self.detector_kwargs = {
+            'weights': weights,
+            'conf_threshold': conf_threshold,
+            'img_size': img_size,
+            'iou_threshold': iou_threshold,
+            'backend': backend,
+            'share_weights': share_weights,
+        }
+        self._executor = None
+        self._pid_queue = None
+        self._worker_pids = set()
+    
+    def start(self) -> "DetectorPool":
+        """
+        راه‌اندازی پروسه‌های کارگر (در صورت نیاز به صورت خودکار فراخوانی می‌شود)
+        """
+        if self._executor is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            
+            logger.info(f"⏳ راه‌اندازی {self.num_workers} کارگر "
+                        f"(هر کدام {self.threads_per_worker} نخ)...")
+            if self.detector_kwargs['backend'] != 'torch' or self.detector_kwargs['share_weights']:
+                # خروجی یک‌باره در پروسه اصلی تا کارگرها همزمان آن را نسازند
+                exporter = YOLOv5Detector(engine='inprocess', raise_errors=True, **self.detector_kwargs)
+                exporter.yolov5_path = self.yolov5_path
+                if exporter.share_weights:
+                    exporter.fuse_weights()
+                else:
+                    exporter.export(self.detector_kwargs['backend'])
+            context = multiprocessing.get_context('spawn')
+            self._pid_queue = context.Queue()
+            self._worker_pids = set()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.num_workers,
+                mp_context=context,
+                initializer=_pool_worker_init,
+                initargs=(self.detector_kwargs, str(self.yolov5_path), self.threads_per_worker, self._pid_queue),
+            )
+        return self
+    
+    def detect_images(self,
+                      sources: Union[str, Path, Iterable[Union[str, Path]]],
+                      batch_size: int = 8,
+                      classes: Optional[List[int]] = None) -> List[Optional[Detections]]:
+        """
+        تشخیص اشیاء در چندین تصویر با توزیع دسته‌ها بین کارگرها
+        
+        Args:
+            sources: لیست مسیر تصاویر، مسیر یک پوشه یا یک الگوی glob
+            batch_size: تعداد تصاویر هر دسته ارسالی به یک کارگر
+            classes: لیست شماره کلاس‌های مورد نظر
+        
+        Returns:
+            list: Detections برای هر ورودی به همان ترتیب ورودی
+                  (None برای تصاویری که خوانده نشدند)
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size باید حداقل 1 باشد")
+        
+        image_paths = YOLOv5Detector._expand_image_sources(sources)
+        chunks = [image_paths[i:i + batch_size] for i in range(0, len(image_paths), batch_size)]
+        
+        self.start()
+        results: List[Optional[Detections]] = []
+        for chunk_results in self._executor.map(_pool_worker_detect, chunks, [classes] * len(chunks)):
+            results.extend(chunk_results)
+        
+        return results
+    
+    def detect_tiled(self,
+                     image: Union[str, Path],
+                     tile_size: Optional[int] = None,
+                     overlap: float = 0.2,
+                     global_pass: bool = True,
+                     merge: str = 'fusion',
+                     batch_size: int = 4,
+                     classes: Optional[List[int]] = None) -> Detections:
+        """
+        تشخیص کاشی‌بندی‌شده یک تصویر بزرگ با توزیع دسته‌های کاشی بین کارگرها
+        
+        تصویر فقط یک بار در پروسه اصلی رمزگشایی می‌شود؛ هر کارگر فقط کاشی‌های
+        دسته خود را دریافت می‌کند. آرگومان‌ها مانند YOLOv5Detector.detect_tiled هستند.
+        
+        Returns:
+            Detections: نتیجه در مختصات تصویر اصلی
+        """
+        import cv2
+        
+        if batch_size < 1:
+            raise ValueError("batch_size باید حداقل 1 باشد")
+        
+        source = cv2.imread(str(image))
+        if source is None:
+            raise ImageReadError(f"خواندن تصویر ممکن نیست: {image}")
+        
+        self.start()
+        
+        def run_batches(batches):
+            # Executor.map کل iterator را یک‌جا مصرف می‌کند و همه کاشی‌ها pickle می‌شوند؛
+            # تعداد دسته‌های در جریان محدود می‌ماند تا تصویر دو بار در حافظه نباشد
+            in_flight = deque()
+            try:
+                for batch in batches:
+                    in_flight.append(self._executor.submit(_pool_worker_arrays, batch, classes))
+                    if len(in_flight) >= 2 * self.num_workers:
+                        yield in_flight.popleft().result()
+                while in_flight:
+                    yield in_flight.popleft().result()
+            finally:
+                for future in in_flight:
+                    future.cancel()
+        
+        det, _ = _detect_tiles(
+            source,
+            run_batches,
+            tile_size or self.detector_kwargs['img_size'], overlap, global_pass, merge,
+            self.detector_kwargs['iou_threshold'], batch_size,
+        )
+        names = YOLOv5Detector.get_coco_classes()
+        return Detections.from_array(det, names, str(image), source.shape)
+    
+    def memory_usage(self) -> List[dict]:
+        """
+        مصرف حافظه هر پروسه کارگر (مگابایت؛ به _process_memory مراجعه کنید)
+        
+        Returns:
+            list: برای هر کارگر {'pid': ...، 'rss': ...، 'pss': ...، 'shared': ...، 'anonymous': ...}
+        """
+        if self._executor is None:
+            return []
+        # هر کارگر شماره پروسه خود را پس از راه‌اندازی گزارش می‌کند
+        while True:
+            try:
+                self._worker_pids.add(self._pid_queue.get_nowait())
+            except queue.Empty:
+                break
+        return [{'pid': pid, **_process_memory(pid)} for pid in sorted(self._worker_pids)]
+    
+    def close(self):
+        """
+        توقف پروسه‌های کارگر
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+            self._pid_queue.close()
+            self._pid_queue = None
+    
+    def __enter__(self) -> "DetectorPool":
+        return self.start()
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class _PendingRequest:
+    """
+    درخواست در صف سرور تا زمان تکمیل توسط نخ تجمیع‌کننده
+    """
+    
+    __slots__ = ('data', 'classes', 'weights', 'done', 'result', 'error', 'received')
+    
+    def __init__(self, data: bytes, classes: Optional[List[int]], weights: Optional[str] = None):
+        self.data = data
+        self.classes = classes
+        self.weights = weights
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.received = time.perf_counter()
+
+
+class _DetectionRequestHandler(BaseHTTPRequestHandler):
+    """
+    مسیرهای HTTP سرور تشخیص:
+        POST /detect?classes=0,2   بدنه: بایت‌های فایل تصویر، پاسخ: JSON
+             &weights=yolov5l.pt   (اختیاری) یکی از مدل‌های مجاز سرور
+        GET  /health               وضعیت سرور و مدل
+        GET  /metrics              متریک‌ها در قالب متنی Prometheus
+        GET  /stats                آمار درخواست‌ها، دسته‌ها و تأخیر (JSON)
+    """
+    
+    protocol_version = "HTTP/1.1"
+    
+    def do_GET(self):
+        server = self.server.detection_server
+        path = urlparse(self.path).path
+        
+        if path == '/health':
+            self._send_json(200, server.health())
+        elif path == '/metrics':
+            payload = server.detector.metrics.exposition().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        elif path == '/stats':
+            self._send_json(200, server.stats())
+        else:
+            self._send_json(404, {'error': 'not found'})
+    
+    def do_POST(self):
+        server = self.server.detection_server
+        url = urlparse(self.path)
+        
+        if url.path != '/detect':
+            self._send_json(404, {'error': 'not found'})
+            return
+        
+        length = int(self.headers.get('Content-Length') or 0)
+        data = self.rfile.read(length) if length > 0 else b''
+        if not data:
+            self._send_json(400, {'error': 'empty request body'})
+            return
+        
+        classes = None
+        query = parse_qs(url.query)
+        if 'classes' in query:
+            try:
+                classes = sorted({int(c) for value in query['classes'] for c in value.split(',') if c})
+            except ValueError:
+                self._send_json(400, {'error': 'invalid classes'})
+                return
+        
+        weights = query.get('weights', [None])[-1]
+        if weights is not None and weights not in server.models:
+            self._send_json(400, {'error': f'unknown weights: {weights}', 'models': server.models})
+            return
+        
+        start = time.perf_counter()
+        status, body = server.submit(data, classes, weights)
+        server.detector.metrics.inc('yolov5_requests_total', labels={'code': status})
+        server.detector.metrics.observe('yolov5_request_seconds', time.perf_counter() - start)
+        headers = {'Retry-After': '1'} if status == 503 else None
+        self._send_json(status, body, headers)
+    
+    def _send_json(self, status: int, body: dict, headers: Optional[dict] = None):
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+    
+    def log_message(self, format, *args):
+        # گزارش هر درخواست در خروجی خطا، آزمون بار را کند می‌کند
+        pass
+
+
+class _DetectionHTTPServer(ThreadingHTTPServer):
+    """
+    سرور HTTP چندنخی با صف اتصال بزرگ‌تر برای بارهای انفجاری
+    """
+    
+    daemon_threads = True
+    request_queue_size = 256
+
+
+class DetectionServer:
+    """
+    سرور HTTP محلی برای تشخیص با مدل مقیم و تجمیع پویای درخواست‌ها
+    
+    درخواست‌ها در یک صف محدود قرار می‌گیرند؛ یک نخ تجمیع‌کننده تا
+    max_batch_size درخواست (یا تا گذشت max_wait ثانیه از اولین درخواست)
+    را جمع کرده و در یک فراخوانی مدل اجرا می‌کند. اگر صف پر باشد، درخواست
+    جدید بلافاصله با کد 503 رد می‌شود (فشار معکوس) تا تأخیر محدود بماند.
+    
+    مثال:
+        server = DetectionServer(detector, port=8000, max_batch_size=16)
+        server.serve_forever()
+        
+        curl --data-binary @image.jpg "http://127.0.0.1:8000/detect?classes=0"
+    
+    با آرگومان models چند مدل همزمان در registry تشخیص‌دهنده مقیم می‌مانند و
+    هر درخواست می‌تواند با پارامتر weights یکی از آن‌ها را انتخاب کند:
+        server = DetectionServer(detector, models=['yolov5l.pt'])
+        curl --data-binary @image.jpg "http://127.0.0.1:8000/detect?weights=yolov5l.pt"
+    
+    نوشته شده توسط: رضا صفری فروشانی
+    """
+    
+    def __init__(self,
+                 detector: "YOLOv5Detector",
+                 host: str = '127.0.0.1',
+                 port: int = 8000,
+                 max_batch_size: int = 16,
+                 max_wait: float = 0.005,
+                 max_queue: int = 64,
+                 request_timeout: float = 30.0,
+                 models: Optional[Iterable[str]] = None):
+        """
+        Args:
+            detector: تشخیص‌دهنده راه‌اندازی‌شده (yolov5_path تنظیم شده باشد)
+            host: آدرس شنود (پیش‌فرض فقط محلی)
+            port: پورت شنود (0 = انتخاب خودکار یک پورت آزاد)
+            max_batch_size: حداکثر تعداد درخواست در یک دسته
+            max_wait: حداکثر انتظار برای تکمیل دسته پس از اولین درخواست (ثانیه)
+            max_queue: ظرفیت صف پذیرش؛ درخواست‌های اضافه با 503 رد می‌شوند
+            request_timeout: حداکثر انتظار هر درخواست برای نتیجه (ثانیه)
+            models: وزن‌های دیگری که درخواست‌ها می‌توانند انتخاب کنند (علاوه بر detector.weights)؛
+                    فقط همین فهرست پذیرفته می‌شود تا کاربر نتواند فایل دلخواهی را بارگذاری کند
+        """
+        if max_batch_size < 1 or max_queue < 1:
+            raise ValueError("max_batch_size و max_queue باید حداقل 1 باشند")
+        
+        # سرور همیشه متریک‌های Prometheus را در /metrics ارائه می‌دهد
+        if not isinstance(detector.metrics, PrometheusMetrics):
+            detector.metrics = PrometheusMetrics()
+        
+        self.detector = detector
+        self.models = list(dict.fromkeys([detector.weights, *(models or [])]))
+        self.host = host
+        self.port = port
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.request_timeout = request_timeout
+        
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._httpd = None
+        self._threads = []
+        self._started = None
+        
+        self._stats_lock = threading.Lock()
+        self._stats = {'requests': 0, 'completed': 0, 'rejected': 0, 'errors': 0,
+                       'batches': 0, 'batched_images': 0}
+        self._latencies = deque(maxlen=2048)
+    
+    @property
+    def address(self) -> Tuple[str, int]:
+        """
+        آدرس و پورت واقعی شنود (پس از start)
+        """
+        if self._httpd is None:
+            return self.host, self.port
+        return self._httpd.server_address[:2]
+    
+    def start(self) -> "DetectionServer":
+        """
+        بارگذاری مدل‌ها و راه‌اندازی نخ‌های سرور و تجمیع‌کننده (بدون مسدود کردن)
+        """
+        if self._httpd is not None:
+            return self
+        
+        # مدل پیش‌فرض آخر بارگذاری می‌شود تا در صورت کمبود بودجه حافظه آخرین مدلی باشد که خارج می‌شود
+        if self.detector.cascade_weights is not None:
+            self.detector._load_model(self.detector.cascade_weights)
+        for weights in self.models[::-1]:
+            self.detector._load_model(weights)
+        
+        self._stop.clear()
+        self._httpd = _DetectionHTTPServer((self.host, self.port), _DetectionRequestHandler)
+        self._httpd.detection_server = self
+        self._started = time.time()
+        
+        self._threads = [
+            threading.Thread(target=self._batch_loop, name="yolov5-batcher", daemon=True),
+            threading.Thread(target=self._httpd.serve_forever, name="yolov5-http", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        
+        host, port = self.address
+        logger.info(f"🌐 سرور تشخیص در حال اجرا: http://{host}:{port}")
+        return self
+    
+    def serve_forever(self):
+        """
+        اجرای سرور تا فشردن Ctrl+C
+        """
+        self.start()
+        try:
+            while not self._stop.is_set():
+                self._stop.wait(0.5)
+        except KeyboardInterrupt:
+            logger.info("\nℹ️  سرور توسط کاربر متوقف شد")
+        finally:
+            self.close()
+    
+    def close(self):
+        """
+        توقف سرور و رد کردن درخواست‌های باقی‌مانده در صف
+        """
+        self._stop.set()
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            request.error = RuntimeError("server stopped")
+            request.done.set()
+    
+    def submit(self, data: bytes, classes: Optional[List[int]] = None,
+               weights: Optional[str] = None) -> Tuple[int, dict]:
+        """
+        افزودن یک تصویر به صف و انتظار برای نتیجه
+        
+        Returns:
+            tuple: (کد وضعیت HTTP، بدنه پاسخ)
+        """
+        request = _PendingRequest(data, classes, weights)
+        with self._stats_lock:
+            self._stats['requests'] += 1
+        
+        try:
+            self._queue.put_nowait(request)
+        except queue.Full:
+            with self._stats_lock:
+                self._stats['rejected'] += 1
+            return 503, {'error': 'server overloaded, retry later'}
+        finally:
+            self.detector.metrics.set('yolov5_queue_depth', self._queue.qsize(), {'queue': 'server'})
+        
+        if not request.done.wait(self.request_timeout):
+            self.detector.metrics.inc('yolov5_errors_total', labels={'reason': 'timeout'})
+            with self._stats_lock:
+                self._stats['errors'] += 1
+            return 504, {'error': 'detection timed out'}
+        
+        latency = time.perf_counter() - request.received
+        with self._stats_lock:
+            if request.error is not None:
+                self._stats['errors'] += 1
+                self.detector.metrics.inc('yolov5_errors_total', labels={'reason': 'server'})
+            else:
+                self._stats['completed'] += 1
+                self._latencies.append(latency)
+        
+        if isinstance(request.error, ValueError):
+            return 422, {'error': str(request.error)}
+        if request.error is not None:
+            return 500, {'error': str(request.error)}
+        
+        body = request.result.to_dict()
+        body['latency_ms'] = round(latency * 1000, 3)
+        return 200, body
+    
+    def health(self) -> dict:
+        """
+        وضعیت سرور برای بررسی سلامت
+        """
+        return {
+            'status': 'ok' if self._httpd is not None and not self._stop.is_set() else 'stopping',
+            'model_loaded': len(self.detector.registry) > 0,
+            'weights': self.detector.weights,
+            'models': self.models,
+            'registry': self.detector.registry.info(),
+            'queue_depth': self._queue.qsize(),
+        }
+    
+    def stats(self) -> dict:
+        """
+        آمار تجمعی درخواست‌ها، اندازه دسته‌ها و تأخیر (میلی‌ثانیه)
+        """
+        import numpy as np
+        
+        with self._stats_lock:
+            stats = dict(self._stats)
+            latencies = np.array(self._latencies, dtype=np.float64) * 1000
+        
+        stats['queue_depth'] = self._queue.qsize()
+        stats['queue_capacity'] = self._queue.maxsize
+        stats['mean_batch_size'] = (round(stats['batched_images'] / stats['batches'], 3)
+                                    if stats['batches'] else 0.0)
+        stats['uptime'] = round(time.time() - self._started, 3) if self._started else 0.0
+        if len(latencies):
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            stats['latency_ms'] = {'p50': round(p50, 3), 'p95': round(p95, 3),
+                                   'p99': round(p99, 3), 'max': round(latencies.max(), 3)}
+        if self.detector._cache is not None:
+            stats['cache'] = self.detector.cache_info()
+        if self.detector.cascade_weights is not None:
+            stats['cascade'] = self.detector.cascade_info()
+        return stats
+    
+    def _batch_loop(self):
+        """
+        جمع‌آوری درخواست‌های صف در دسته‌ها و اجرای مدل
+        """
+        while not self._stop.is_set():
+            try:
+                batch = [self._queue.get(timeout=0.1)]
+            except queue.Empty:
+                continue
+            
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0
+                                 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            self.detector.metrics.set('yolov5_queue_depth', self._queue.qsize(), {'queue': 'server'})
+            self._run_batch(batch)
+    
+    def _run_batch(self, batch: List[_PendingRequest]):
+        """
+        اجرای یک دسته (درخواست‌ها با فیلتر کلاس یا مدل متفاوت جداگانه اجرا می‌شوند)
+        """
+        groups = {}
+        for request in batch:
+            key = (tuple(request.classes) if request.classes is not None else None, request.weights)
+            groups.setdefault(key, []).append(request)
+        
+        names = self.detector.get_coco_classes()
+        for (classes, weights), requests in groups.items():
+            try:
+                results = self.detector._detect_batch([request.data for request in requests],
+                                                      list(classes) if classes is not None else None,
+                                                      weights=weights)
+            except Exception as e:
+                results = [e] * len(requests)
+            
+            for request, item in zip(requests, results):
+                if isinstance(item, Exception):
+                    request.error = item
+                elif item is None:
+                    request.error = ImageReadError("خواندن تصویر ممکن نیست")
+                else:
+                    det, shape, _ = item
+                    request.result = Detections.from_array(det, names, None, shape)
+                request.done.set()
+        
+        with self._stats_lock:
+            self._stats['batches'] += 1
+            self._stats['batched_images'] += len(batch)
+
+
+# مراحل اندازه‌گیری شده در بنچمارک (به ترتیب اجرا)
+_BENCHMARK_STAGES = ('decode', 'preprocess', 'inference', 'postprocess')
+
+
+def _synthetic_images(count: int, width: int = 640, height: int = 480, seed: int = 0) -> List[bytes]:
+    """
+    ساخت تصاویر مصنوعی JPEG (نویز و اشکال رنگی) برای بنچمارک بدون داده
+    """
+    import cv2
+    import numpy as np
+    
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(count):
+        image = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        for _ in range(8):
+            x, y = int(rng.integers(0, width - 40)), int(rng.integers(0, height - 40))
+            w, h = int(rng.integers(20, 200)), int(rng.integers(20, 200))
+            color = tuple(int(c) for c in rng.integers(0, 256, 3))
+            cv2.rectangle(image, (x, y), (x + w, y + h), color, -1)
+        images.append(cv2.imencode('.jpg', image)[1].tobytes())
+    return images
+
+
+def _random_init_weights(yolov5_path: Path, model_name: str) -> str:
+    """
+    ساخت (یک بار) چک‌پوینت با وزن‌های تصادفی از فایل پیکربندی models/<name>.yaml
+    
+    خروجی همان قالب چک‌پوینت‌های رسمی را دارد تا مسیر بارگذاری
+    DetectMultiBackend بدون تغییر اندازه‌گیری شود و به اینترنت نیازی نباشد.
+    """
+    output = yolov5_path / 'runs' / 'benchmark' / f'{model_name}_random.pt'
+    if output.exists():
+        return str(output)
+    
+    if str(yolov5_path) not in sys.path:
+        sys.path.insert(0, str(yolov5_path))
+    
+    import torch
+    from models.yolo import Model
+    
+    config = yolov5_path / 'models' / f'{model_name}.yaml'
+    if not config.exists():
+        raise FileNotFoundError(f"فایل پیکربندی مدل پیدا نشد: {config}")
+    
+    torch.manual_seed(0)
+    model = Model(str(config), nc=80)
+    
+    output.parent.mkdir(parents=True, exist_ok=True)
+    torch.save({'model': model.half(), 'epoch': -1}, output)
+    return str(output)
+
+
+def _cuda_sync(device: str):
+    """
+    همگام‌سازی GPU تا زمان‌سنجی مراحل دقیق باشد
+    """
+    if device != 'cpu':
+        import torch
+        if torch.cuda.is_available():
+            torch.cuda.synchronize()
+
+
+def _benchmark_config(config: dict, images: List[bytes]) -> dict:
+    """
+    اجرای یک پیکربندی بنچمارک (در یک پروسه جداگانه اجرا می‌شود)
+    """
+    import resource
+    import cv2
+    import numpy as np
+    import torch
+    
+    if config['threads']:
+        torch.set_num_threads(config['threads'])
+    
+    detector = YOLOv5Detector(
+        weights=config['weights'],
+        conf_threshold=config['conf_threshold'],
+        engine='inprocess',
+        img_size=config['img_size'],
+        device=config['device'],
+        backend=config['backend'],
+        precision=config['precision'],
+        calibration=config['calibration'],
+        share_weights=config['share_weights'],
+        raise_errors=True,
+    )
+    detector.yolov5_path = Path(config['yolov5_path'])
+    
+    start = time.perf_counter()
+    detector._load_model()
+    load_time = time.perf_counter() - start
+    
+    batch_size = config['batch_size']
+    batches = [images[i:i + batch_size] for i in range(0, len(images), batch_size)]
+    
+    def run(batch, timings=None):
+        marks = [time.perf_counter()]
+        decoded = [cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR) for data in batch]
+        marks.append(time.perf_counter())
+        tensor = detector._preprocess(decoded)
+        _cuda_sync(config['device'])
+        marks.append(time.perf_counter())
+        pred = detector._infer(tensor)
+        _cuda_sync(config['device'])
+        marks.append(time.perf_counter())
+        detector._postprocess(pred, tensor.shape[2:], decoded)
+        marks.append(time.perf_counter())
+        
+        if timings is not None:
+            for stage, begin, end in zip(_BENCHMARK_STAGES, marks, marks[1:]):
+                timings[stage] += end - begin
+        return marks[-1] - marks[0]
+    
+    for _ in range(config['warmup']):
+        run(batches[0])
+    
+    timings = dict.fromkeys(_BENCHMARK_STAGES, 0.0)
+    latencies = np.array([run(batch, timings) for batch in batches]) * 1000
+    total = latencies.sum() / 1000
+    
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = peak_rss / (1024 * 1024) if sys.platform == 'darwin' else peak_rss / 1024
+    
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        **{key: config[key] for key in ('model', 'backend', 'precision', 'share_weights',
+                                        'batch_size', 'img_size', 'device')},
+        'threads': config['threads'] or torch.get_num_threads(),
+        'images': len(images),
+        'images_per_second': round(len(images) / total, 3),
+        'batch_latency_ms': {'p50': round(p50, 3), 'p95': round(p95, 3), 'p99': round(p99, 3),
+                             'mean': round(float(latencies.mean()), 3)},
+        'stages_ms_per_image': {stage: round(value * 1000 / len(images), 3)
+                                for stage, value in timings.items()},
+        'load_seconds': round(load_time, 3),
+        'peak_rss_mb': round(peak_rss_mb, 1),
+        'memory_mb': _process_memory(),
+    }
+
+
+def run_benchmark(yolov5_path: Union[str, Path] = 'yolov5',
+                  models: Iterable[str] = ('yolov5s',),
+                  batch_sizes: Iterable[int] = (1, 8),
+                  img_sizes: Iterable[int] = (640,),
+                  threads: Iterable[Optional[int]] = (None,),
+                  backends: Iterable[str] = ('torch',),
+                  precisions: Iterable[str] = ('fp32',),
+                  calibration=None,
+                  share_weights: bool = False,
+                  images: Optional[Union[str, Path, Iterable[Union[str, Path]]]] = None,
+                  num_images: int = 64,
+                  warmup: int = 2,
+                  random_init: bool = False,
+                  device: str = 'cpu',
+                  conf_threshold: float = 0.25,
+                  output: Optional[Union[str, Path]] = None) -> dict:
+    """
+    اندازه‌گیری توان عملیاتی و تأخیر YOLOv5Detector در ترکیب‌های مختلف تنظیمات
+    
+    هر ترکیب (مدل × backend و دقت × اندازه تصویر × اندازه دسته × تعداد نخ) در یک پروسه
+    جداگانه اجرا می‌شود تا حافظه اوج (peak RSS) و تنظیم نخ‌ها مستقل باشند. حافظه هر
+    پروسه کارگر پس از اجرا در memory_mb گزارش می‌شود؛ anonymous هزینه حافظه‌ای است
+    که هر کارگر اضافه روی میزبان دارد.
+    
+    Args:
+        yolov5_path: مسیر پوشه YOLOv5
+        models: نام مدل‌ها (yolov5s، yolov5m، yolov5l، yolov5x) یا مسیر فایل وزن
+        batch_sizes: اندازه‌های دسته
+        img_sizes: اندازه‌های ورودی مدل
+        threads: تعداد نخ‌های torch (None = پیش‌فرض torch)
+        backends: اجراکننده‌های شبکه (torch، torchscript، onnx)
+        precisions: دقت‌های محاسبات (fp32، int8؛ int8 همیشه با onnx اجرا می‌شود)
+        calibration: تصاویر کالیبراسیون برای int8 (None = کوانتیزه‌سازی پویا)
+        share_weights: بارگذاری وزن‌ها با mmap در ترکیب‌های backend='torch'
+        images: تصاویر ورودی (پوشه، الگوی glob یا لیست)؛ None = تصاویر مصنوعی
+        num_images: تعداد تصاویر مصنوعی
+        warmup: تعداد دسته‌های گرم‌کردن پیش از اندازه‌گیری
+        random_init: استفاده از وزن‌های تصادفی (بدون دانلود، برای اجرای آفلاین)
+        device: دستگاه اجرا
+        conf_threshold: آستانه اطمینان
+        output: مسیر فایل JSON خروجی (اختیاری)
+    
+    Returns:
+        dict: اطلاعات محیط و نتایج هر ترکیب
+    
+    نوشته شده توسط: رضا صفری فروشانی
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    
+    yolov5_path = Path(os.path.abspath(yolov5_path))
+    
+    if images is None:
+        data = _synthetic_images(num_images)
+        source = f'synthetic ({num_images} × 640×480 JPEG)'
+    else:
+        paths = YOLOv5Detector._expand_image_sources(images)
+        data = [Path(path).read_bytes() for path in paths]
+        source = str(images)
+    if not data:
+        raise ValueError("هیچ تصویری برای بنچمارک پیدا نشد")
+    
+    logger.info("\n" + "═" * 80)
+    logger.info("📈 بنچمارک YOLOv5Detector")
+    logger.info("═" * 80)
+    logger.info(f"🖼️  تصاویر: {source}")
+    
+    # int8 همیشه روی ONNX Runtime اجرا می‌شود؛ ترکیب‌های تکراری حذف می‌شوند
+    variants = list(dict.fromkeys(
+        ('onnx' if precision == 'int8' else backend, precision)
+        for backend, precision in itertools.product(backends, precisions)
+    ))
+    calibration = str(calibration) if calibration is not None else None
+    
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for model in models:
+        if random_init:
+            weights = _random_init_weights(yolov5_path, Path(model).stem)
+        else:
+            weights = model if model.endswith('.pt') else f'{model}.pt'
+        
+        for (backend, precision), img_size in itertools.product(variants, img_sizes):
+            if backend != 'torch':
+                # خروجی یک‌باره پیش از اجرا تا زمان آن در load_seconds شمرده نشود
+                exporter = YOLOv5Detector(weights=weights, engine='inprocess', img_size=img_size,
+                                          backend=backend, precision=precision, calibration=calibration,
+                                          raise_errors=True)
+                exporter.yolov5_path = yolov5_path
+                exporter.quantize() if precision == 'int8' else exporter.export(backend)
+            elif share_weights:
+                exporter = YOLOv5Detector(weights=weights, engine='inprocess', share_weights=True,
+                                          raise_errors=True)
+                exporter.yolov5_path = yolov5_path
+                exporter.fuse_weights()
+            
+            for num_threads in threads:
+                for batch_size in batch_sizes:
+                    config = {
+                        'model': Path(model).stem, 'weights': weights, 'yolov5_path': str(yolov5_path),
+                        'backend': backend, 'precision': precision, 'calibration': calibration,
+                        'share_weights': share_weights and backend == 'torch', 'img_size': img_size, 'batch_size': batch_size,
+                        'threads': num_threads, 'device': device, 'conf_threshold': conf_threshold,
+                        'warmup': warmup,
+                    }
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                        result = executor.submit(_benchmark_config, config, data).result()
+                    results.append(result)
+                    
+                    latency = result['batch_latency_ms']
+                    logger.info(f"  {result['model']:<10} {backend + '/' + precision:<16} img={img_size:<5} "
+                                f"batch={batch_size:<3} "
+                                f"threads={result['threads']:<3} {result['images_per_second']:>8.2f} img/s  "
+                                f"p50={latency['p50']:.1f}ms p95={latency['p95']:.1f}ms "
+                                f"p99={latency['p99']:.1f}ms  RSS={result['peak_rss_mb']:.0f}MB "
+                                f"anon={result['memory_mb'].get('anonymous', 0):.0f}MB")
+    
+    import torch
+    
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {
+            'python': platform.python_version(),
+            'torch': torch.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'images': source,
+        'random_init': random_init,
+        'results': results,
+    }
+    
+    if output is not None:
+        Path(output).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+        logger.info(f"💾 نتایج ذخیره شد: {output}")
+    
+    return report
+
+
+def _build_arg_parser() -> argparse.ArgumentParser:
+    """
+    تعریف دستورات خط فرمان (بدون دستور = منوی تعاملی)
+    """
+    parser = argparse.ArgumentParser(
+        description="YOLOv5 Object Detection - رضا صفری فروشانی"
+    )
+    commands = parser.add_subparsers(dest='command')
+    
+    serve = commands.add_parser('serve', help="اجرای سرور HTTP محلی تشخیص")
+    serve.add_argument('--weights', default='yolov5m.pt', help="نام یا مسیر وزن‌های مدل")
+    serve.add_argument('--conf', type=float, default=0.7, help="آستانه اطمینان")
+    serve.add_argument('--iou', type=float, default=0.45, help="آستانه IoU برای NMS")
+    serve.add_argument('--img-size', type=int, default=640, help="اندازه ورودی مدل")
+    serve.add_argument('--device', default='cpu', help="دستگاه اجرا (cpu، 0، ...)")
+    serve.add_argument('--backend', default='torch', choices=['torch', 'torchscript', 'onnx'],
+                       help="اجراکننده شبکه")
+    serve.add_argument('--precision', default='fp32', choices=['fp32', 'int8'], help="دقت محاسبات")
+    serve.add_argument('--calibration', default=None,
+                       help="تصاویر کالیبراسیون int8 (پیش‌فرض: کوانتیزه‌سازی پویا)")
+    serve.add_argument('--yolov5-path', default=None,
+                       help="پوشه YOLOv5 (پیش‌فرض: راه‌اندازی خودکار ./yolov5)")
+    serve.add_argument('--host', default='127.0.0.1', help="آدرس شنود")
+    serve.add_argument('--port', type=int, default=8000, help="پورت شنود")
+    serve.add_argument('--max-batch-size', type=int, default=16, help="حداکثر اندازه دسته")
+    serve.add_argument('--max-wait-ms', type=float, default=5.0,
+                       help="حداکثر انتظار برای تکمیل دسته (میلی‌ثانیه)")
+    serve.add_argument('--max-queue', type=int, default=64,
+                       help="ظرفیت صف پذیرش (درخواست‌های اضافه با 503 رد می‌شوند)")
+    serve.add_argument('--cache-size', type=int, default=0, help="ظرفیت کش نتایج در حافظه")
+    serve.add_argument('--cascade-weights', default=None,
+                       help="حالت آبشاری: مدل بزرگ‌تر برای تصاویر نامطمئن (مثال: yolov5l.pt)")
+    serve.add_argument('--cascade-band', nargs=2, type=float, default=[0.25, None], metavar=('LOW', 'HIGH'),
+                       help="بازه اطمینان نامطمئن مدل کوچک (پیش‌فرض: 0.25 تا --conf)")
+    serve.add_argument('--share-weights', action='store_true',
+                       help="بارگذاری وزن‌ها با mmap تا چند سرور روی یک میزبان یک نسخه از وزن‌ها را استفاده کنند")
+    serve.add_argument('--models', nargs='+', default=None,
+                       help="وزن‌های دیگری که درخواست‌ها با ?weights= انتخاب می‌کنند")
+    serve.add_argument('--model-memory-mb', type=int, default=2048,
+                       help="بودجه حافظه مدل‌های مقیم (مگابایت، مدل‌های کم‌استفاده خارج می‌شوند)")
+    
+    bench = commands.add_parser('benchmark', help="اندازه‌گیری توان عملیاتی و تأخیر")
+    bench.add_argument('--models', nargs='+', default=['yolov5s'],
+                       help="yolov5s، yolov5m، yolov5l، yolov5x یا مسیر فایل وزن")
+    bench.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 8], help="اندازه‌های دسته")
+    bench.add_argument('--img-sizes', nargs='+', type=int, default=[640], help="اندازه‌های ورودی مدل")
+    bench.add_argument('--threads', nargs='+', type=int, default=None, help="تعداد نخ‌های torch")
+    bench.add_argument('--backends', nargs='+', default=['torch'],
+                       choices=['torch', 'torchscript', 'onnx'], help="اجراکننده‌های شبکه")
+    bench.add_argument('--precisions', nargs='+', default=['fp32'], choices=['fp32', 'int8'],
+                       help="دقت‌های محاسبات")
+    bench.add_argument('--calibration', default=None,
+                       help="تصاویر کالیبراسیون int8 (پیش‌فرض: کوانتیزه‌سازی پویا)")
+    bench.add_argument('--share-weights', action='store_true',
+                       help="بارگذاری وزن‌ها با mmap (اشتراک بین پروسه‌ها، فقط backend torch)")
+    bench.add_argument('--images', default=None, help="پوشه یا الگوی تصاویر (پیش‌فرض: مصنوعی)")
+    bench.add_argument('--num-images', type=int, default=64, help="تعداد تصاویر مصنوعی")
+    bench.add_argument('--warmup', type=int, default=2, help="تعداد دسته‌های گرم‌کردن")
+    bench.add_argument('--random-init', action='store_true',
+                       help="وزن‌های تصادفی از models/*.yaml (اجرای آفلاین)")
+    bench.add_argument('--device', default='cpu', help="دستگاه اجرا")
+    bench.add_argument('--conf', type=float, default=0.25, help="آستانه اطمینان")
+    bench.add_argument('--yolov5-path', default='yolov5', help="پوشه YOLOv5")
+    bench.add_argument('--output', default=None, help="مسیر فایل JSON نتایج")
+    
+    export = commands.add_parser('export', help="خروجی TorchScript یا ONNX و مقایسه با eager")
+    export.add_argument('--weights', default='yolov5m.pt', help="نام یا مسیر وزن‌های مدل")
+    export.add_argument('--backend', default='onnx', choices=['torchscript', 'onnx'], help="قالب خروجی")
+    export.add_argument('--img-size', type=int, default=640, help="اندازه ورودی مدل")
+    export.add_argument('--yolov5-path', default='yolov5', help="پوشه YOLOv5")
+    export.add_argument('--output', default=None, help="مسیر فایل خروجی (پیش‌فرض: کنار وزن‌ها)")
+    export.add_argument('--force', action='store_true', help="ساخت دوباره حتی با وجود فایل کش‌شده")
+    export.add_argument('--check', action='store_true', help="مقایسه عددی با اجرای eager")
+    export.add_argument('--images', default=None, help="تصاویر مقایسه (پیش‌فرض: مصنوعی)")
+    export.add_argument('--precision', default='fp32', choices=['fp32', 'int8'],
+                        help="int8 = کوانتیزه‌سازی مدل ONNX")
+    export.add_argument('--calibration', default=None,
+                        help="تصاویر کالیبراسیون int8 (پیش‌فرض: کوانتیزه‌سازی پویا)")
+    export.add_argument('--validate', default=None,
+                        help="تصاویر اعتبارسنجی برای مقایسه int8 با fp32")
+    export.add_argument('--labels', default=None, help="پوشه برچسب‌های YOLO برای محاسبه mAP")
+    export.add_argument('--conf', type=float, default=0.25, help="آستانه اطمینان در مقایسه‌ها")
+    
+    return parser
+
+
+def _serve_command(args: argparse.Namespace) -> int:
+    """
+    اجرای دستور serve
+    """
+    detector = YOLOv5Detector(
+        weights=args.weights,
+        conf_threshold=args.conf,
+        engine='inprocess',
+        img_size=args.img_size,
+        iou_threshold=args.iou,
+        device=args.device,
+        cache_size=args.cache_size,
+        verbose=True,
+        backend=args.backend,
+        precision=args.precision,
+        calibration=args.calibration,
+        registry=ModelRegistry(max_bytes=args.model_memory_mb * 2 ** 20),
+        share_weights=args.share_weights,
+        cascade_weights=args.cascade_weights,
+        cascade_band=tuple(args.cascade_band),
+    )
+    if args.yolov5_path is not None:
+        detector.yolov5_path = Path(os.path.abspath(args.yolov5_path))
+    elif not detector.setup_environment(interactive=False):
+        logger.error("✗ خطا در راه‌اندازی محیط")
+        return 1
+    
+    server = DetectionServer(
+        detector,
+        host=args.host,
+        port=args.port,
+        max_batch_size=args.max_batch_size,
+        max_wait=args.max_wait_ms / 1000,
+        max_queue=args.max_queue,
+        models=args.models,
+    )
+    server.serve_forever()
+    return 0
+
+
+def _export_command(args: argparse.Namespace) -> int:
+    """
+    اجرای دستور export (و در صورت درخواست، مقایسه با eager یا fp32)
+    """
+    if args.precision == 'int8' and args.backend != 'onnx':
+        logger.error("✗ precision=int8 فقط با --backend onnx پشتیبانی می‌شود")
+        return 1
+    
+    detector = YOLOv5Detector(
+        weights=args.weights,
+        conf_threshold=args.conf,
+        engine='inprocess',
+        img_size=args.img_size,
+        backend=args.backend,
+        precision=args.precision,
+        calibration=args.calibration,
+        verbose=True,
+        raise_errors=True,
+    )
+    detector.yolov5_path = Path(os.path.abspath(args.yolov5_path))
+    if args.precision == 'int8':
+        detector.quantize(force=args.force)
+        if args.validate is not None:
+            detector.compare_precision(args.validate, labels=args.labels)
+        return 0
+    
+    detector.export(args.backend, output=args.output, force=args.force)
+    if args.check:
+        if args.output is not None:
+            logger.warning("⚠ مقایسه روی فایل کش‌شده کنار وزن‌ها انجام می‌شود، نه --output")
+        return 0 if detector.check_parity(args.images)['passed'] else 1
+    return 0
+
+
+def main(argv: Optional[List[str]] = None):
     """
     تابع اصلی برای نمایش مثال‌های استفاده
     
@@ -495,11 +5288,40 @@ def main():
     
     استفاده:
         python yolov5_object_detection.py
+        python yolov5_object_detection.py serve --weights yolov5s.pt --port 8000
+        python yolov5_object_detection.py export --weights yolov5s.pt --backend onnx --check
     
     ساخته شده توسط: رضا صفری فروشانی
     ایمیل: safarireza@gmail.com
     گیتهاب: https://github.com/reza123reza
     """
+    args = _build_arg_parser().parse_args(argv)
+    _enable_console_logging(logging.INFO)
+    if args.command == 'serve':
+        return _serve_command(args)
+    if args.command == 'export':
+        return _export_command(args)
+    if args.command == 'benchmark':
+        run_benchmark(
+            yolov5_path=args.yolov5_path,
+            models=args.models,
+            batch_sizes=args.batch_sizes,
+            img_sizes=args.img_sizes,
+            threads=args.threads or [None],
+            backends=args.backends,
+            precisions=args.precisions,
+            calibration=args.calibration,
+            share_weights=args.share_weights,
+            images=args.images,
+            num_images=args.num_images,
+            warmup=args.warmup,
+            random_init=args.random_init,
+            device=args.device,
+            conf_threshold=args.conf,
+            output=args.output,
+        )
+        return 0
+    
     print("\n")
     print("╔" + "═" * 78 + "╗")
     print("║" + " " * 15 + "YOLOv5 Object Detection - نمونه استفاده" + " " * 22 + "║")
@@ -510,7 +5332,7 @@ def main():
     print("╚" + "═" * 78 + "╝")
     
     # ساخت شیء تشخیص‌دهنده
-    detector = YOLOv5Detector(weights='yolov5m.pt', conf_threshold=0.7)
+    detector = YOLOv5Detector(weights='yolov5m.pt', conf_threshold=0.7, verbose=True)
     
     # راه‌اندازی محیط
     if not detector.setup_environment():
@@ -600,4 +5422,4 @@ if __name__ == "__main__":
     ║  کپی برداری، توزیع یا تغییر بدون اجازه کتبی نویسنده ممنوع است.           ║
     ╚════════════════════════════════════════════════════════════════════════════╝
     """
-    main()
+    sys.exit(main())